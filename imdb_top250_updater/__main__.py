@@ -0,0 +1,16 @@
+"""
+python -m imdb_top250_updater <command>, see cli.py
+"""
+
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# modules import each other from package directory, and logs, database files and http cache live under it
+sys.path.insert(0, PACKAGE_DIR)
+os.chdir(PACKAGE_DIR)
+
+from cli import main  # noqa: E402
+
+sys.exit(main())
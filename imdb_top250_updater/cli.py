@@ -0,0 +1,285 @@
+"""
+Command line interface, runs only the updater operation needed instead of the whole scheduled pipeline.
+Commands write their output to stdout, updater logs go to stderr.
+
+    python -m imdb_top250_updater init --check-seen
+    python -m imdb_top250_updater refresh
+    python -m imdb_top250_updater diff --dry-run
+    python -m imdb_top250_updater list --unseen --format json
+    python -m imdb_top250_updater seen 4 13
+    python -m imdb_top250_updater remove 113
+    python -m imdb_top250_updater process-replies
+    python -m imdb_top250_updater report --format text
+    python -m imdb_top250_updater daemon --refresh-interval 3600
+
+Options shared by all commands come before the command name, example:
+    python -m imdb_top250_updater --backend sqlite --chart toptv --profile refresh
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import sys
+
+from updater.pipeline import Pipeline
+
+LIST_FORMATS = ('text', 'json')
+REPORT_FORMATS = ('html', 'text', 'markdown')
+MOVIE_FIELDS = ('place', 'title', 'year', 'rating', 'reviewers', 'seen_status', 'link', 'movie_id')
+
+
+def create_updater(args):
+    # imported here so --help does not load the updater and its dependencies
+    from database.storage import BACKENDS
+    from updater.imdb_updater import IMDBTOP250Updater
+
+    # loggers are created when their module is imported, storage backends are imported on first use
+    importlib.import_module(BACKENDS[args.backend][0])
+    log_to_stderr()
+
+    return IMDBTOP250Updater(db_name=args.db_name, backend=args.backend, filter_profile=args.filter_profile,
+                             chart=args.chart)
+
+
+def log_to_stderr() -> list:
+    """
+    Move log handlers writing to stdout to stderr, so logs are not mixed with command output.
+    :return: moved handlers.
+    """
+    moved = []
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        for handler in getattr(logger, 'handlers', ()):
+            if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+                handler.setStream(sys.stderr)
+                moved.append(handler)
+    return moved
+
+
+def write_changes(changes, out, verbose: bool = True):
+    if changes is None:
+        out.write('chart not changed since last run\n')
+        return
+
+    if verbose:
+        for place, title, year, *_ in changes.added:
+            out.write(f'+ {place} / {title} / {year}\n')
+        for place, title, year, *_ in changes.dropped:
+            out.write(f'- {place} / {title} / {year}\n')
+        for old_place, (place, title, *_) in changes.moved:
+            out.write(f'~ {old_place} -> {place} / {title}\n')
+        for old_rating, (place, title, year, rating, *_) in changes.rerated:
+            out.write(f'* {place} / {title} / rating {old_rating} -> {rating}\n')
+    out.write(f'{changes}\n')
+
+
+def write_rows(rows, fmt: str, out):
+    """Rows are written one by one, a json list is streamed as an array, not built in memory."""
+    if fmt == 'json':
+        out.write('[')
+        for index, row in enumerate(rows):
+            out.write(',\n ' if index else '\n ')
+            out.write(json.dumps(dict(zip(MOVIE_FIELDS, row))))
+        out.write('\n]\n')
+    else:
+        for place, title, year, rating, reviewers, *_ in rows:
+            out.write(f'{place} / {title} / {year} / {rating} / {reviewers}\n')
+
+
+def write_list_size(updater, out):
+    out.write(f'{len(updater.top250_db.select_all())} movies in list\n')
+
+
+def write_places(titles_by_places: dict, places: list, action: str, out) -> int:
+    for place in sorted(titles_by_places):
+        out.write(f'{place} / {titles_by_places[place]} {action}\n')
+
+    missing = sorted(set(places) - titles_by_places.keys())
+    if missing:
+        sys.stderr.write(f'places not in list: {" ".join(map(str, missing))}\n')
+    return 0 if titles_by_places else 1
+
+
+def write_report(contents: list, out):
+    for part in contents:
+        out.write(part)
+        out.write('\n')
+
+
+def init(updater, args, pipeline: Pipeline, out):
+    pipeline.add_stage('create_list', lambda: updater.create_list(check_seen=args.check_seen))
+    return lambda results: write_list_size(updater, out)
+
+
+def refresh(updater, args, pipeline: Pipeline, out):
+    pipeline.add_stage('fetch_chart', updater.scrape_top250_rows)
+    pipeline.add_stage('update_top250', lambda rows: updater.update_top250(rows=rows), depends_on=('fetch_chart',))
+    return lambda results: write_changes(updater.changes, out, verbose=False)
+
+
+def diff(updater, args, pipeline: Pipeline, out):
+    pipeline.add_stage('fetch_chart', updater.scrape_top250_rows)
+    if args.dry_run:
+        pipeline.add_stage('diff', lambda rows: updater.preview_top250(rows=rows), depends_on=('fetch_chart',))
+        return lambda results: write_changes(results['diff'], out)
+
+    pipeline.add_stage('update_top250', lambda rows: updater.update_top250(rows=rows), depends_on=('fetch_chart',))
+    return lambda results: write_changes(updater.changes, out)
+
+
+def list_movies(updater, args, pipeline: Pipeline, out):
+    if args.user:
+        pipeline.add_stage('select', lambda: updater.user_movies(args.user, unseen=args.unseen))
+    elif args.unseen:
+        pipeline.add_stage('select', updater.unseen_movies)
+    else:
+        pipeline.add_stage('select', updater.top250_db.select_all)
+    pipeline.add_stage('write', lambda rows: write_rows(rows, args.format, out), depends_on=('select',))
+
+
+def seen(updater, args, pipeline: Pipeline, out):
+    pipeline.add_stage('update_seen', lambda: updater.update_seen_statuses(args.places, seen_status=not args.unseen,
+                                                                         user_id=args.user))
+    action = 'checked as not seen' if args.unseen else 'checked as seen'
+    return lambda results: write_places(results['update_seen'], args.places, action, out)
+
+
+def remove(updater, args, pipeline: Pipeline, out):
+    pipeline.add_stage('remove', lambda: updater.delete_movies(args.places, user_id=args.user))
+    return lambda results: write_places(results['remove'], args.places, 'removed', out)
+
+
+def process_replies(updater, args, pipeline: Pipeline, out):
+    pipeline.add_stage('email_replies', updater.check_email_replies)
+
+
+def build_report(updater, args) -> list:
+    # nothing was updated by this process, report shows movies added by the last refresh
+    updater.load_new_movies()
+    return updater.build_contents(fmt=args.format, user_id=args.user)
+
+
+def report(updater, args, pipeline: Pipeline, out):
+    pipeline.add_stage('build_report', lambda: build_report(updater, args))
+    if not args.send:
+        return lambda results: write_report(results['build_report'], out)
+
+    from data import config
+
+    receiver_email = updater.user_email(args.user) if args.user else config.receiver_email
+    pipeline.add_stage('send_email', lambda contents: updater.send_email(
+        receiver_email=receiver_email, sender_mail=config.sender_mail,
+        sender_password=config.sender_password, contents=contents), depends_on=('build_report',))
+
+
+def daemon(updater, args, pipeline: Pipeline, out):
+    # imported here, the daemon entry point and its signal handlers are not needed by other commands
+    from imdb_schedule import run_daemon
+
+    # not a pipeline stage: stages run in worker threads, the daemon needs the main thread for signal handlers
+    return lambda results: run_daemon(updater, replies_interval=args.replies_interval,
+                                      refresh_interval=args.refresh_interval,
+                                      backup_interval=args.backup_interval, jitter=args.jitter)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m imdb_top250_updater', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=('mysql', 'sqlite'), default='mysql')
+    parser.add_argument('--db-name', help='database name, default: imdb')
+    parser.add_argument('--chart', default='top250', help="followed chart, example: toptv, top1000, genre:horror")
+    parser.add_argument('--filter-profile', default='default', help='filter profile of stored chart rows')
+    parser.add_argument('--profile', action='store_true', help='print timing of every stage to stderr')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show updater logs')
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser('init', help='create movies list from chart, run once before other commands')
+    command.add_argument('--check-seen', action='store_true', help='ask for every movie whether it was seen')
+    command.set_defaults(func=init)
+
+    command = commands.add_parser('refresh', help='scrape chart and update movies list')
+    command.set_defaults(func=refresh)
+
+    command = commands.add_parser('diff', help='show changes between chart and movies list, then apply them')
+    command.add_argument('--dry-run', action='store_true', help='only show changes, nothing is written')
+    command.set_defaults(func=diff)
+
+    command = commands.add_parser('list', help='print movies list')
+    command.add_argument('--unseen', action='store_true', help='only movies not seen yet')
+    command.add_argument('--format', choices=LIST_FORMATS, default='text')
+    command.add_argument('--user', help='list of user, see IMDBTOP250Updater.add_user')
+    command.set_defaults(func=list_movies)
+
+    command = commands.add_parser('seen', help='check movies as seen')
+    command.add_argument('places', nargs='+', type=int)
+    command.add_argument('--unseen', action='store_true', help='check as not seen instead')
+    command.add_argument('--user', help='list of user, see IMDBTOP250Updater.add_user')
+    command.set_defaults(func=seen)
+
+    command = commands.add_parser('remove', help='remove movies from list, they are not added back')
+    command.add_argument('places', nargs='+', type=int)
+    command.add_argument('--user', help='list of user, see IMDBTOP250Updater.add_user')
+    command.set_defaults(func=remove)
+
+    command = commands.add_parser('process-replies', help='apply delete and seen actions of email replies')
+    command.set_defaults(func=process_replies)
+
+    command = commands.add_parser('report', help='print email report, or send it with --send')
+    command.add_argument('--format', choices=REPORT_FORMATS, default='html')
+    command.add_argument('--send', action='store_true',
+                         help='send html report to address in data/config.py, or to email of --user')
+    command.add_argument('--user', help='report of user list, see IMDBTOP250Updater.add_user')
+    command.set_defaults(func=report)
+
+    command = commands.add_parser('daemon', help='keep running, poll replies and refresh chart at intervals')
+    command.add_argument('--replies-interval', type=float, default=5 * 60, help='seconds, default: 300')
+    command.add_argument('--refresh-interval', type=float, default=60 * 60, help='seconds, default: 3600')
+    command.add_argument('--backup-interval', type=float, default=24 * 60 * 60, help='seconds, default: 86400')
+    command.add_argument('--jitter', type=float, default=0.1, help='fraction of interval, default: 0.1')
+    command.set_defaults(func=daemon)
+
+    return parser
+
+
+def write_timings(pipeline: Pipeline, err):
+    for name, timing in sorted(pipeline.timings.items(), key=lambda item: item[1].start):
+        err.write(f'{name:<16} start {timing.start:8.3f}s  took {timing.duration:8.3f}s\n')
+
+
+def run(updater, args, out=sys.stdout, err=sys.stderr) -> int:
+    """
+    Run command of parsed args with updater.
+    :return: exit code.
+    """
+    pipeline = Pipeline()
+    write_output = args.func(updater, args, pipeline, out)
+    try:
+        results = pipeline.run()
+    finally:
+        if args.profile:
+            write_timings(pipeline, err)
+
+    exit_code = write_output(results) if write_output else None
+    return exit_code or 0
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    updater = None
+    try:
+        updater = create_updater(args)
+        return run(updater, args)
+
+    except Exception as e:
+        logging.getLogger('IMDB.Logger').debug('Command failed', exc_info=True)
+        sys.stderr.write(f'{args.command} failed: {e!r}\n')
+        return 1
+
+    finally:
+        if updater is not None:
+            updater.root_db.close_connection()
@@ -3,38 +3,25 @@ Tool for converting IMDB TOP250 Updater json database to MySQL database.
 """
 import json
 
-from mysql.connector import (connection)
+from database import mysql_db, tables
 from database.mysql_config import *
+from updater.chart_parser import movie_id_from_link
 
-my_db = connection.MySQLConnection(
-    user=DB_USER, password=DB_PASSWORD,
-    host=DB_HOST)
 
-my_cursor = my_db.cursor()
+def convert_json_to_mysql(json_path: str = 'imdb_db.json', db_name: str = DB_NAME):
+    root_db = mysql_db.DBConnection(db_name=db_name)
+    top250_db = tables.TOP250Table(root_db)
 
-my_cursor.execute("CREATE DATABASE imdb")
-my_cursor.close()
+    with open(json_path) as file:
+        root_dict = json.load(file)
+        top250 = root_dict['top250']
+        removed_movies = root_dict['removed_movies']
+        # print(json.dumps(root_dict, indent=4))
 
-my_db = connection.MySQLConnection(
-    user=DB_USER, password=DB_PASSWORD,
-    host=DB_HOST, database=DB_NAME)
+    top250_db.create_table(table_name='top250')
 
-my_cursor = my_db.cursor()
-
-with open('imdb_db.json') as file:
-    root_dict = json.load(file)
-    top250 = root_dict['top250']
-    removed_movies = root_dict['removed_movies']
-    # print(json.dumps(root_dict, indent=4))
-
-my_cursor.execute("CREATE TABLE `top250` (`place` int, `title` text, `year` int, `rating` float, `reviewers` text, "
-                  "`seen_status` bool, `link` text)")
-my_cursor.execute("CREATE TABLE `removed_movies` (`title` text)")
-
-for place in top250:
-    my_cursor.execute(
-        f"INSERT INTO top250 (place, title, year, rating, reviewers, seen_status, link) "
-        f"VALUES (%s, %s, %s, %s, %s, %s, %s)", (
+    rows = [
+        [
             int(place),
             top250[place]['Movie'],
             int(top250[place]['Year']),
@@ -42,14 +29,19 @@ for place in top250:
             top250[place]['Rating'].split()[3],
             top250[place]['Seen'],
             top250[place]['Link'],
-        )
-    )
+            movie_id_from_link(top250[place]['Link']),
+        ]
+        for place in top250
+    ]
+
+    # one transaction for both tables
+    with root_db.session():
+        top250_db.insert_movies(rows, table_name='top250')
+        # json database kept titles only, ids are filled when the titles show up in the chart again
+        top250_db.removed_movies_db.insert_movies([(None, title) for title in removed_movies])
 
-for movie in removed_movies:
-    my_cursor.execute(
-        f"INSERT INTO removed_movies (title) VALUES (%s)", (movie,)
-    )
+    root_db.close_connection()
 
-my_db.commit()
 
-my_db.close()
+if __name__ == '__main__':
+    convert_json_to_mysql()
@@ -0,0 +1,68 @@
+"""
+Diff between the stored top250 rows and a freshly scraped chart, movies are matched by imdb id.
+Rows are [place, title, year, rating, reviewers, seen_status, link, movie_id].
+"""
+
+from typing import NamedTuple
+
+
+class ChangeSet(NamedTuple):
+    added: list  # rows of new movies
+    dropped: list  # stored rows of movies that left the chart
+    moved: list  # (old place, updated row)
+    rerated: list  # (old rating, updated row)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.dropped or self.moved or self.rerated)
+
+    def updated_rows(self) -> list:
+        """Rows already stored that need a new place, rating or reviewers."""
+        rows = {}
+        for _, row in self.moved + self.rerated:
+            rows[row[7]] = row
+        return list(rows.values())
+
+    def __str__(self) -> str:
+        return (f'{len(self.added)} added, {len(self.dropped)} dropped, '
+                f'{len(self.moved)} moved, {len(self.rerated)} re-rated')
+
+
+def same_rating(old_rating, rating) -> bool:
+    """Ratings have one decimal, float columns may not give back the exact scraped value."""
+    if old_rating is None or rating is None:
+        return old_rating is rating
+    return round(old_rating, 1) == round(rating, 1)
+
+
+def diff_movies(current_rows, chart_rows, removed_ids) -> ChangeSet:
+    """
+    :param current_rows: rows stored in top250 table.
+    :param chart_rows: rows scraped from imdb chart.
+    :param removed_ids: imdb ids of movies removed by user, never added back.
+    :return: ChangeSet
+    """
+    current = {row[7]: tuple(row) for row in current_rows}
+    removed_ids = set(removed_ids)
+
+    added, moved, rerated = [], [], []
+    chart_ids = set()
+    for row in chart_rows:
+        place, title, year, rating, reviewers, seen_status, link, movie_id = row
+        if movie_id in removed_ids:
+            continue
+        chart_ids.add(movie_id)
+
+        old = current.get(movie_id)
+        if old is None:
+            added.append(tuple(row))
+            continue
+
+        # keep user data (seen status) of stored movie
+        updated = (place, title, year, rating, reviewers, old[5], link, movie_id)
+        if old[0] != place:
+            moved.append((old[0], updated))
+        if not same_rating(old[3], rating) or old[4] != reviewers:
+            rerated.append((old[3], updated))
+
+    dropped = [row for movie_id, row in current.items() if movie_id not in chart_ids]
+    return ChangeSet(added=added, dropped=dropped, moved=moved, rerated=rerated)
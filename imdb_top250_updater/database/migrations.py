@@ -0,0 +1,220 @@
+"""
+Versioned database schema.
+SchemaMigrator creates new databases on the latest schema and upgrades existing ones step by step,
+the current version is kept in `schema_version` table.
+Steps 2 and 3 upgrade the tables created by TOP250Table and RemovedMoviesTable with MySQL statements,
+later steps create tables with the DDL of the backend Dialect (see database.storage), so they run on every backend.
+A new database starts at NEW_DATABASE_VERSION and runs the later steps.
+
+Version 1 - original tables without any keys.
+Version 2 - movie_id (tt number from imdb link) primary key, unique place, indexed title and seen_status.
+Version 3 - removed_movies keyed by movie_id, titles removed before version 3 keep a NULL movie_id.
+Version 4 - updater_state and chart_entries tables.
+Version 5 - users, user_movies and user_removed tables of personal lists.
+Version 6 - movie_history table.
+Version 7 - filter profile of every user list, NULL for the default profile.
+"""
+
+import logging
+
+LOG = logging.getLogger('IMDB.DB.Logger')
+
+SCHEMA_VERSION = 7
+NEW_DATABASE_VERSION = 3
+
+# schema checks of MySQL upgrade steps
+COLUMN_EXISTS_QUERY = (
+    "SELECT 1 FROM information_schema.COLUMNS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s"
+)
+INDEX_EXISTS_QUERY = (
+    "SELECT 1 FROM information_schema.STATISTICS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1"
+)
+
+MOVIES_TABLE_DDL = (
+    "CREATE TABLE `{table_name}` (`place` int, `title` varchar(255), `year` int, `rating` float, "
+    "`reviewers` varchar(32), `seen_status` bool, `link` varchar(255), `movie_id` int unsigned NOT NULL, "
+    "PRIMARY KEY (`movie_id`), UNIQUE KEY `place` (`place`), KEY `title` (`title`), "
+    "KEY `seen_status` (`seen_status`))"
+)
+
+REMOVED_MOVIES_TABLE_DDL = (
+    "CREATE TABLE `removed_movies` (`movie_id` int unsigned, `title` varchar(255) NOT NULL, "
+    "UNIQUE KEY `movie_id` (`movie_id`), KEY `title` (`title`))"
+)
+
+# tables created by upgrade steps, created only if missing, databases created by older versions may have them
+STATE_TABLE_DDL = "CREATE TABLE IF NOT EXISTS `updater_state` (`name` varchar(64) PRIMARY KEY, `value` text)"
+
+CHART_ENTRIES_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS `chart_entries` (`chart_id` varchar(64) NOT NULL, `place` int NOT NULL, "
+    "`movie_id` int unsigned NOT NULL, `title` varchar(255), `year` int, `rating` float, `reviewers` varchar(32), "
+    "`link` varchar(255), PRIMARY KEY (`chart_id`, `movie_id`), KEY `chart_place` (`chart_id`, `place`))"
+)
+
+# append only, one row per change of place or rating, see database.tables.MovieHistoryTable
+MOVIE_HISTORY_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS `movie_history` (`chart_id` varchar(64) NOT NULL, "
+    "`movie_id` int unsigned NOT NULL, `snapshot_at` int unsigned NOT NULL, `place` int, `rating` float, "
+    "PRIMARY KEY (`chart_id`, `movie_id`, `snapshot_at`), KEY `chart_snapshot` (`chart_id`, `snapshot_at`))"
+)
+
+# personal lists over the shared chart_entries catalog
+USERS_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS `users` (`user_id` varchar(64) NOT NULL, `email` varchar(255), "
+    "`chart_id` varchar(64) NOT NULL, PRIMARY KEY (`user_id`), KEY `chart_id` (`chart_id`))"
+)
+
+USER_MOVIES_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS `user_movies` (`user_id` varchar(64) NOT NULL, `movie_id` int unsigned NOT NULL, "
+    "`seen_status` bool, PRIMARY KEY (`user_id`, `movie_id`), KEY `movie_id` (`movie_id`))"
+)
+
+USER_REMOVED_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS `user_removed` (`user_id` varchar(64) NOT NULL, `movie_id` int unsigned NOT NULL, "
+    "`title` varchar(255), PRIMARY KEY (`user_id`, `movie_id`))"
+)
+
+
+def migrate_to_2(migrator):
+    if migrator.table_exists('top250'):
+        if not migrator.column_exists('top250', 'movie_id'):
+            migrator.execute("ALTER TABLE top250 ADD COLUMN `movie_id` int unsigned")
+        migrator.execute(
+            "UPDATE top250 SET movie_id = "
+            "CAST(SUBSTRING(SUBSTRING_INDEX(SUBSTRING_INDEX(link, '/title/', -1), '/', 1), 3) AS UNSIGNED)",
+            "ALTER TABLE top250 MODIFY `title` varchar(255), MODIFY `reviewers` varchar(32), "
+            "MODIFY `link` varchar(255), MODIFY `movie_id` int unsigned NOT NULL",
+        )
+        if not migrator.index_exists('top250', 'PRIMARY'):
+            migrator.execute("ALTER TABLE top250 ADD PRIMARY KEY (`movie_id`)")
+        if not migrator.index_exists('top250', 'place'):
+            # old tables may hold a place twice, keep it for one movie, the next chart update sets the others
+            migrator.execute(
+                "UPDATE top250 t JOIN (SELECT place, MIN(movie_id) AS movie_id FROM top250 "
+                "WHERE place IS NOT NULL GROUP BY place HAVING COUNT(*) > 1) kept ON kept.place = t.place "
+                "SET t.place = NULL WHERE t.movie_id <> kept.movie_id",
+                "ALTER TABLE top250 ADD UNIQUE KEY `place` (`place`)",
+            )
+        if not migrator.index_exists('top250', 'title'):
+            migrator.execute("ALTER TABLE top250 ADD KEY `title` (`title`)")
+        if not migrator.index_exists('top250', 'seen_status'):
+            migrator.execute("ALTER TABLE top250 ADD KEY `seen_status` (`seen_status`)")
+
+    if migrator.table_exists('removed_movies_v2') and not migrator.table_exists('removed_movies'):
+        # previous run stopped after dropping the old table
+        migrator.execute("RENAME TABLE removed_movies_v2 TO removed_movies")
+
+    elif migrator.table_exists('removed_movies') and not migrator.index_exists('removed_movies', 'PRIMARY'):
+        # old table may hold the same title twice, copy distinct titles to the keyed table
+        migrator.execute(
+            "DROP TABLE IF EXISTS removed_movies_v2",
+            "CREATE TABLE `removed_movies_v2` (`title` varchar(255) NOT NULL, PRIMARY KEY (`title`))",
+            "INSERT IGNORE INTO removed_movies_v2 (title) "
+            "SELECT DISTINCT title FROM removed_movies WHERE title IS NOT NULL",
+            "DROP TABLE removed_movies",
+            "RENAME TABLE removed_movies_v2 TO removed_movies",
+        )
+
+
+def migrate_to_3(migrator):
+    if migrator.table_exists('removed_movies'):
+        if not migrator.column_exists('removed_movies', 'movie_id'):
+            migrator.execute("ALTER TABLE removed_movies ADD COLUMN `movie_id` int unsigned FIRST")
+        if migrator.index_exists('removed_movies', 'PRIMARY'):
+            migrator.execute("ALTER TABLE removed_movies DROP PRIMARY KEY")
+        if not migrator.index_exists('removed_movies', 'movie_id'):
+            migrator.execute("ALTER TABLE removed_movies ADD UNIQUE KEY `movie_id` (`movie_id`)")
+        if not migrator.index_exists('removed_movies', 'title'):
+            migrator.execute("ALTER TABLE removed_movies ADD KEY `title` (`title`)")
+
+
+def migrate_to_4(migrator):
+    migrator.execute(STATE_TABLE_DDL, *migrator.dialect.chart_entries_table_ddl)
+
+
+def migrate_to_5(migrator):
+    migrator.execute(*migrator.dialect.user_lists_table_ddl)
+
+
+def migrate_to_6(migrator):
+    migrator.execute(*migrator.dialect.movie_history_table_ddl)
+
+
+def migrate_to_7(migrator):
+    if not migrator.column_exists('users', 'filter_profile'):
+        migrator.execute("ALTER TABLE users ADD COLUMN `filter_profile` varchar(64)")
+
+
+MIGRATIONS = {
+    2: migrate_to_2,
+    3: migrate_to_3,
+    4: migrate_to_4,
+    5: migrate_to_5,
+    6: migrate_to_6,
+    7: migrate_to_7,
+}
+
+
+class SchemaMigrator:
+
+    def __init__(self, parent):
+        self.db_connection = parent
+        self.dialect = parent.dialect
+        self.my_cursor = None  # cursor of the running session, see migrate()
+
+    def execute(self, *statements):
+        for statement in statements:
+            self.my_cursor.execute(statement)
+
+    def table_exists(self, table_name: str) -> bool:
+        self.my_cursor.execute(self.dialect.table_exists, (table_name,))
+        return self.my_cursor.fetchone() is not None
+
+    def column_exists(self, table_name: str, column_name: str) -> bool:
+        self.my_cursor.execute(self.dialect.column_exists, (table_name, column_name))
+        return self.my_cursor.fetchone() is not None
+
+    def index_exists(self, table_name: str, index_name: str) -> bool:
+        """:param index_name: key name, 'PRIMARY' for primary key."""
+        self.my_cursor.execute(INDEX_EXISTS_QUERY, (table_name, index_name))
+        return self.my_cursor.fetchone() is not None
+
+    def current_version(self):
+        if not self.table_exists('schema_version'):
+            return None
+
+        self.my_cursor.execute("SELECT MAX(version) FROM schema_version")
+        return self.my_cursor.fetchone()[0]
+
+    def set_version(self, version: int):
+        self.my_cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (version,))
+
+    def migrate(self) -> int:
+        """
+        Upgrade database schema to SCHEMA_VERSION.
+        :return: schema version after upgrade.
+        """
+        with self.db_connection.session() as self.my_cursor:
+            version = self.current_version()
+
+            if version is None:
+                legacy = self.table_exists('top250') or self.table_exists('removed_movies')
+                self.my_cursor.execute(
+                    "CREATE TABLE `schema_version` (`version` int NOT NULL, PRIMARY KEY (`version`))"
+                )
+                version = 1 if legacy else NEW_DATABASE_VERSION
+                self.set_version(version)
+
+        # MySQL commits every DDL statement implicitly, so a failed step may be left half applied,
+        # steps check the schema before each change and the whole step is run again on next run
+        for next_version in range(version + 1, SCHEMA_VERSION + 1):
+            LOG.info(f'Upgrading database schema to version {next_version}')
+            with self.db_connection.session() as self.my_cursor:
+                MIGRATIONS[next_version](self)
+                self.set_version(next_version)
+            version = next_version
+
+        self.my_cursor = None
+        return version
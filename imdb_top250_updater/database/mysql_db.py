@@ -2,63 +2,162 @@ import atexit
 import logging
 import subprocess
 import sys
+import threading
+from contextlib import contextmanager
 
-from mysql.connector import (connection)
+from mysql.connector import (connection, errors)
 
+from database.migrations import (CHART_ENTRIES_TABLE_DDL, COLUMN_EXISTS_QUERY, MOVIE_HISTORY_TABLE_DDL,
+                                 MOVIES_TABLE_DDL, REMOVED_MOVIES_TABLE_DDL, USER_MOVIES_TABLE_DDL,
+                                 USER_REMOVED_TABLE_DDL, USERS_TABLE_DDL)
 from database.mysql_config import DB_PASSWORD, DB_USER, DB_HOST, DB_NAME
+from database.storage import Dialect, Storage
 
 LOG = logging.getLogger('MySQL.DB.Logger')
 handler = logging.StreamHandler(sys.stdout)
 LOG.addHandler(handler)
 
+MYSQL_DIALECT = Dialect(
+    name='mysql',
+    insert_ignore='INSERT IGNORE',
+    upsert_state="INSERT INTO updater_state (name, value) VALUES (%s, %s) "
+                 "ON DUPLICATE KEY UPDATE value = VALUES(value)",
+    table_exists="SHOW TABLES LIKE %s",
+    column_exists=COLUMN_EXISTS_QUERY,
+    movies_table_ddl=(MOVIES_TABLE_DDL,),
+    removed_movies_table_ddl=(REMOVED_MOVIES_TABLE_DDL,),
+    chart_entries_table_ddl=(CHART_ENTRIES_TABLE_DDL,),
+    movie_history_table_ddl=(MOVIE_HISTORY_TABLE_DDL,),
+    user_lists_table_ddl=(USERS_TABLE_DDL, USER_MOVIES_TABLE_DDL, USER_REMOVED_TABLE_DDL),
+)
+
+
+class DBConnection(Storage):
+    """
+    Pool of MySQL connections, all queries run inside `session()`:
+
+        with root_db.session() as cursor:
+            cursor.execute(...)
 
-class DBConnection:
+    Each thread gets its own pooled connection, so the updater, the reply processor
+    and other workers can share one DBConnection object.
+    Connections are opened on demand, a one-shot run using a single thread opens only one.
+    """
+    dialect = MYSQL_DIALECT
 
     def __init__(self, host: str = DB_HOST, user: str = DB_USER, port: int = 3307,
-                 password: str = DB_PASSWORD, db_name: str = DB_NAME):
+                 password: str = DB_PASSWORD, db_name: str = DB_NAME, pool_size: int = 5,
+                 pool_timeout: float = 10):
+        """
+        :param pool_size: max open connections, opened when all open ones are in use.
+        :param pool_timeout: seconds to wait for a free connection when all are in use.
+        """
         self.host = host
         self.port = port
         self.user = user
         self.__password = password
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
 
         if db_name is None:
             self.db_name = DB_NAME
         else:
             self.db_name = db_name
 
-        self.my_connection = None
-        self.my_cursor = None
+        self._connections = set()  # all connections opened by the pool, closed by close_connection()
+        self._idle = []  # open connections not used by a session
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
 
         try:  # check if DB exists, if not - create one.
-            self.get_connection()
-        except:
+            self.release_connection(self.get_connection())
+        except errors.ProgrammingError:
             LOG.error('DB not exists, creating DB now...')
             self.create_database()
+            self.release_connection(self.get_connection())
 
-        # close connection on exit
-        atexit.register(self.close_cursor)
+        # close connections on exit
         atexit.register(self.close_connection)
 
         LOG.info('DBConnection object created successfully')
 
-    def get_connection(self):
-        if self.my_connection is None:
-            LOG.debug('Trying to create connection')
-            self.my_connection = connection.MySQLConnection(host=self.host,
-                                                            user=self.user,
-                                                            passwd=self.__password,
-                                                            database=self.db_name,
-                                                            port=self.port,
-                                                            charset='utf8'
-                                                            )
-            LOG.info('Connection created successfully')
-        return self.my_connection
-
-    def get_cursor(self):
-        if self.my_connection:
-            self.my_cursor = self.my_connection.cursor(buffered=True)
+    def open_connection(self):
+        LOG.debug('Trying to open database connection')
+        my_connection = connection.MySQLConnection(host=self.host,
+                                                   user=self.user,
+                                                   passwd=self.__password,
+                                                   database=self.db_name,
+                                                   port=self.port,
+                                                   charset='utf8'
+                                                   )
+        with self._lock:
+            self._connections.add(my_connection)
+        LOG.info(f'Database connection opened, {len(self._connections)} open')
+        return my_connection
 
-        return self.my_cursor
+    def get_connection(self):
+        """
+        Idle connection checked alive (reconnects if server closed it), or a new one while less than
+        pool_size are open. Give it back with release_connection().
+        """
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            raise errors.PoolError(f'No free connection in {self.pool_timeout} seconds, pool size {self.pool_size}')
+
+        try:
+            with self._lock:
+                my_connection = self._idle.pop() if self._idle else None
+            if my_connection is None:
+                my_connection = self.open_connection()
+            my_connection.ping(reconnect=True, attempts=3, delay=1)
+        except Exception:
+            self._slots.release()
+            raise
+
+        return my_connection
+
+    def release_connection(self, my_connection):
+        with self._lock:
+            # connections closed by close_connection() while in use are not kept
+            if my_connection in self._connections:
+                self._idle.append(my_connection)
+        self._slots.release()
+
+    @contextmanager
+    def session(self):
+        """
+        Transaction on a pooled connection, commit on success, rollback on error.
+        Nested sessions in the same thread join the outer transaction.
+        """
+        my_cursor = getattr(self._local, 'cursor', None)
+        if my_cursor is not None:
+            yield my_cursor
+            return
+
+        my_connection = self.get_connection()
+        my_cursor = my_connection.cursor(buffered=True)
+        self._local.cursor = my_cursor
+        self._local.session_callbacks = []
+        try:
+            yield my_cursor
+            my_connection.commit()
+        except Exception:
+            my_connection.rollback()
+            raise
+        finally:
+            self._local.cursor = None
+            my_cursor.close()
+            self.release_connection(my_connection)
+            self._run_session_callbacks()
+
+    def health_check(self) -> bool:
+        try:
+            with self.session() as my_cursor:
+                my_cursor.execute("SELECT 1")
+                return my_cursor.fetchone() == (1,)
+        except errors.Error:
+            LOG.exception('Database health check failed')
+            return False
 
     def create_database(self):
         temp_connection = connection.MySQLConnection(host=self.host,
@@ -71,241 +170,32 @@ class DBConnection:
         temp_cursor.execute(
             f"CREATE DATABASE {self.db_name}",
         )
+        temp_cursor.close()
+        temp_connection.close()
 
     def drop_database(self):
-        if self.my_connection and self.my_cursor:
-            self.my_cursor.execute(
+        with self.session() as my_cursor:
+            my_cursor.execute(
                 f"DROP DATABASE {self.db_name}",
             )
-            LOG.info(f'database {self.db_name} dropped')
-
-    def commit(self):
-        if self.my_cursor:
-            self.my_connection.commit()
-
-    def close_cursor(self):
-        if self.my_cursor:
-            self.my_cursor.close()
+        LOG.info(f'database {self.db_name} dropped')
 
     def close_connection(self):
-        if self.my_connection:
-            self.my_connection.close()
-
-    def backup_database(self):
+        """Close all connections opened by the pool, later sessions open new ones."""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+            self._idle = []
+
+        for my_connection in connections:
+            try:
+                my_connection.close()
+            except errors.Error:
+                LOG.debug('Failed to close database connection', exc_info=True)
+
+    def backup_database(self) -> str:
+        backup_path = f'database/{self.db_name}_backup.sql'
         subprocess.call(['mysqldump', '-h', self.host, f'--port={self.port}', '-u', self.user,
-                         f'-p{self.__password}', self.db_name, '-r', f'database/{self.db_name}_backup.sql'])
+                         f'-p{self.__password}', self.db_name, '-r', backup_path])
 
         LOG.info('Database backup completed')
-        return True
-
-
-class RemovedMoviesTable:
-    """
-    should be manged directly through Top250Table object
-    """
-
-    def __init__(self, parent):
-        self.db_connection = parent
-        self.my_cursor = parent.my_cursor
-
-        try:  # check if table exists, if not - create one.
-            self.select_titles()
-        except:
-            LOG.error('table not exists, creating removed movies table now...')
-            self.create_table()
-
-        LOG.info('RemovedMoviesTable object created successfully')
-
-    def create_table(self):
-        self.my_cursor.execute(
-            "CREATE TABLE `removed_movies` (`title` text)"
-        )
-
-    def insert_title(self, title: str):
-        self.my_cursor.execute(
-            "INSERT INTO removed_movies (title) VALUES (%s)", (title,)
-        )
-        self.db_connection.commit()
-        LOG.info(f'{title} inserted to removed_movies table')
-        return True
-
-    def select_titles(self):
-        self.my_cursor.execute(
-            "SELECT * FROM removed_movies"
-        )
-        return self.my_cursor.fetchall()
-
-    def delete_movie(self, title: str):
-        self.my_cursor.execute(
-            f"DELETE FROM removed_movies WHERE (title = '{title}')"
-        )
-        self.db_connection.commit()
-        LOG.info(f'{title} removed from removed_movies table')
-        return True
-
-
-class TOP250Table:
-
-    def __init__(self, parent):
-        self.db_connection = parent
-        self.removed_movies_db = RemovedMoviesTable(parent)
-
-        self.my_cursor = parent.my_cursor
-
-        try:  # check if table exists, if not - create one.
-            self.select_all()
-        except:
-            LOG.error('table not exists')
-            # self.create_table(table_name='top250')
-
-        LOG.info('TOP250Table object created successfully')
-
-    def create_table(self, table_name: str = False):
-        self.my_cursor.execute(
-            f"CREATE TABLE `{table_name}` (`place` int, `title` text, `year` int, `rating` float, `reviewers` text, "
-            f"`seen_status` bool, `link` text)"
-        )
-
-    def rename_table(self, old_name, new_name):
-        self.my_cursor.execute(
-            f"ALTER TABLE {old_name} RENAME {new_name}"
-        )
-        LOG.info(f'table {old_name} renamed to {new_name}')
-
-    def get_only_new_movies(self):
-        get_new_movies_query = "SELECT u.place, u.title, u.year, u.rating, u.reviewers, t.seen_status, u.link " \
-                               "FROM top250_update u " \
-                               "LEFT JOIN old_top250 t USING (title) " \
-                               "LEFT JOIN removed_movies rm USING (title) " \
-                               "WHERE t.title IS NULL " \
-                               "AND " \
-                               "rm.title IS NULL " \
-                               "ORDER BY place"
-
-        self.my_cursor.execute(
-            get_new_movies_query
-        )
-
-        new_movies = self.my_cursor.fetchall()
-        return new_movies
-
-    def establish_new_top250_updated_table(self):
-        get_updated_table_query = "SELECT u.place, u.title, u.year, u.rating, u.reviewers, t.seen_status, u.link " \
-                                  "FROM top250_update u " \
-                                  "LEFT JOIN old_top250 t USING (title) " \
-                                  "WHERE title NOT IN (select title from removed_movies WHERE title IS NOT NULL) " \
-                                  "ORDER BY place"
-        self.create_table('new_top250')
-        self.my_cursor.execute("INSERT INTO new_top250 "
-                               "( "
-                               f"{get_updated_table_query} "
-                               ")")
-
-    @staticmethod
-    def log_new_added_movies(new_movies):
-        if len(new_movies) > 0:
-            for movie in new_movies:
-                place, title, year, rating, reviewers, seen_status, link = movie
-                LOG.info(f'inserted new movie to db: #{place}/ {title} / {year} / {rating} / {link}')
-
-    def update_movies_table(self):
-        self.rename_table('top250', 'old_top250')
-        new_movies = self.get_only_new_movies()
-        self.establish_new_top250_updated_table()
-        self.rename_table('new_top250', 'top250')
-
-        self.drop_table(table_name='top250_update')
-        self.drop_table(table_name='old_top250')
-
-        self.log_new_added_movies(new_movies)
-
-        self.db_connection.commit()
-        LOG.info('top250 table updated')
-        return new_movies
-
-    def drop_table(self, table_name: str):
-        self.my_cursor.execute(
-            f"DROP TABLE {table_name}"
-        )
-        LOG.info(f'table `{table_name}` dropped')
-
-    def insert_movie(self, values: list, table_name: str = None):
-        place, title, year, rating, reviewers, seen_status, link = values
-
-        self.my_cursor.execute(
-            f"INSERT INTO {table_name} (place, title, year, rating, reviewers, seen_status, link)"
-            f" VALUES (%s, %s, %s, %s, %s, %s, %s)", (place, title, year, rating, reviewers, seen_status, link,)
-        )
-        self.db_connection.commit()
-
-    def update_seen_status(self, place: int = None, title: str = None, seen_status: bool = None):
-        if title:
-            self.my_cursor.execute(
-                "UPDATE top250 SET seen_status = %s WHERE title = %s", (seen_status, title)
-            )
-            LOG.info(f'{title} seen status has been updated')
-
-        else:
-            self.my_cursor.execute(
-                "UPDATE top250 SET seen_status = %s WHERE place = %s", (seen_status, place)
-            )
-            LOG.info(f'movie seen status in place {place} has been updated')
-
-        self.db_connection.commit()
-        return self.select_by_place()
-
-    def select_by_place(self, place: int = None):
-        self.my_cursor.execute(
-            "SELECT * FROM top250 WHERE place = %s", (place,)
-        )
-        return self.my_cursor.fetchone()
-
-    def select_by_title(self, title: str = None):
-        self.my_cursor.execute(
-            "SELECT * FROM top250 WHERE title = %s", (title,)
-        )
-        return self.my_cursor.fetchone()
-
-    def select_by_cols(self, columns: list = None):
-        columns_as_str = ', '.join(columns)
-        self.my_cursor.execute(
-            f"SELECT {columns_as_str} FROM top250"
-        )
-        return self.my_cursor.fetchall()
-
-    def select_all(self):
-        self.my_cursor.execute(
-            "SELECT * FROM top250"
-        )
-        return self.my_cursor.fetchall()
-
-    def select_all_non_seen_status(self):
-        self.my_cursor.execute(
-            "SELECT title, seen_status FROM top250 WHERE seen_status is null"
-        )
-        return self.my_cursor.fetchall()
-
-    def select_unseen_titles(self):
-        self.my_cursor.execute(
-            "SELECT * FROM top250 t WHERE seen_status is null or seen_status is False"
-        )
-        return self.my_cursor.fetchall()
-
-    def delete_movie(self, place: int = None, title: str = None):
-        if place and self.select_by_place(place=place):
-            title = self.select_by_place(place=place)[1]
-            self.my_cursor.execute(
-                "DELETE FROM top250 WHERE (place = %s)", (place,)
-            )
-            self.removed_movies_db.insert_title(title=title)
-            LOG.info(f'movie in place {place} removed from top250 table')
-
-        elif title and self.select_by_title(title=title):
-            self.my_cursor.execute(
-                "DELETE FROM top250 WHERE (title = %s)", (title,)
-            )
-            self.removed_movies_db.insert_title(title=title)
-            LOG.info(f'{title} removed from top250 table')
-
-        self.db_connection.commit()
-        return title
+        return backup_path
@@ -0,0 +1,190 @@
+"""
+Embedded SQLite storage backend, no database server needed.
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from database.storage import Dialect, Storage
+
+LOG = logging.getLogger('SQLite.DB.Logger')
+handler = logging.StreamHandler(sys.stdout)
+LOG.addHandler(handler)
+
+DB_NAME = 'imdb'
+DB_PATH = 'database'
+
+SQLITE_DIALECT = Dialect(
+    name='sqlite',
+    insert_ignore='INSERT OR IGNORE',
+    upsert_state="INSERT INTO updater_state (name, value) VALUES (%s, %s) "
+                 "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+    table_exists="SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s",
+    column_exists="SELECT name FROM pragma_table_info(%s) WHERE name = %s",
+    movies_table_ddl=(
+        "CREATE TABLE `{table_name}` (`place` int, `title` varchar(255), `year` int, `rating` float, "
+        "`reviewers` varchar(32), `seen_status` bool, `link` varchar(255), `movie_id` int NOT NULL, "
+        "PRIMARY KEY (`movie_id`))",
+        "CREATE UNIQUE INDEX `{table_name}_place` ON `{table_name}` (`place`)",
+        "CREATE INDEX `{table_name}_title` ON `{table_name}` (`title`)",
+        "CREATE INDEX `{table_name}_seen_status` ON `{table_name}` (`seen_status`)",
+    ),
+    removed_movies_table_ddl=(
+        "CREATE TABLE `removed_movies` (`movie_id` int, `title` varchar(255) NOT NULL)",
+        "CREATE UNIQUE INDEX `removed_movies_movie_id` ON `removed_movies` (`movie_id`)",
+        "CREATE INDEX `removed_movies_title` ON `removed_movies` (`title`)",
+    ),
+    chart_entries_table_ddl=(
+        "CREATE TABLE IF NOT EXISTS `chart_entries` (`chart_id` varchar(64) NOT NULL, `place` int NOT NULL, "
+        "`movie_id` int NOT NULL, `title` varchar(255), `year` int, `rating` float, `reviewers` varchar(32), "
+        "`link` varchar(255), PRIMARY KEY (`chart_id`, `movie_id`))",
+        "CREATE INDEX IF NOT EXISTS `chart_entries_chart_place` ON `chart_entries` (`chart_id`, `place`)",
+    ),
+    movie_history_table_ddl=(
+        "CREATE TABLE IF NOT EXISTS `movie_history` (`chart_id` varchar(64) NOT NULL, `movie_id` int NOT NULL, "
+        "`snapshot_at` int NOT NULL, `place` int, `rating` float, PRIMARY KEY (`chart_id`, `movie_id`, `snapshot_at`))",
+        "CREATE INDEX IF NOT EXISTS `movie_history_chart_snapshot` ON `movie_history` (`chart_id`, `snapshot_at`)",
+    ),
+    user_lists_table_ddl=(
+        "CREATE TABLE IF NOT EXISTS `users` (`user_id` varchar(64) NOT NULL, `email` varchar(255), "
+        "`chart_id` varchar(64) NOT NULL, PRIMARY KEY (`user_id`))",
+        "CREATE INDEX IF NOT EXISTS `users_chart_id` ON `users` (`chart_id`)",
+        "CREATE TABLE IF NOT EXISTS `user_movies` (`user_id` varchar(64) NOT NULL, `movie_id` int NOT NULL, "
+        "`seen_status` bool, PRIMARY KEY (`user_id`, `movie_id`))",
+        "CREATE INDEX IF NOT EXISTS `user_movies_movie_id` ON `user_movies` (`movie_id`)",
+        "CREATE TABLE IF NOT EXISTS `user_removed` (`user_id` varchar(64) NOT NULL, `movie_id` int NOT NULL, "
+        "`title` varchar(255), PRIMARY KEY (`user_id`, `movie_id`))",
+    ),
+)
+
+
+class SQLiteCursor:
+    """sqlite3 cursor taking the %s placeholders used by the table classes."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, query: str, params=()):
+        return self._cursor.execute(query.replace('%s', '?'), params)
+
+    def executemany(self, query: str, seq_of_params):
+        return self._cursor.executemany(query.replace('%s', '?'), seq_of_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection(Storage):
+    """
+    Single SQLite connection in WAL mode, shared by all threads.
+    Sessions are serialized by a lock, SQLite allows one writer at a time anyway.
+    """
+    dialect = SQLITE_DIALECT
+
+    def __init__(self, db_name: str = DB_NAME, path: str = DB_PATH):
+        """
+        :param db_name: file name without extension, ':memory:' keeps the database in memory.
+        :param path: directory of database file.
+        """
+        if db_name is None:
+            self.db_name = DB_NAME
+        else:
+            self.db_name = db_name
+
+        if self.db_name == ':memory:':
+            self.db_file = ':memory:'
+        else:
+            self.db_file = os.path.join(path, f'{self.db_name}.sqlite3')
+
+        self.my_connection = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+        self.create_database()
+
+        LOG.info('SQLiteConnection object created successfully')
+
+    def create_database(self):
+        if self.my_connection is not None:
+            return
+
+        if self.db_file != ':memory:':
+            os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+
+        # autocommit mode, transactions are opened by session()
+        self.my_connection = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        self.my_connection.execute("PRAGMA journal_mode=WAL")
+        self.my_connection.execute("PRAGMA synchronous=NORMAL")
+
+    @contextmanager
+    def session(self):
+        """
+        Transaction committed on success and rolled back on error.
+        Nested sessions in the same thread join the outer transaction.
+        """
+        my_cursor = getattr(self._local, 'cursor', None)
+        if my_cursor is not None:
+            yield my_cursor
+            return
+
+        with self._lock:
+            my_cursor = SQLiteCursor(self.my_connection.cursor())
+            self._local.cursor = my_cursor
+            self._local.session_callbacks = []
+            my_cursor.execute("BEGIN")
+            try:
+                yield my_cursor
+                my_cursor.execute("COMMIT")
+            except Exception:
+                my_cursor.execute("ROLLBACK")
+                raise
+            finally:
+                self._local.cursor = None
+                my_cursor.close()
+                self._run_session_callbacks()
+
+    def health_check(self) -> bool:
+        try:
+            with self.session() as my_cursor:
+                my_cursor.execute("SELECT 1")
+                return my_cursor.fetchone() == (1,)
+        except sqlite3.Error:
+            LOG.exception('Database health check failed')
+            return False
+
+    def drop_database(self):
+        self.close_connection()
+        if self.db_file != ':memory:':
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.db_file + suffix):
+                    os.remove(self.db_file + suffix)
+        LOG.info(f'database {self.db_name} dropped')
+
+    def close_connection(self):
+        if self.my_connection is not None:
+            self.my_connection.close()
+            self.my_connection = None
+
+    def backup_database(self) -> str:
+        backup_path = os.path.join(os.path.dirname(self.db_file) or DB_PATH, f'{self.db_name}_backup.sqlite3')
+        backup_connection = sqlite3.connect(backup_path)
+        with self._lock:
+            self.my_connection.backup(backup_connection)
+        backup_connection.close()
+
+        LOG.info('Database backup completed')
+        return backup_path
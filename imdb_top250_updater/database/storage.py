@@ -0,0 +1,101 @@
+"""
+Storage backends interface.
+Table classes in database.tables run the same queries on every backend, with %s placeholders,
+only the SQL that differs between engines comes from the backend Dialect.
+
+Backends:
+    'mysql' - database.mysql_db.DBConnection, MySQL server with a connection pool.
+    'sqlite' - database.sqlite_db.SQLiteConnection, embedded file database in WAL mode, no server needed.
+"""
+
+import importlib
+from typing import NamedTuple
+
+
+class Dialect(NamedTuple):
+    name: str
+    insert_ignore: str  # insert keyword skipping rows that break a unique key
+    upsert_state: str  # insert or update one (name, value) row of updater_state table
+    table_exists: str  # query returning a row if table named %s exists
+    column_exists: str  # query returning a row if table named %s has column named %s
+    movies_table_ddl: tuple  # statements, formatted with table_name
+    removed_movies_table_ddl: tuple
+    # tables below are created by upgrade steps of database.migrations, statements skip existing tables and indexes
+    chart_entries_table_ddl: tuple
+    movie_history_table_ddl: tuple
+    user_lists_table_ddl: tuple  # users, user_movies and user_removed tables
+
+
+class Storage:
+    """
+    Base class of database backends.
+    All queries run inside session(), a transaction committed on success and rolled back on error:
+
+        with storage.session() as cursor:
+            cursor.execute("SELECT title FROM top250 WHERE place = %s", (1,))
+    """
+    dialect: Dialect = None
+    db_name: str = None
+
+    def session(self):
+        raise NotImplementedError
+
+    def health_check(self) -> bool:
+        raise NotImplementedError
+
+    def create_database(self):
+        raise NotImplementedError
+
+    def drop_database(self):
+        raise NotImplementedError
+
+    def close_connection(self):
+        raise NotImplementedError
+
+    def backup_database(self) -> str:
+        """:return: path of backup file."""
+        raise NotImplementedError
+
+    def on_session_end(self, callback):
+        """
+        Run callback once the outermost session of this thread is committed or rolled back,
+        right away when no session is open.
+        """
+        callbacks = getattr(self._local, 'session_callbacks', None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    def _run_session_callbacks(self):
+        """Called by backends when the outermost session ended, after commit or rollback."""
+        callbacks, self._local.session_callbacks = self._local.session_callbacks, None
+        for callback in callbacks:
+            callback()
+
+    def table_exists(self, table_name: str) -> bool:
+        with self.session() as my_cursor:
+            my_cursor.execute(self.dialect.table_exists, (table_name,))
+            return my_cursor.fetchone() is not None
+
+
+BACKENDS = {
+    'mysql': ('database.mysql_db', 'DBConnection'),
+    'sqlite': ('database.sqlite_db', 'SQLiteConnection'),
+}
+
+
+def create_storage(backend: str = 'mysql', **kwargs) -> Storage:
+    """
+    Connect to database backend, backend modules are imported only when used,
+    so sqlite deployments do not need mysql-connector installed.
+    :param backend: 'mysql' or 'sqlite'
+    :param kwargs: backend connection arguments, example: db_name='imdb'
+    """
+    try:
+        module_name, class_name = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f'Unknown storage backend: {backend}, choose from {list(BACKENDS)}')
+
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)(**kwargs)
@@ -0,0 +1,806 @@
+"""
+Tables of the movies database, shared by all storage backends (see database.storage).
+Schema is created and upgraded by database.migrations.SchemaMigrator, run by TOP250Table,
+so TOP250Table is created before the other tables.
+"""
+
+import functools
+import logging
+import sys
+import threading
+import time
+
+from database.changes import ChangeSet, diff_movies, same_rating
+from database.migrations import SchemaMigrator
+from logs.metrics import increment, timed
+
+LOG = logging.getLogger('IMDB.DB.Logger')
+handler = logging.StreamHandler(sys.stdout)
+LOG.addHandler(handler)
+
+MOVIE_COLUMNS = 'place, title, year, rating, reviewers, seen_status, link, movie_id'
+MOVIE_COLUMN_INDEXES = {column: index for index, column in enumerate(MOVIE_COLUMNS.split(', '))}
+
+
+def invalidates_cache(func):
+    """
+    Drop cached rows of TOP250Table when a write starts and again when its transaction is committed
+    or rolled back, rows loaded while the transaction is open are not kept.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.db_connection.session():
+            self.begin_write()
+            self.db_connection.on_session_end(self.end_write)
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+class RemovedMoviesTable:
+    """
+    should be manged directly through Top250Table object
+    """
+
+    def __init__(self, parent):
+        self.db_connection = parent
+
+        try:  # check if table exists, if not - create one.
+            self.select_ids()
+        except:
+            LOG.error('table not exists, creating removed movies table now...')
+            self.create_table()
+
+        LOG.info('RemovedMoviesTable object created successfully')
+
+    def create_table(self):
+        with self.db_connection.session() as my_cursor:
+            for statement in self.db_connection.dialect.removed_movies_table_ddl:
+                my_cursor.execute(statement)
+
+    def insert_movie(self, movie_id: int, title: str):
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                f"{self.db_connection.dialect.insert_ignore} INTO removed_movies (movie_id, title) VALUES (%s, %s)",
+                (movie_id, title)
+            )
+        LOG.info(f'{title} inserted to removed_movies table')
+        return True
+
+    def insert_movies(self, movies: list):
+        """
+        :param movies: list of (movie_id, title), movie_id may be None for titles imported from old databases.
+        """
+        movies = [tuple(movie) for movie in movies]
+        if not movies:
+            return 0
+
+        with self.db_connection.session() as my_cursor:
+            my_cursor.executemany(
+                f"{self.db_connection.dialect.insert_ignore} INTO removed_movies (movie_id, title) VALUES (%s, %s)",
+                movies
+            )
+
+        LOG.info(f'{len(movies)} movies inserted to removed_movies table')
+        return len(movies)
+
+    def select_titles(self):
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT title FROM removed_movies"
+            )
+            return my_cursor.fetchall()
+
+    def select_ids(self) -> set:
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT movie_id FROM removed_movies WHERE movie_id IS NOT NULL"
+            )
+            return {movie_id for movie_id, in my_cursor.fetchall()}
+
+    def select_titles_without_id(self) -> set:
+        """Titles removed before movies were keyed by imdb id."""
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT title FROM removed_movies WHERE movie_id IS NULL"
+            )
+            return {title for title, in my_cursor.fetchall()}
+
+    def set_movie_ids(self, movies: list):
+        """
+        Fill imdb id of old title only rows once the title is seen again in the chart.
+        :param movies: list of (movie_id, title)
+        """
+        if movies:
+            with self.db_connection.session() as my_cursor:
+                my_cursor.executemany(
+                    "UPDATE removed_movies SET movie_id = %s WHERE title = %s AND movie_id IS NULL", movies
+                )
+
+    def delete_movie(self, title: str = None, movie_id: int = None):
+        with self.db_connection.session() as my_cursor:
+            if movie_id:
+                my_cursor.execute(
+                    "DELETE FROM removed_movies WHERE movie_id = %s", (movie_id,)
+                )
+            else:
+                my_cursor.execute(
+                    "DELETE FROM removed_movies WHERE title = %s", (title,)
+                )
+        LOG.info(f'{title or movie_id} removed from removed_movies table')
+        return True
+
+
+class StateTable:
+    """
+    Key value store for updater state between runs, example: last chart fingerprint.
+    """
+
+    def __init__(self, parent):
+        self.db_connection = parent
+        LOG.info('StateTable object created successfully')
+
+    def get_value(self, name: str):
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT value FROM updater_state WHERE name = %s", (name,)
+            )
+            row = my_cursor.fetchone()
+        return row[0] if row else None
+
+    def set_value(self, name: str, value: str):
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                self.db_connection.dialect.upsert_state, (name, value)
+            )
+        return True
+
+
+class MovieHistoryTable:
+    """
+    Append only place and rating history of chart movies, should be manged directly through ChartEntriesTable object.
+    A snapshot stores only movies whose place or rating changed since the previous one (place NULL when
+    a movie left the chart), so an hourly run with an unchanged chart writes nothing.
+    Values of a movie at any time are those of its latest row at or before that time.
+    """
+
+    def __init__(self, parent):
+        self.db_connection = parent
+        LOG.info('MovieHistoryTable object created successfully')
+
+    @staticmethod
+    def snapshot_deltas(old_rows: dict, new_rows: dict) -> list:
+        """
+        :param old_rows: dict of movie_id -> (place, rating) of previous snapshot.
+        :param new_rows: dict of movie_id -> (place, rating) of current chart.
+        :return: list of (movie_id, place, rating) to append.
+        """
+        deltas = []
+        for movie_id, (place, rating) in new_rows.items():
+            old = old_rows.get(movie_id)
+            if old is None or old[0] != place or not same_rating(old[1], rating):
+                deltas.append((movie_id, place, rating))
+
+        deltas.extend((movie_id, None, None) for movie_id in old_rows.keys() - new_rows.keys())
+        return deltas
+
+    @timed('db_query_seconds', table='movie_history')
+    def insert_snapshot(self, chart_id: str, old_rows: dict, new_rows: dict, snapshot_at: int = None) -> int:
+        """
+        :param snapshot_at: unix time, now when not given.
+        :return: number of appended rows.
+        """
+        snapshot_at = int(time.time()) if snapshot_at is None else snapshot_at
+        deltas = self.snapshot_deltas(old_rows, new_rows)
+
+        if deltas:
+            with self.db_connection.session() as my_cursor:
+                my_cursor.executemany(
+                    f"{self.db_connection.dialect.insert_ignore} INTO movie_history "
+                    "(chart_id, movie_id, snapshot_at, place, rating) VALUES (%s, %s, %s, %s, %s)",
+                    [(chart_id, movie_id, snapshot_at, place, rating) for movie_id, place, rating in deltas]
+                )
+
+        LOG.info(f'{len(deltas)} history changes stored for chart {chart_id}')
+        return len(deltas)
+
+    def has_snapshots(self, chart_id: str) -> bool:
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT 1 FROM movie_history WHERE chart_id = %s LIMIT 1", (chart_id,)
+            )
+            return my_cursor.fetchone() is not None
+
+    @timed('db_query_seconds', table='movie_history')
+    def select_trajectory(self, chart_id: str, movie_id: int, since: int = 0, until: int = None) -> list:
+        """
+        Place and rating changes of movie, including the values it had at since.
+        :param since: unix time.
+        :param until: unix time, now when not given.
+        :return: list of (snapshot_at, place, rating) ordered by time, place is None while out of chart.
+        """
+        until = int(time.time()) if until is None else until
+
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT snapshot_at, place, rating FROM movie_history "
+                "WHERE chart_id = %s AND movie_id = %s AND snapshot_at >= COALESCE("
+                "(SELECT MAX(snapshot_at) FROM movie_history "
+                "WHERE chart_id = %s AND movie_id = %s AND snapshot_at <= %s), %s) "
+                "AND snapshot_at <= %s ORDER BY snapshot_at",
+                (chart_id, movie_id, chart_id, movie_id, since, since, until)
+            )
+            return my_cursor.fetchall()
+
+    @timed('db_query_seconds', table='movie_history')
+    def select_changes_since(self, chart_id: str, since: int) -> list:
+        """
+        Movies in chart now that were in chart at since.
+        :return: list of (movie_id, title, place at since, place, rating at since, rating)
+        """
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT c.movie_id, c.title, h.place, c.place, h.rating, c.rating FROM chart_entries c "
+                "JOIN movie_history h ON h.chart_id = c.chart_id AND h.movie_id = c.movie_id "
+                "WHERE c.chart_id = %s AND h.place IS NOT NULL AND h.snapshot_at = "
+                "(SELECT MAX(last.snapshot_at) FROM movie_history last "
+                "WHERE last.chart_id = c.chart_id AND last.movie_id = c.movie_id AND last.snapshot_at <= %s)",
+                (chart_id, since)
+            )
+            return my_cursor.fetchall()
+
+
+class ChartEntriesTable:
+    """
+    Membership of movies in every scraped chart, keyed by (chart_id, movie_id), see updater.charts.
+    """
+
+    def __init__(self, parent):
+        self.db_connection = parent
+        self.history_db = MovieHistoryTable(parent)
+        LOG.info('ChartEntriesTable object created successfully')
+
+    @timed('db_query_seconds', table='chart_entries')
+    def replace_chart(self, chart_id: str, rows, snapshot_at: int = None) -> int:
+        """
+        Store current titles of chart, replacing the previous ones in one transaction,
+        place and rating changes are appended to movie_history table.
+        :param rows: iterable of [place, title, year, rating, reviewers, seen_status, link, movie_id]
+        :param snapshot_at: unix time of history snapshot, now when not given.
+        :return: number of stored rows
+        """
+        entries = [(chart_id, row[0], row[7], row[1], row[2], row[3], row[4], row[6]) for row in rows]
+
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT movie_id, place, rating FROM chart_entries WHERE chart_id = %s", (chart_id,)
+            )
+            old_rows = {movie_id: (place, rating) for movie_id, place, rating in my_cursor.fetchall()}
+            if not self.history_db.has_snapshots(chart_id):
+                old_rows = {}  # first snapshot of chart stores all rows
+            new_rows = {entry[2]: (entry[1], entry[5]) for entry in entries}
+            self.history_db.insert_snapshot(chart_id, old_rows, new_rows, snapshot_at=snapshot_at)
+
+            my_cursor.execute(
+                "DELETE FROM chart_entries WHERE chart_id = %s", (chart_id,)
+            )
+            if entries:
+                my_cursor.executemany(
+                    "INSERT INTO chart_entries (chart_id, place, movie_id, title, year, rating, reviewers, link) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", entries
+                )
+
+        LOG.info(f'{len(entries)} movies stored for chart {chart_id}')
+        return len(entries)
+
+    @timed('db_query_seconds', table='chart_entries')
+    def select_chart(self, chart_id: str) -> list:
+        """:return: rows of chart ordered by place, seen_status is always None."""
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT place, title, year, rating, reviewers, NULL, link, movie_id FROM chart_entries "
+                "WHERE chart_id = %s ORDER BY place", (chart_id,)
+            )
+            return my_cursor.fetchall()
+
+    @timed('db_query_seconds', table='chart_entries')
+    def select_charts_of_movie(self, movie_id: int) -> list:
+        """:return: list of (chart_id, place)"""
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT chart_id, place FROM chart_entries WHERE movie_id = %s ORDER BY chart_id", (movie_id,)
+            )
+            return my_cursor.fetchall()
+
+
+USER_LIST_QUERY = (
+    "SELECT c.place, c.title, c.year, c.rating, c.reviewers, m.seen_status, c.link, c.movie_id FROM users u "
+    "JOIN user_movies m ON m.user_id = u.user_id "
+    "JOIN chart_entries c ON c.chart_id = u.chart_id AND c.movie_id = m.movie_id "
+    "WHERE u.user_id = %s"
+)
+
+# chart movies missing from list of each user, skipping movies the user removed
+NEW_USER_MOVIES_QUERY = (
+    "SELECT u.user_id, u.filter_profile, c.place, c.title, c.year, c.rating, c.reviewers, NULL, c.link, c.movie_id FROM users u "
+    "JOIN chart_entries c ON c.chart_id = u.chart_id "
+    "WHERE {condition} "
+    "AND NOT EXISTS (SELECT 1 FROM user_movies m WHERE m.user_id = u.user_id AND m.movie_id = c.movie_id) "
+    "AND NOT EXISTS (SELECT 1 FROM user_removed r WHERE r.user_id = u.user_id AND r.movie_id = c.movie_id) "
+    "ORDER BY u.user_id, c.place"
+)
+
+
+class UserListsTable:
+    """
+    Personal movie lists of many users sharing one scraped catalog (chart_entries table),
+    so a chart is scraped and stored once however many users follow it.
+    Users keep only their own state: seen status in user_movies and removed titles in user_removed,
+    movie details always come from chart_entries.
+    chart_entries holds the whole chart, every user list is filtered with the filter profile of its user.
+    """
+
+    def __init__(self, parent):
+        self.db_connection = parent
+        LOG.info('UserListsTable object created successfully')
+
+    def add_user(self, user_id: str, email: str, chart_id: str, filter_profile: str = None,
+                 row_filter=None) -> list:
+        """
+        Add user following chart, the list is filled from stored chart entries right away.
+        :param filter_profile: name of filter profile of list, None for the default profile.
+        :param row_filter: see add_new_movies.
+        :return: rows of new list.
+        """
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "INSERT INTO users (user_id, email, chart_id, filter_profile) VALUES (%s, %s, %s, %s)",
+                (user_id, email, chart_id, filter_profile)
+            )
+            new_movies = self.add_new_movies(user_id=user_id, row_filter=row_filter)
+
+        LOG.info(f'user {user_id} added following chart {chart_id}')
+        return new_movies.get(user_id, [])
+
+    def select_users(self, chart_id: str = None) -> list:
+        """:return: list of (user_id, email, chart_id, filter_profile)"""
+        with self.db_connection.session() as my_cursor:
+            if chart_id:
+                my_cursor.execute(
+                    "SELECT user_id, email, chart_id, filter_profile FROM users WHERE chart_id = %s "
+                    "ORDER BY user_id", (chart_id,)
+                )
+            else:
+                my_cursor.execute(
+                    "SELECT user_id, email, chart_id, filter_profile FROM users ORDER BY user_id"
+                )
+            return my_cursor.fetchall()
+
+    @timed('db_query_seconds', table='user_movies')
+    def add_new_movies(self, chart_id: str = None, user_id: str = None, row_filter=None) -> dict:
+        """
+        Sync lists with stored chart entries for all users of chart (or one user) with set based queries:
+        movies that left the chart are dropped and new chart movies are added, in one transaction.
+        Call after chart_entries of chart is replaced.
+        :param row_filter: callable(filter profile name, rows) -> kept rows, applied to new movies of every user,
+        all new movies are added when not given.
+        :return: dict of user_id -> list of added rows, users without new movies are left out.
+        """
+        if user_id:
+            condition, params = "u.user_id = %s", (user_id,)
+        else:
+            condition, params = "u.chart_id = %s", (chart_id,)
+
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "DELETE FROM user_movies WHERE user_id IN (SELECT u.user_id FROM users u WHERE " + condition + ") "
+                "AND NOT EXISTS (SELECT 1 FROM users u JOIN chart_entries c ON c.chart_id = u.chart_id "
+                "WHERE u.user_id = user_movies.user_id AND c.movie_id = user_movies.movie_id)", params
+            )
+            my_cursor.execute(NEW_USER_MOVIES_QUERY.format(condition=condition), params)
+
+            new_movies, filter_profiles = {}, {}
+            for row in my_cursor.fetchall():
+                new_movies.setdefault(row[0], []).append(tuple(row[2:]))
+                filter_profiles[row[0]] = row[1]
+
+            if row_filter is not None:
+                new_movies = {user: [tuple(row) for row in row_filter(filter_profiles[user], movies)]
+                              for user, movies in new_movies.items()}
+                new_movies = {user: movies for user, movies in new_movies.items() if movies}
+
+            if new_movies:
+                my_cursor.executemany(
+                    "INSERT INTO user_movies (user_id, movie_id, seen_status) VALUES (%s, %s, NULL)",
+                    [(user, row[7]) for user, movies in new_movies.items() for row in movies]
+                )
+
+        LOG.info(f'{sum(map(len, new_movies.values()))} new movies added to lists of {len(new_movies)} users')
+        return new_movies
+
+    @timed('db_query_seconds', table='user_movies')
+    def select_list(self, user_id: str) -> list:
+        """:return: rows of user list ordered by place, same columns as top250 table."""
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(USER_LIST_QUERY + " ORDER BY c.place", (user_id,))
+            return my_cursor.fetchall()
+
+    @timed('db_query_seconds', table='user_movies')
+    def select_unseen_titles(self, user_id: str) -> list:
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                USER_LIST_QUERY + " AND (m.seen_status is null or m.seen_status is False) ORDER BY c.place",
+                (user_id,)
+            )
+            return my_cursor.fetchall()
+
+    def select_by_places(self, user_id: str, places: list) -> list:
+        """:return: list of (place, title, movie_id)"""
+        placeholders = ', '.join(['%s'] * len(places))
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                "SELECT c.place, c.title, c.movie_id FROM users u "
+                "JOIN user_movies m ON m.user_id = u.user_id "
+                "JOIN chart_entries c ON c.chart_id = u.chart_id AND c.movie_id = m.movie_id "
+                f"WHERE u.user_id = %s AND c.place IN ({placeholders})", [user_id, *places]
+            )
+            return my_cursor.fetchall()
+
+    @timed('db_query_seconds', table='user_movies')
+    def update_seen_statuses(self, user_id: str, places, seen_status: bool = True) -> dict:
+        """
+        Set seen status of many movies in user list with one UPDATE.
+        :param places: iterable of int, chart places.
+        :return: dict of place -> title for places found in list.
+        """
+        places = sorted(set(places))
+        if not places:
+            return {}
+
+        with self.db_connection.session() as my_cursor:
+            movies = self.select_by_places(user_id, places)
+            if movies:
+                placeholders = ', '.join(['%s'] * len(movies))
+                my_cursor.execute(
+                    f"UPDATE user_movies SET seen_status = %s WHERE user_id = %s AND movie_id IN ({placeholders})",
+                    [seen_status, user_id, *(movie_id for _, _, movie_id in movies)]
+                )
+
+        LOG.info(f'{len(movies)} movies seen status has been updated for user {user_id}')
+        return {place: title for place, title, _ in movies}
+
+    @timed('db_query_seconds', table='user_movies')
+    def delete_movies(self, user_id: str, places) -> dict:
+        """
+        Remove many movies from user list, removed movies are not added back to this list.
+        :param places: iterable of int, chart places.
+        :return: dict of place -> title for places found in list.
+        """
+        places = sorted(set(places))
+        if not places:
+            return {}
+
+        with self.db_connection.session() as my_cursor:
+            movies = self.select_by_places(user_id, places)
+            if movies:
+                placeholders = ', '.join(['%s'] * len(movies))
+                my_cursor.execute(
+                    f"DELETE FROM user_movies WHERE user_id = %s AND movie_id IN ({placeholders})",
+                    [user_id, *(movie_id for _, _, movie_id in movies)]
+                )
+                my_cursor.executemany(
+                    f"{self.db_connection.dialect.insert_ignore} INTO user_removed (user_id, movie_id, title) "
+                    "VALUES (%s, %s, %s)", [(user_id, movie_id, title) for _, title, movie_id in movies]
+                )
+
+        LOG.info(f'{len(movies)} movies removed from list of user {user_id}')
+        return {place: title for place, title, _ in movies}
+
+
+class MoviesCache:
+    """Identity map of top250 rows, indexed by movie_id, place and title."""
+
+    def __init__(self, rows):
+        self.by_movie_id = {}
+        self.by_place = {}
+        self.by_title = {}
+        for row in rows:
+            self.by_movie_id[row[7]] = row
+            self.by_place[row[0]] = row
+            self.by_title.setdefault(row[1], row)  # first match, like WHERE title = %s
+
+    def rows(self) -> list:
+        """All rows ordered by place."""
+        return sorted(self.by_movie_id.values(), key=lambda row: (row[0] is None, row[0] or 0))
+
+
+class TOP250Table:
+    """
+    Lookups (select_*) are served from rows loaded with one SELECT and cached until the next write,
+    so the report and reply actions do not query the database per movie.
+    """
+
+    def __init__(self, parent):
+        self.db_connection = parent
+        self.schema_version = SchemaMigrator(parent).migrate()
+        self.removed_movies_db = RemovedMoviesTable(parent)
+        self._cache = None
+        self._cache_generation = 0  # bumped by every write, rows loaded during a write are not kept
+        self._open_writes = 0  # write transactions not committed or rolled back yet
+        self._writes_lock = threading.Lock()
+
+        try:  # check if table exists, if not - create one.
+            self.select_all()
+        except:
+            LOG.error('table not exists')
+            # self.create_table(table_name='top250')
+
+        LOG.info('TOP250Table object created successfully')
+
+    @invalidates_cache
+    def create_table(self, table_name: str = False):
+        with self.db_connection.session() as my_cursor:
+            for statement in self.db_connection.dialect.movies_table_ddl:
+                my_cursor.execute(statement.format(table_name=table_name))
+
+    @staticmethod
+    def log_new_added_movies(new_movies):
+        if len(new_movies) > 0:
+            for movie in new_movies:
+                place, title, year, rating, reviewers, seen_status, link, movie_id = movie
+                LOG.info(f'inserted new movie to db: #{place}/ {title} / {year} / {rating} / {link}')
+
+    def diff_chart(self, rows) -> tuple:
+        """
+        Changes update_movies_table would apply, nothing is written.
+        :param rows: iterable of [place, title, year, rating, reviewers, seen_status, link, movie_id]
+        :return: (ChangeSet, list of (movie_id, title) of removed movies found by title)
+        """
+        with self.db_connection.session():
+            removed_ids = self.removed_movies_db.select_ids()
+
+            # titles removed before movies had ids, matched by title one last time
+            removed_titles = self.removed_movies_db.select_titles_without_id()
+            found_removed = [(row[7], row[1]) for row in rows if row[1] in removed_titles]
+            removed_ids.update(movie_id for movie_id, _ in found_removed)
+
+            return diff_movies(self.select_all(), rows, removed_ids), found_removed
+
+    @invalidates_cache
+    @timed('db_query_seconds', table='top250')
+    def update_movies_table(self, rows) -> ChangeSet:
+        """
+        Merge scraped chart rows into top250 table, applying only the delta in one transaction.
+        :param rows: iterable of [place, title, year, rating, reviewers, seen_status, link, movie_id]
+        :return: ChangeSet of added, dropped, moved and re-rated movies.
+        """
+        rows = [tuple(row) for row in rows]
+        self.invalidate_cache()  # diff against rows in database, not rows loaded earlier in this run
+
+        with self.db_connection.session() as my_cursor:
+            changes, found_removed = self.diff_chart(rows)
+
+            if changes.is_empty() and not found_removed:
+                LOG.info('top250 table already up to date')
+                return changes
+
+            self.removed_movies_db.set_movie_ids(found_removed)
+
+            if changes.dropped:
+                my_cursor.executemany(
+                    "DELETE FROM top250 WHERE movie_id = %s", [(row[7],) for row in changes.dropped]
+                )
+
+            updated_rows = changes.updated_rows()
+            if changes.moved:
+                # free moved places first, places are unique and movies may swap them
+                my_cursor.executemany(
+                    "UPDATE top250 SET place = NULL WHERE movie_id = %s", [(row[7],) for _, row in changes.moved]
+                )
+            if updated_rows:
+                my_cursor.executemany(
+                    "UPDATE top250 SET place = %s, rating = %s, reviewers = %s WHERE movie_id = %s",
+                    [(row[0], row[3], row[4], row[7]) for row in updated_rows]
+                )
+
+            if changes.added:
+                my_cursor.executemany(
+                    f"INSERT INTO top250 ({MOVIE_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", changes.added
+                )
+
+        self.log_new_added_movies(changes.added)
+        LOG.info(f'top250 table updated: {changes}')
+        return changes
+
+    @invalidates_cache
+    def drop_table(self, table_name: str):
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                f"DROP TABLE {table_name}"
+            )
+        LOG.info(f'table `{table_name}` dropped')
+
+    def insert_movie(self, values: list, table_name: str = None):
+        self.insert_movies([values], table_name=table_name)
+
+    @invalidates_cache
+    @timed('db_query_seconds', table='top250')
+    def insert_movies(self, rows, table_name: str = None):
+        """
+        Insert many movies with one executemany call (multi-row VALUES) in a single transaction.
+        :param rows: iterable of [place, title, year, rating, reviewers, seen_status, link, movie_id]
+        :param table_name: str
+        :return: number of inserted rows
+        """
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return 0
+
+        with self.db_connection.session() as my_cursor:
+            my_cursor.executemany(
+                f"INSERT INTO {table_name} ({MOVIE_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", rows
+            )
+
+        LOG.info(f'{len(rows)} movies inserted to {table_name} table')
+        return len(rows)
+
+    @invalidates_cache
+    @timed('db_query_seconds', table='top250')
+    def update_seen_status(self, place: int = None, title: str = None, seen_status: bool = None,
+                           movie_id: int = None):
+        """:return: title of updated movie, None if movie is not in table."""
+        if movie_id:
+            movie = self.select_by_movie_id(movie_id=movie_id)
+        elif title:
+            movie = self.select_by_title(title=title)
+        else:
+            movie = self.select_by_place(place=place)
+
+        with self.db_connection.session() as my_cursor:
+            if movie_id:
+                my_cursor.execute(
+                    "UPDATE top250 SET seen_status = %s WHERE movie_id = %s", (seen_status, movie_id)
+                )
+                LOG.info(f'movie tt{movie_id:07d} seen status has been updated')
+
+            elif title:
+                my_cursor.execute(
+                    "UPDATE top250 SET seen_status = %s WHERE title = %s", (seen_status, title)
+                )
+                LOG.info(f'{title} seen status has been updated')
+
+            else:
+                my_cursor.execute(
+                    "UPDATE top250 SET seen_status = %s WHERE place = %s", (seen_status, place)
+                )
+                LOG.info(f'movie seen status in place {place} has been updated')
+
+        return movie[1] if movie else None
+
+    @invalidates_cache
+    @timed('db_query_seconds', table='top250')
+    def update_seen_statuses(self, places, seen_status: bool = True) -> dict:
+        """
+        Set seen status of many movies with one UPDATE.
+        :param places: iterable of int
+        :return: dict of place -> title for places found in table.
+        """
+        places = sorted(set(places))
+        if not places:
+            return {}
+
+        placeholders = ', '.join(['%s'] * len(places))
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                f"SELECT place, title FROM top250 WHERE place IN ({placeholders})", places
+            )
+            titles_by_places = dict(my_cursor.fetchall())
+            my_cursor.execute(
+                f"UPDATE top250 SET seen_status = %s WHERE place IN ({placeholders})", [seen_status, *places]
+            )
+
+        LOG.info(f'{len(titles_by_places)} movies seen status has been updated')
+        return titles_by_places
+
+    def invalidate_cache(self):
+        self._cache_generation += 1
+        self._cache = None
+
+    def begin_write(self):
+        with self._writes_lock:
+            self._open_writes += 1
+            self.invalidate_cache()
+
+    def end_write(self):
+        with self._writes_lock:
+            self._open_writes -= 1
+            self.invalidate_cache()
+
+    @timed('db_query_seconds', table='top250')
+    def load_cache(self) -> MoviesCache:
+        """Rows of top250 table, loaded with one SELECT on first lookup after a write."""
+        cache = self._cache
+        if cache is None:
+            generation = self._cache_generation
+            with self.db_connection.session() as my_cursor:
+                my_cursor.execute(
+                    f"SELECT {MOVIE_COLUMNS} FROM top250"
+                )
+                cache = MoviesCache(my_cursor.fetchall())
+            with self._writes_lock:
+                if generation == self._cache_generation and not self._open_writes:
+                    self._cache = cache
+            increment('db_cache_loads_total', table='top250')
+        return cache
+
+    def select_by_place(self, place: int = None):
+        return self.load_cache().by_place.get(place)
+
+    def select_by_movie_id(self, movie_id: int = None):
+        return self.load_cache().by_movie_id.get(movie_id)
+
+    def select_by_title(self, title: str = None):
+        return self.load_cache().by_title.get(title)
+
+    def select_by_cols(self, columns: list = None):
+        indexes = [MOVIE_COLUMN_INDEXES[column] for column in columns]
+        return [tuple(row[index] for index in indexes) for row in self.load_cache().rows()]
+
+    def select_all(self):
+        return self.load_cache().rows()
+
+    def select_all_non_seen_status(self):
+        return [(row[7], row[1], row[5]) for row in self.load_cache().rows() if row[5] is None]
+
+    def select_unseen_titles(self):
+        return [row for row in self.load_cache().rows() if not row[5]]
+
+    @invalidates_cache
+    @timed('db_query_seconds', table='top250')
+    def delete_movie(self, place: int = None, title: str = None, movie_id: int = None):
+        with self.db_connection.session() as my_cursor:
+            if movie_id:
+                movie = self.select_by_movie_id(movie_id=movie_id)
+            elif place:
+                movie = self.select_by_place(place=place)
+            elif title:
+                movie = self.select_by_title(title=title)
+            else:
+                movie = None
+
+            if movie:
+                title, movie_id = movie[1], movie[7]
+                my_cursor.execute(
+                    "DELETE FROM top250 WHERE (movie_id = %s)", (movie_id,)
+                )
+                self.removed_movies_db.insert_movie(movie_id=movie_id, title=title)
+                LOG.info(f'{title} removed from top250 table')
+
+        return title
+
+    @invalidates_cache
+    @timed('db_query_seconds', table='top250')
+    def delete_movies(self, places) -> dict:
+        """
+        Remove many movies with one DELETE, and keep them in removed_movies table.
+        :param places: iterable of int
+        :return: dict of place -> title for places found in table.
+        """
+        places = sorted(set(places))
+        if not places:
+            return {}
+
+        placeholders = ', '.join(['%s'] * len(places))
+        with self.db_connection.session() as my_cursor:
+            my_cursor.execute(
+                f"SELECT place, title, movie_id FROM top250 WHERE place IN ({placeholders})", places
+            )
+            movies = my_cursor.fetchall()
+            my_cursor.execute(
+                f"DELETE FROM top250 WHERE place IN ({placeholders})", places
+            )
+            self.removed_movies_db.insert_movies([(movie_id, title) for _, title, movie_id in movies])
+
+        LOG.info(f'{len(movies)} movies removed from top250 table')
+        return {place: title for place, title, _ in movies}
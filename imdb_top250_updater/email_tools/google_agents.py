@@ -4,12 +4,13 @@ Note:
     Must login before doing anything else with agents.
 """
 
-__version__ = '1.3'
+__version__ = '1.4'
 
 # v1.0 - first stable release
 # v1.1 - added google calendar class
 # v1.2 - added order_list_items_by_date function
 # v1.3 - added gmail class
+# v1.4 - gmail batch get and delete, search query and history sync
 
 import base64
 import logging
@@ -24,23 +25,31 @@ import keyring
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 from gmail_vars import *
+from logs.metrics import timed
 
 LOG = logging.getLogger('Google.Agents.Logger')
 handler = logging.StreamHandler(sys.stdout)
 LOG.addHandler(handler)
 
+BATCH_SIZE = 50  # gmail api advises at most 50 requests in one batch
+BATCH_DELETE_SIZE = 1000  # max ids of one batchDelete call
+
 
 class GmailAgent:
     """
     https://developers.google.com/gmail/api/quickstart/python
     """
 
-    def __init__(self):
+    def __init__(self, service=None):
+        """
+        :param service: ready gmail api service object, built by login() when not given.
+        """
         LOG.debug('Initialising GmailAgent object')
         self.__credentials = None
-        self.__service = None
+        self.__service = service
         LOG.info('GmailAgent object created successfully')
 
     def login(self):
@@ -70,8 +79,13 @@ class GmailAgent:
         self.__service = build('gmail', 'v1', credentials=self.__credentials)
         return True
 
-    def list_messages_from_inbox(self) -> list:
-        response = self.__service.users().messages().list(userId='me', q='label:inbox ').execute()
+    @timed('gmail_api_seconds')
+    def list_messages(self, query: str = 'label:inbox') -> list:
+        """
+        :param query: gmail search query, example: 'in:inbox subject:"IMDB TOP 250 Updater"'
+        :return: list of {'id': str, 'threadId': str}
+        """
+        response = self.__service.users().messages().list(userId='me', q=query).execute()
         messages = []
         if 'messages' in response:
             messages.extend(response['messages'])
@@ -79,19 +93,93 @@ class GmailAgent:
         while 'nextPageToken' in response:
             page_token = response['nextPageToken']
             response = self.__service.users().messages().list(userId='me',
-                                                              q='label:inbox',
+                                                              q=query,
                                                               pageToken=page_token).execute()
-            messages.extend(response['messages'])
+            messages.extend(response.get('messages', []))
         return messages
 
+    def list_messages_from_inbox(self) -> list:
+        return self.list_messages(query='label:inbox')
+
+    @timed('gmail_api_seconds')
+    def get_history_id(self) -> str:
+        """Current mailbox history id, start point for next list_history_messages call."""
+        return self.__service.users().getProfile(userId='me').execute()['historyId']
+
+    @timed('gmail_api_seconds')
+    def list_history_messages(self, start_history_id: str, label_id: str = 'INBOX'):
+        """
+        Incremental sync, messages added to label since start_history_id.
+        :return: list of {'id': str, 'threadId': str}, or None if start_history_id expired and full sync is needed.
+        """
+        history = self.__service.users().history()
+        messages = {}
+        page_token = None
+        try:
+            while True:
+                response = history.list(userId='me', startHistoryId=start_history_id, labelId=label_id,
+                                        historyTypes='messageAdded', pageToken=page_token).execute()
+                for record in response.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        messages[added['message']['id']] = added['message']
+
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+
+        except HttpError as error:
+            if error.resp.status == 404:
+                LOG.info(f'history id {start_history_id} expired, full sync needed')
+                return None
+            raise
+
+        return list(messages.values())
+
+    @timed('gmail_api_seconds')
     def get_message(self, message_id: str) -> str:
         message = self.__service.users().messages().get(userId='me', id=message_id, format='full').execute()
+        return self.message_body(message)
+
+    @timed('gmail_api_seconds')
+    def get_messages(self, message_ids: list, message_format: str = 'full') -> dict:
+        """
+        Get many messages with batch requests, one http call per BATCH_SIZE messages.
+        Messages that fail to load (example: deleted meanwhile) are logged and left out.
+        :return: dict of message id -> message resource
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        messages = {}
+
+        def collect(request_id, response, exception):
+            if exception is not None:
+                LOG.error(f'failed to get message {request_id}: {exception}')
+            else:
+                messages[request_id] = response
+
+        for start in range(0, len(message_ids), BATCH_SIZE):
+            batch = self.__service.new_batch_http_request(callback=collect)
+            for message_id in message_ids[start:start + BATCH_SIZE]:
+                batch.add(self.__service.users().messages().get(userId='me', id=message_id, format=message_format),
+                          request_id=message_id)
+            batch.execute()
+
+        return messages
+
+    @staticmethod
+    def message_body(message: dict) -> str:
         try:
             msg_str = base64.urlsafe_b64decode(message['payload']['parts'][0]['body']['data']).decode('utf-8')
         except:
             msg_str = ' 6 '
         return msg_str
 
+    @staticmethod
+    def message_header(message: dict, name: str) -> str:
+        for header in message.get('payload', {}).get('headers', []):
+            if header['name'].lower() == name.lower():
+                return header['value']
+        return ''
+
     @staticmethod
     def create_message(sender: str, to: str, subject: str, message_text: str):
         message = MIMEText(message_text)
@@ -100,17 +188,31 @@ class GmailAgent:
         message['subject'] = subject
         return {'raw': base64.urlsafe_b64encode(message.as_string().encode()).decode()}
 
+    @timed('gmail_api_seconds')
     def send_message(self, message: str) -> bool:
         self.__service.users().messages().send(userId='me', body=message).execute()
         LOG.info('message sent')
         return True
 
+    @timed('gmail_api_seconds')
     def delete_message(self, message_id: str) -> bool:
         """make sure there is a message to delete in inbox"""
         self.__service.users().messages().delete(userId='me', id=message_id).execute()
         LOG.info(f'message {message_id} moved to trash')
         return True
 
+    @timed('gmail_api_seconds')
+    def delete_messages(self, message_ids: list) -> bool:
+        """Delete many messages with batchDelete calls, up to 1000 ids per call."""
+        message_ids = list(dict.fromkeys(message_ids))
+        for start in range(0, len(message_ids), BATCH_DELETE_SIZE):
+            self.__service.users().messages().batchDelete(
+                userId='me', body={'ids': message_ids[start:start + BATCH_DELETE_SIZE]}
+            ).execute()
+
+        LOG.info(f'{len(message_ids)} messages deleted')
+        return True
+
 
 class GoogleCalendarAgent:
     """
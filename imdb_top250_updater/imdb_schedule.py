@@ -1,53 +1,171 @@
 import os
 import shutil
-import time
+import signal
+import threading
 from data import config
 from logs.exceptions import log_error_to_desktop, datetime
+from logs.metrics import METRICS
 from updater.imdb_updater import IMDBTOP250Updater, LOG
+from updater.pipeline import Pipeline
+from updater.scheduler import Scheduler
+
+REPLIES_INTERVAL = 5 * 60  # seconds
+REFRESH_INTERVAL = 60 * 60
+BACKUP_INTERVAL = 24 * 60 * 60
+
+
+def send_report(updater: IMDBTOP250Updater, contents: list):
+    # send email_tools report with new movies and unseen movies
+    if updater.new_movie_flag:
+        updater.send_email(receiver_email=config.receiver_email, sender_mail=config.sender_mail,
+                           sender_password=config.sender_password, contents=contents)
+    else:
+        updater.LOG.info('No need to send email_tools message')
+
+
+def send_user_reports(updater: IMDBTOP250Updater) -> int:
+    # send every user list its own report, users without new movies are skipped
+    return updater.send_user_reports(sender_mail=config.sender_mail, sender_password=config.sender_password)
+
+
+def copy_backup(database_backup: str):
+    backup_path = f'C:/Users/{os.getlogin()}/PycharmProjects/Backup Databases/IMDB/MySQL'
+    if not os.path.isdir(backup_path):
+        os.mkdir(backup_path)
+
+    TODAY = datetime.strftime(datetime.today(), '%d.%m.%Y')
+    name, extension = os.path.splitext(os.path.basename(database_backup))
+    shutil.copy2(database_backup, f'{backup_path}/{name}_{TODAY}{extension}')
+
+
+def build_pipeline(updater: IMDBTOP250Updater, replies: bool = True, backup: bool = True) -> Pipeline:
+    """
+    Stages of one scheduled run, each stage starts once the stages it depends on are done:
+
+        email_replies ─┐                  ┌─> build_report ──> send_email
+                       ├─> update_top250 ─┼─> update_user_charts ──> send_user_reports
+        fetch_chart ───┘                  └─> backup_database ──> copy_backup
+
+    :param replies: False to leave out email_replies, daemon mode polls replies on its own interval.
+    :param backup: False to leave out backup stages.
+    """
+    pipeline = Pipeline()
+
+    # check for delete or check seen status actions from last replies, while the chart is downloaded
+    if replies:
+        pipeline.add_stage('email_replies', updater.check_email_replies)
+    pipeline.add_stage('fetch_chart', updater.scrape_top250_rows)
+
+    # update top250 list, after replies so removed movies are not merged back
+    if replies:
+        pipeline.add_stage('update_top250', lambda _, rows: updater.update_top250(rows=rows),
+                           depends_on=('email_replies', 'fetch_chart'))
+    else:
+        pipeline.add_stage('update_top250', lambda rows: updater.update_top250(rows=rows),
+                           depends_on=('fetch_chart',))
+
+    # new movies pages are fetched concurrently while building the report
+    pipeline.add_stage('build_report', lambda _: updater.build_contents() if updater.new_movie_flag else None,
+                       depends_on=('update_top250',))
+    pipeline.add_stage('send_email', lambda contents: send_report(updater, contents),
+                       depends_on=('build_report',))
+
+    # other charts followed by user lists, their users get reports of both updates
+    pipeline.add_stage('update_user_charts', lambda _: updater.update_user_charts(), depends_on=('update_top250',))
+    pipeline.add_stage('send_user_reports', lambda _: send_user_reports(updater), depends_on=('update_user_charts',))
+
+    # backup runs while the report is built and delivered
+    if backup:
+        pipeline.add_stage('backup_database', lambda _: updater.root_db.backup_database(),
+                           depends_on=('update_top250',))
+        pipeline.add_stage('copy_backup', copy_backup, depends_on=('backup_database',))
+
+    return pipeline
+
+
+def build_scheduler(updater: IMDBTOP250Updater, replies_interval: float = REPLIES_INTERVAL,
+                    refresh_interval: float = REFRESH_INTERVAL, backup_interval: float = BACKUP_INTERVAL,
+                    jitter: float = 0.1) -> Scheduler:
+    """
+    Daemon jobs sharing one updater, so database pool, http session and Gmail service stay warm between runs.
+    Replies are polled often (cheap incremental history sync), the chart is refreshed less often.
+    """
+
+    def job(func):
+        def run():
+            # rows cached by the last job may be stale, other processes (cli, another daemon) write too
+            updater.top250_db.invalidate_cache()
+            func()
+
+        return run
+
+    def refresh():
+        build_pipeline(updater, replies=False, backup=False).run()
+
+    def backup():
+        copy_backup(updater.root_db.backup_database())
+
+    # last runs kept in state table, a restarted daemon continues the schedule
+    scheduler = Scheduler(state=updater.state_db)
+    scheduler.add_job('email_replies', job(updater.check_email_replies), interval=replies_interval, jitter=jitter)
+    scheduler.add_job('refresh', job(refresh), interval=refresh_interval, jitter=jitter)
+    scheduler.add_job('backup', job(backup), interval=backup_interval, jitter=jitter, run_now=False)
+    return scheduler
+
+
+def run_daemon(updater: IMDBTOP250Updater = None, stop_event: threading.Event = None, **intervals):
+    """
+    Resident mode, runs jobs of build_scheduler until SIGINT / SIGTERM or stop_event is set.
+    Metrics are exported after every round of jobs, counters add up since daemon start.
+    :param updater: shared by all jobs, created (and closed on exit) when not given.
+    :param intervals: replies_interval, refresh_interval, backup_interval and jitter of build_scheduler.
+    """
+    own_updater = updater is None
+    updater = updater or IMDBTOP250Updater()
+    stop_event = stop_event or threading.Event()
+
+    if threading.current_thread() is threading.main_thread():
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *_: stop_event.set())
+
+    try:
+        build_scheduler(updater, **intervals).run_forever(stop_event, after_run=METRICS.export)
+    finally:
+        if own_updater:
+            updater.root_db.close_connection()
+        METRICS.export()
 
 
 def run_script():
     try:
         updater = IMDBTOP250Updater()
 
-        # check for delete or check seen status actions from last replies
-        updater.check_email_replies()
-
         # enable for testing email_tools
         # updater.top250_db.delete_movie(title='Joker')
         # updater.top250_db.removed_movies_db.delete_movie(title='Joker')
 
-        # update top250 list
-        updater.update_top250()
-
-        # send email_tools report with new movies and unseen movies
-        if updater.new_movie_flag:
-            updater.send_email(receiver_email=config.receiver_email,
-                               sender_mail=config.sender_mail, sender_password=config.sender_password)
-        else:
-            updater.LOG.info('No need to send email_tools message')
+        pipeline = build_pipeline(updater)
+        with METRICS.timer('run_seconds'):
+            pipeline.run()
 
         # close connections
-        updater.root_db.close_cursor()
         updater.root_db.close_connection()
-
-        updater.root_db.backup_database()
-
-        backup_path = f'C:/Users/{os.getlogin()}/PycharmProjects/Backup Databases/IMDB/MySQL'
-        if not os.path.isdir(backup_path):
-            os.mkdir(backup_path)
-
-        TODAY = datetime.strftime(datetime.today(), '%d.%m.%Y')
-        shutil.copy2(f'database/{updater.root_db.db_name}_backup.sql',
-                     f'{backup_path}/{updater.root_db.db_name}_backup_{TODAY}.sql')
-
-        time.sleep(3.5)
         return True
 
     except Exception:
+        METRICS.increment('run_failures_total')
         LOG.exception('Script not fully finished, error file created')
         log_error_to_desktop()
 
+    finally:
+        # per run timers and counters, appended as json lines and as prometheus textfile
+        METRICS.export()
+
 
 if __name__ == '__main__':
-    run_script()
+    import sys
+
+    if '--daemon' in sys.argv:
+        run_daemon()
+    else:
+        run_script()
@@ -28,6 +28,20 @@ class WebScrapEvents(IMDBError):
         return f'{self.message}, {self.exception}'
 
 
+class RowError(IMDBError):
+    """
+    Exceptions raised for chart rows that can not be parsed into movie rows.
+    """
+
+    def __init__(self, place: int, field: str, text: str):
+        self.place = place
+        self.field = field
+        self.text = text
+
+    def __str__(self) -> str:
+        return f'malformed {self.field} in chart place {self.place}: {self.text.strip()!r}'
+
+
 def create_logger():
     LOG = logging.getLogger('IMDB.Logger')
     handler = logging.StreamHandler(sys.stdout)
@@ -0,0 +1,147 @@
+"""
+Lightweight run metrics: timers and counters, exported after every run as
+JSON lines (appended, one line per metric, for trends across runs) and Prometheus text format
+(for node_exporter textfile collector).
+
+example:
+    with timer('imdb_fetch_seconds', page='chart'):
+        ...
+
+    @timed('db_query_seconds', table='top250')
+    def select_all(self):
+        ...
+
+    increment('movies_added_total', 3)
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+JSON_LINES_PATH = 'logs/metrics.jsonl'
+PROMETHEUS_PATH = 'logs/metrics.prom'
+PREFIX = 'imdb_updater_'
+
+
+class Metrics:
+    """Thread safe registry of counters and timers, keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: dict = {}  # (name, labels) -> value
+        self.timers: dict = {}  # (name, labels) -> [count, total seconds, max seconds]
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            count, total, maximum = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator timing every call, function name is added as `operation` label."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, operation=func.__name__, **labels):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def records(self) -> list:
+        """:return: list of dict, one per metric."""
+        with self._lock:
+            counters = list(self.counters.items())
+            timers = list(self.timers.items())
+
+        records = [{'metric': name, 'type': 'counter', 'labels': dict(labels), 'value': value}
+                   for (name, labels), value in counters]
+        records += [{'metric': name, 'type': 'timer', 'labels': dict(labels),
+                     'count': count, 'sum': round(total, 6), 'max': round(maximum, 6)}
+                    for (name, labels), (count, total, maximum) in timers]
+        return records
+
+    def write_json_lines(self, path: str = JSON_LINES_PATH) -> str:
+        run_time = datetime.now().isoformat(timespec='seconds')
+        with open(path, 'a') as file:
+            for record in self.records():
+                file.write(json.dumps({'time': run_time, **record}) + '\n')
+        return path
+
+    @staticmethod
+    def _labels_text(labels: dict) -> str:
+        if not labels:
+            return ''
+        escaped = {key: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for key, value in labels.items()}
+        return '{' + ','.join(f'{key}="{value}"' for key, value in escaped.items()) + '}'
+
+    def prometheus_text(self) -> str:
+        lines = []
+        typed = set()
+        for record in sorted(self.records(), key=lambda r: (r['metric'], sorted(r['labels'].items()))):
+            name = PREFIX + record['metric']
+            labels = self._labels_text(record['labels'])
+
+            if record['type'] == 'counter':
+                if name not in typed:
+                    lines.append(f'# TYPE {name} counter')
+                    typed.add(name)
+                lines.append(f'{name}{labels} {record["value"]}')
+            else:
+                if name not in typed:
+                    lines.append(f'# TYPE {name} summary')
+                    typed.add(name)
+                lines.append(f'{name}_count{labels} {record["count"]}')
+                lines.append(f'{name}_sum{labels} {record["sum"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str = PROMETHEUS_PATH) -> str:
+        # write then rename, so a collector never reads a half written file
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(self.prometheus_text())
+        os.replace(temp_path, path)
+        return path
+
+    def export(self, json_lines_path: str = JSON_LINES_PATH, prometheus_path: str = PROMETHEUS_PATH):
+        """Write metrics of this run to both formats, prometheus_path=None skips prometheus file."""
+        self.write_json_lines(json_lines_path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+
+
+METRICS = Metrics()
+
+increment = METRICS.increment
+timer = METRICS.timer
+timed = METRICS.timed
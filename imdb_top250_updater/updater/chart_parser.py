@@ -0,0 +1,218 @@
+"""
+Parser engines for IMDB chart pages.
+Every engine turns chart html into the same list of ChartEntry rows, so the updater can swap them freely.
+Chart tables (/chart/top, /chart/toptv, ...) have 'streaming' and 'soup' engines,
+advanced search lists (/search/title) are read by the streaming search parser.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import NamedTuple
+
+IMDB_URL = 'https://www.imdb.com'
+MOVIE_ID_PATTERN = re.compile(r'/title/tt(\d+)')
+YEAR_PATTERN = re.compile(r'\d{4}')
+
+
+def movie_id_from_link(link: str) -> int:
+    """
+    example: 'https://www.imdb.com/title/tt0111161/' -> 111161
+    :return: None if link has no title id, the row extractor reports it as a malformed row.
+    """
+    match = MOVIE_ID_PATTERN.search(link or '')
+    return int(match.group(1)) if match else None
+
+
+class ChartEntry(NamedTuple):
+    title_column: str  # text of the title cell, example: '1. The Shawshank Redemption (1994)'
+    link: str  # example: 'https://www.imdb.com/title/tt0111161/'
+    rating: str  # example: '9.2 based on 2,165,496 user ratings'
+    movie_id: int  # imdb tt number, example: 111161, None if link is malformed
+
+
+class StreamingChartParser(HTMLParser):
+    """
+    One pass SAX style parser, collects chart rows while the html is fed without building a DOM tree.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.entries: list = []
+        self._column = None
+        self._title_parts: list = []
+        self._link = None
+        self._rating = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'td':
+            classes = dict(attrs).get('class', '').split()
+            if 'titleColumn' in classes:
+                self._column = 'title'
+            elif 'ratingColumn' in classes:
+                self._column = 'rating'
+
+        elif tag == 'div' and self._column == 'title':
+            # popularity charts add rank change after the year, example: <div class="velocity">1 (up 2)</div>
+            self._column = 'title_extra'
+
+        elif tag == 'a' and self._column == 'title' and self._link is None:
+            self._link = IMDB_URL + (dict(attrs).get('href') or '')
+
+        elif tag == 'strong' and self._column == 'rating' and self._rating is None:
+            self._rating = dict(attrs).get('title', '')
+
+    def handle_endtag(self, tag):
+        if tag == 'td':
+            self._column = None
+
+        elif tag == 'tr' and self._title_parts:
+            self.entries.append(ChartEntry(title_column=''.join(self._title_parts),
+                                           link=self._link,
+                                           rating=self._rating or '',
+                                           movie_id=movie_id_from_link(self._link)))
+            self._title_parts = []
+            self._link = None
+            self._rating = None
+
+    def handle_data(self, data):
+        if self._column == 'title':
+            self._title_parts.append(data)
+
+    def pop_entries(self) -> list:
+        entries, self.entries = self.entries, []
+        return entries
+
+
+def iter_chart_entries(chunks):
+    """
+    Yield chart rows as soon as they are complete while feeding the html in chunks.
+    :param chunks: iterable of str, example: response.iter_content(decode_unicode=True)
+    """
+    parser = StreamingChartParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_entries()
+
+    parser.close()
+    yield from parser.pop_entries()
+
+
+def parse_chart_streaming(html: str) -> list:
+    return list(iter_chart_entries([html]))
+
+
+def parse_chart_soup(html: str) -> list:
+    """Original engine, builds the full BeautifulSoup tree."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    movies = soup.select('td.titleColumn')
+    links = [IMDB_URL + (a.attrs.get('href') or '') for a in soup.select('td.titleColumn a')]
+    rating = [b.attrs.get('title') for b in soup.select('td.ratingColumn strong')]
+
+    return [ChartEntry(title_column=movie.get_text(), link=link, rating=rate, movie_id=movie_id_from_link(link))
+            for movie, link, rate in zip(movies, links, rating)]
+
+
+class StreamingSearchParser(HTMLParser):
+    """
+    One pass parser of advanced search list pages (lister-item markup),
+    items are turned into the same ChartEntry text as chart table rows.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.entries: list = []
+        self._item = None
+        self._field = None
+
+    def _flush(self):
+        item, self._item = self._item, None
+        if item and item.get('link'):
+            year = YEAR_PATTERN.search(item.get('year', ''))
+            votes = item.get('votes')
+            rating = f'{item["rating"]} based on {int(votes):,} user ratings' if item.get('rating') and votes else ''
+            index = item.get('index', '').replace(',', '')  # '1,001.'
+            self.entries.append(ChartEntry(title_column=f'{index} {item.get("title", "")} '
+                                                        f'({year.group() if year else ""})',
+                                           link=item['link'],
+                                           rating=rating,
+                                           movie_id=movie_id_from_link(item['link'])))
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+
+        if tag == 'div' and 'lister-item' in classes:
+            self._flush()
+            self._item = {}
+
+        elif self._item is None:
+            return
+
+        elif tag == 'span' and 'lister-item-index' in classes:
+            self._field = 'index'
+
+        elif tag == 'a' and 'link' not in self._item and self._item.get('header'):
+            self._item['link'] = IMDB_URL + (attrs.get('href') or '').split('?')[0]
+            self._field = 'title'
+
+        elif tag == 'h3' and 'lister-item-header' in classes:
+            self._item['header'] = True
+
+        elif tag == 'span' and 'lister-item-year' in classes:
+            self._field = 'year'
+
+        elif tag == 'div' and 'ratings-imdb-rating' in classes:
+            self._item['rating'] = attrs.get('data-value')
+
+        elif tag == 'span' and attrs.get('name') == 'nv' and 'votes' not in self._item:
+            self._item['votes'] = attrs.get('data-value')
+
+    def handle_endtag(self, tag):
+        if tag in ('span', 'a'):
+            self._field = None
+        elif tag == 'h3' and self._item is not None:
+            self._item['header'] = False
+
+    def handle_data(self, data):
+        if self._field and self._item is not None:
+            self._item[self._field] = self._item.get(self._field, '') + data.strip()
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def pop_entries(self) -> list:
+        entries, self.entries = self.entries, []
+        return entries
+
+
+def parse_search_streaming(html: str) -> list:
+    parser = StreamingSearchParser()
+    parser.feed(html)
+    parser.close()
+    return parser.pop_entries()
+
+
+PARSER_ENGINES = {
+    'streaming': parse_chart_streaming,
+    'soup': parse_chart_soup,
+}
+
+
+def get_chart_parser(engine: str = 'streaming', layout: str = 'chart'):
+    """
+    :param engine: 'streaming' or 'soup', chart table engine.
+    :param layout: 'chart' for chart tables, 'search' for advanced search lists (always streaming).
+    """
+    if layout == 'search':
+        return parse_search_streaming
+    if layout != 'chart':
+        raise ValueError(f'Unknown chart layout: {layout}')
+
+    try:
+        return PARSER_ENGINES[engine]
+    except KeyError:
+        raise ValueError(f'Unknown chart parser engine: {engine}, choose from {list(PARSER_ENGINES)}')
@@ -0,0 +1,63 @@
+"""
+IMDB charts and lists as data, every chart is scraped by the same pipeline.
+Lists longer than one page (advanced search) are fetched page by page concurrently.
+"""
+
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+IMDB_URL = 'https://www.imdb.com'
+SEARCH_URL = IMDB_URL + '/search/title/'
+SEARCH_PAGE_SIZE = 250  # max titles of one advanced search page
+
+
+class ChartDefinition(NamedTuple):
+    chart_id: str  # key of chart_entries table
+    name: str
+    url: str  # paginated lists have a {start} field, the first title number of the page
+    layout: str = 'chart'  # 'chart' - chart table, 'search' - advanced search list, see updater.chart_parser
+    size: int = 250  # number of titles
+    page_size: int = 250
+
+    def page_urls(self) -> list:
+        if '{start}' not in self.url:
+            return [self.url]
+        return [self.url.format(start=start) for start in range(1, self.size + 1, self.page_size)]
+
+
+def search_chart(chart_id: str, name: str, size: int, page_size: int = SEARCH_PAGE_SIZE, **query) -> ChartDefinition:
+    """
+    Chart from advanced search query.
+    :param query: search parameters, example: genres='horror', sort='user_rating,desc'
+    """
+    query = urlencode(sorted({**query, 'count': page_size}.items()))
+    return ChartDefinition(chart_id=chart_id, name=name, url=f'{SEARCH_URL}?{query}&start={{start}}',
+                           layout='search', size=size, page_size=page_size)
+
+
+def genre_chart(genre: str, size: int = 250) -> ChartDefinition:
+    """Top rated feature movies of genre, example: genre_chart('horror')"""
+    return search_chart(f'genre:{genre}', f'Top Rated {genre.title()} Movies', size=size, genres=genre,
+                        title_type='feature', num_votes='25000,', sort='user_rating,desc')
+
+
+CHARTS = {
+    'top250': ChartDefinition('top250', 'IMDB Top 250 Movies', IMDB_URL + '/chart/top'),
+    'toptv': ChartDefinition('toptv', 'IMDB Top 250 TV Shows', IMDB_URL + '/chart/toptv'),
+    'moviemeter': ChartDefinition('moviemeter', 'Most Popular Movies', IMDB_URL + '/chart/moviemeter', size=100),
+    'top1000': search_chart('top1000', 'IMDB Top 1000 Movies', size=1000, groups='top_1000',
+                            sort='user_rating,desc'),
+}
+
+
+def get_chart(chart_id: str) -> ChartDefinition:
+    """
+    :param chart_id: key of CHARTS, or 'genre:<genre>', example: 'genre:horror'
+    """
+    if chart_id.startswith('genre:'):
+        return genre_chart(chart_id.split(':', 1)[1])
+
+    try:
+        return CHARTS[chart_id]
+    except KeyError:
+        raise ValueError(f'Unknown chart: {chart_id}, choose from {list(CHARTS)} or genre:<genre>')
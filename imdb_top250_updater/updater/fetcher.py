@@ -0,0 +1,124 @@
+"""
+HTTP fetch layer for IMDB pages.
+One pooled session shared by all requests, per host rate limit, timeouts, retries with backoff,
+bounded concurrency for fetching many pages at once and an optional on disk cache (see updater.http_cache).
+"""
+
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from logs.metrics import increment
+
+LOG = logging.getLogger('IMDB.Fetcher.Logger')
+handler = logging.StreamHandler(sys.stdout)
+LOG.addHandler(handler)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PageFetcher:
+
+    def __init__(self, timeout: float = 10, max_workers: int = 8, pool_size: int = 10, retries: int = 3,
+                 backoff_factor: float = 0.5, min_interval: float = 0.05, cache=None):
+        """
+        :param timeout: seconds for connect and read of each request.
+        :param max_workers: max pages fetched concurrently by fetch_many.
+        :param pool_size: max kept-alive connections per host.
+        :param retries: retries for connection errors and RETRY_STATUSES responses.
+        :param backoff_factor: exponential backoff between retries, see urllib3 Retry.
+        :param min_interval: min seconds between two requests starts to the same host.
+        :param cache: HTTPCache object or None for no caching.
+        """
+        self.timeout = timeout
+        self.cache = cache
+        self.max_workers = max_workers
+        self.min_interval = min_interval
+
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._next_slot: dict = {}
+
+        LOG.info('PageFetcher object created successfully')
+
+    def _wait_for_host(self, host: str):
+        # reserve the next free slot for this host, then sleep outside the lock so other hosts are not blocked
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def fetch(self, url: str, ttl: float = None):
+        """
+        :param ttl: seconds a cached page is served without revalidation, None for the cache default.
+        """
+        entry = self.cache.get(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry, ttl):
+            LOG.debug(f'Serving {url} from cache')
+            increment('http_requests_total', result='cache_hit')
+            return entry.response()
+
+        headers = self.cache.conditional_headers(entry) if entry else {}
+
+        self._wait_for_host(urlsplit(url).netloc)
+        LOG.debug(f'Fetching {url}')
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if entry and response.status_code == 304:
+            LOG.debug(f'{url} not modified, serving from cache')
+            increment('http_requests_total', result='not_modified')
+            return self.cache.refresh(entry).response()
+
+        increment('http_requests_total', result=str(response.status_code))
+        response.raise_for_status()
+        if self.cache:
+            self.cache.store(url, response)
+        return response
+
+    def fetch_many(self, urls: list, max_workers: int = None, ttl: float = None) -> list:
+        """
+        Fetch pages concurrently on pooled connections.
+        :return: list of responses in the same order as urls.
+        """
+        urls = list(urls)
+        if not urls:
+            return []
+
+        workers = min(max_workers or self.max_workers, len(urls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda url: self.fetch(url, ttl=ttl), urls))
+
+    def iter_fetch_many(self, urls: list, max_workers: int = None, ttl: float = None):
+        """
+        Fetch pages concurrently, yield (index in urls, response) as soon as each page arrives,
+        so pages can be parsed while the rest are still downloading.
+        """
+        urls = list(urls)
+        if not urls:
+            return
+
+        workers = min(max_workers or self.max_workers, len(urls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.fetch, url, ttl=ttl): index for index, url in enumerate(urls)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,90 @@
+"""
+Filter profiles deciding which chart rows are stored.
+Rows are filtered in one vectorized pass (numpy masks over the chart columns) before anything is written to database,
+numpy is imported on first filter so importing profiles stays cheap. Profiles filtering by year only, like the default
+profile, are checked in plain Python and do not load numpy at all.
+
+example:
+    profile = FilterProfile(name='classics', max_year=1980, min_rating=8.3)
+    rows = filter_rows(rows, profile)
+"""
+
+import json
+from typing import NamedTuple
+
+
+class FilterProfile(NamedTuple):
+    name: str = 'default'
+    min_year: int = 1990
+    max_year: int = None
+    min_rating: float = None
+    min_reviewers: int = None
+    exclude_ids: frozenset = frozenset()  # imdb ids never stored
+
+    def to_json(self) -> str:
+        fields = self._asdict()
+        fields['exclude_ids'] = sorted(self.exclude_ids)
+        return json.dumps(fields)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'FilterProfile':
+        fields = json.loads(text)
+        fields['exclude_ids'] = frozenset(fields.get('exclude_ids', ()))
+        return cls(**fields)
+
+
+DEFAULT_PROFILE = FilterProfile()
+
+FILTER_PROFILES = {
+    'default': DEFAULT_PROFILE,
+    'all': FilterProfile(name='all', min_year=None),
+}
+
+
+def filter_mask(rows, profile: FilterProfile):
+    """
+    :param rows: list of MovieRow
+    :return: numpy bool array, True for rows kept by profile.
+    """
+    import numpy as np
+
+    count = len(rows)
+    mask = np.ones(count, dtype=bool)
+
+    if profile.min_year is not None or profile.max_year is not None:
+        years = np.fromiter((row.year for row in rows), dtype=np.int32, count=count)
+        if profile.min_year is not None:
+            mask &= years >= profile.min_year
+        if profile.max_year is not None:
+            mask &= years <= profile.max_year
+
+    if profile.min_rating is not None:
+        ratings = np.fromiter((row.rating for row in rows), dtype=np.float64, count=count)
+        mask &= ratings >= profile.min_rating
+
+    if profile.min_reviewers is not None:
+        reviewers = np.fromiter((int(row.reviewers.replace(',', '')) for row in rows), dtype=np.int64, count=count)
+        mask &= reviewers >= profile.min_reviewers
+
+    if profile.exclude_ids:
+        movie_ids = np.fromiter((row.movie_id for row in rows), dtype=np.int64, count=count)
+        mask &= ~np.isin(movie_ids, np.fromiter(profile.exclude_ids, dtype=np.int64))
+
+    return mask
+
+
+def filters_year_only(profile: FilterProfile) -> bool:
+    return profile.min_rating is None and profile.min_reviewers is None and not profile.exclude_ids
+
+
+def filter_rows(rows, profile: FilterProfile = DEFAULT_PROFILE) -> list:
+    rows = list(rows)
+    if not rows:
+        return rows
+
+    if filters_year_only(profile):
+        min_year, max_year = profile.min_year, profile.max_year
+        return [row for row in rows
+                if (min_year is None or row.year >= min_year) and (max_year is None or row.year <= max_year)]
+
+    return [rows[index] for index in filter_mask(rows, profile).nonzero()[0]]
@@ -0,0 +1,160 @@
+"""
+On disk HTTP cache for IMDB pages.
+Bodies are stored zlib compressed with their validators (ETag / Last-Modified), entries younger than the TTL
+are served without any request, older ones are revalidated with a conditional request.
+Total cache size is bounded, least recently used entries are evicted first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from typing import NamedTuple
+
+LOG = logging.getLogger('IMDB.HTTPCache.Logger')
+handler = logging.StreamHandler(sys.stdout)
+LOG.addHandler(handler)
+
+CACHE_PATH = 'database/http_cache'
+DEFAULT_TTL = 60 * 60  # seconds
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+class CachedResponse:
+    """Minimal stand in for requests.Response, built from a cache entry."""
+
+    def __init__(self, url: str, status_code: int, headers: dict, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = True
+
+    @property
+    def encoding(self) -> str:
+        content_type = self.headers.get('Content-Type', '')
+        if 'charset=' in content_type:
+            return content_type.split('charset=')[-1].split(';')[0].strip()
+        return 'utf-8'
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def raise_for_status(self):
+        pass
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    status_code: int
+    headers: dict
+    stored_at: float
+    body: bytes
+
+    def response(self) -> CachedResponse:
+        return CachedResponse(self.url, self.status_code, self.headers, self.body)
+
+
+class HTTPCache:
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param path: directory of cache files.
+        :param ttl: seconds an entry is served without revalidation.
+        :param max_bytes: max total size of cache files, LRU eviction above it.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        LOG.info('HTTPCache object created successfully')
+
+    def _file_path(self, url: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def get(self, url: str):
+        file_path = self._file_path(url)
+        try:
+            with open(file_path, 'rb') as file:
+                meta, body = file.read().split(b'\n', 1)
+        except (OSError, ValueError):
+            return None
+
+        meta = json.loads(meta)
+        try:
+            body = zlib.decompress(body)
+        except zlib.error:
+            LOG.error(f'corrupted cache entry for {url}, ignoring it')
+            return None
+
+        os.utime(file_path)  # mark as recently used for LRU eviction
+        return CacheEntry(url=url, status_code=meta['status_code'], headers=meta['headers'],
+                          stored_at=meta['stored_at'], body=body)
+
+    def is_fresh(self, entry: CacheEntry, ttl: float = None) -> bool:
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() - entry.stored_at < ttl
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> dict:
+        headers = {}
+        if entry.headers.get('ETag'):
+            headers['If-None-Match'] = entry.headers['ETag']
+        if entry.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = entry.headers['Last-Modified']
+        return headers
+
+    def _write(self, url: str, status_code: int, headers: dict, body: bytes):
+        meta = json.dumps({'url': url, 'status_code': status_code, 'headers': headers, 'stored_at': time.time()})
+        file_path = self._file_path(url)
+        temp_path = f'{file_path}.{threading.get_ident()}.tmp'
+
+        with open(temp_path, 'wb') as file:
+            file.write(meta.encode('utf-8') + b'\n' + zlib.compress(body))
+        os.replace(temp_path, file_path)
+
+        self.evict()
+
+    def store(self, url: str, response):
+        keep = ('Content-Type', 'ETag', 'Last-Modified')
+        headers = {key: response.headers[key] for key in keep if key in response.headers}
+        self._write(url, response.status_code, headers, response.content)
+
+    def refresh(self, entry: CacheEntry) -> CacheEntry:
+        """Restart entry TTL after a 304 Not Modified answer."""
+        self._write(entry.url, entry.status_code, entry.headers, entry.body)
+        return entry._replace(stored_at=time.time())
+
+    def evict(self):
+        with self._lock:
+            files = []
+            for name in os.listdir(self.path):
+                if name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.path, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    continue
+                total -= size
+                LOG.debug(f'cache entry {name} evicted')
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            os.remove(os.path.join(self.path, name))
@@ -2,122 +2,225 @@
 Manage your personal IMDB TOP 250 rated movies database.
 Track what you seen and what not.
 Get email_tools report and take actions like delete or seen from email_tools message replies.
+
+Heavy dependencies (yagmail, BeautifulSoup, Gmail api clients) are imported by the methods using them,
+so a run finding nothing changed does not pay for loading them.
 """
 
+import hashlib
+import json
 import re
-
-import pandas as pd
-import requests
-import yagmail
-from bs4 import BeautifulSoup
-from tabulate import tabulate
+from datetime import timedelta
+from email.utils import parseaddr
 
 from logs.exceptions import create_logger, datetime
-from database import mysql_db
-from email_tools import gmail_vars
-from email_tools.google_agents import GmailAgent
+from logs.metrics import increment, timed, timer
+from database import tables
+from database.storage import create_storage
+from updater.chart_parser import get_chart_parser
+from updater.charts import ChartDefinition, get_chart
+from updater.fetcher import PageFetcher
+from updater.filters import FILTER_PROFILES, FilterProfile, filter_rows
+from updater.http_cache import DEFAULT_TTL, HTTPCache
+from updater.report_renderer import render_report, render_unseen_table
+from updater.row_extractor import MovieRow, extract_rows
 
 LOG = create_logger()
 
+CHART_CACHE_TTL = 0  # seconds, chart pages are always revalidated with a conditional request
+MOVIE_PAGE_CACHE_TTL = 30 * 24 * 60 * 60  # posters never change
+REPORT_SUBJECT = 'IMDB TOP 250 Updater'
+REPLIES_QUERY = f'in:inbox subject:"{REPORT_SUBJECT}"'
+REPLY_SUBJECT_PATTERN = re.compile(rf'^\s*re:\s*{REPORT_SUBJECT}', re.IGNORECASE)
+
 
 class IMDBTOP250Updater:
 
-    def __init__(self, db_name: str = None):
+    def __init__(self, db_name: str = None, parser_engine: str = 'streaming', cache_ttl: float = DEFAULT_TTL,
+                 backend: str = 'mysql', filter_profile: str = 'default', chart: str = 'top250'):
+        """
+        :param cache_ttl: seconds pages are served from http cache without a request, chart pages are always
+        revalidated (CHART_CACHE_TTL) and movie pages kept longer (MOVIE_PAGE_CACHE_TTL).
+        :param chart: chart followed by the movies list, key of updater.charts.CHARTS or 'genre:<genre>'
+        """
         self.LOG = LOG
         self.new_movies: list = []
         self.new_movie_flag: bool = False  # to check if new movie added to database so script need to send email_tools
+        self.changes = None  # ChangeSet of last update, None when chart was not changed
+        self.new_movies_by_user: dict = {}  # user_id -> new movies of last update, see add_user
+
+        # set up database connection, 'mysql' or 'sqlite', see database.storage
+        self.root_db = create_storage(backend, db_name=db_name)
+        self.top250_db = tables.TOP250Table(self.root_db)
+        self.state_db = tables.StateTable(self.root_db)
+        self.chart_entries_db = tables.ChartEntriesTable(self.root_db)
+        self.user_lists_db = tables.UserListsTable(self.root_db)
+
+        # which chart rows are stored, see updater.filters
+        self.filter_profile = self.load_filter_profile(filter_profile)
+
+        # 'streaming' or 'soup', see updater.chart_parser
+        self.chart = get_chart(chart)
+        self.parser_engine = parser_engine
+        self.chart_parser = get_chart_parser(parser_engine, self.chart.layout)
 
-        # set up mysql database connection
-        self.root_db = mysql_db.DBConnection(db_name=db_name)
-        self.root_db.get_connection()
-        self.root_db.get_cursor()
-        self.top250_db = mysql_db.TOP250Table(self.root_db)
+        # one pooled and cached http session for the chart and all movie pages
+        self.fetcher = PageFetcher(cache=HTTPCache(ttl=cache_ttl))
 
         # self.gmail_agent = GmailAgent()
         self.gmail_agent = None
 
         self.LOG.info('IMDBTOP250Updater object created successfully')
 
-    def get_imdb_website_response(self, url):
+    @timed('imdb_fetch_seconds')
+    def get_imdb_website_response(self, url, ttl: float = None):
         try:
             self.LOG.debug('Trying to web scrap imdb website')
-            response = requests.get(url)
+            response = self.fetcher.fetch(url, ttl=ttl)
             return response
 
         except Exception:
             self.LOG.exception('Failed to get respond from imdb website')
             raise ConnectionError
 
-    def create_update_table(self, table_name):
+    @timed('imdb_fetch_seconds')
+    def get_imdb_website_responses(self, urls: list, ttl: float = None) -> list:
         try:
-            self.top250_db.create_table(table_name=table_name)
-        except mysql_db.connection.errors.ProgrammingError:
-            self.top250_db.drop_table(table_name=table_name)
-            self.top250_db.create_table(table_name=table_name)
+            self.LOG.debug(f'Trying to web scrap {len(urls)} imdb pages')
+            return self.fetcher.fetch_many(urls, ttl=ttl)
 
-    @staticmethod
-    def get_scraped_items(response):
-        soup = BeautifulSoup(response.text, 'html.parser')
+        except Exception:
+            self.LOG.exception('Failed to get respond from imdb website')
+            raise ConnectionError
 
-        movies = soup.select('td.titleColumn')
-        links = ['https://www.imdb.com' + a.attrs.get('href') for a in soup.select('td.titleColumn a')]
+    def get_scraped_items(self, response, parser=None) -> list:
+        parser = parser or self.chart_parser
+        with timer('chart_parse_seconds', engine=parser.__name__):
+            entries = parser(response.text)
+        increment('chart_entries_parsed_total', len(entries))
+        return entries
 
-        soup.select('td.ratingColumn')
-        rating = [b.attrs.get('title') for b in soup.select('td.ratingColumn strong')]
+    def ask_seen_status(self, movie_title, movie_id):
+        seen_status = input(f'Did you seen {movie_title}? [y/n]')
+        seen_status = True if seen_status == 'y' else False
+        self.change_seen_status(movie_id=movie_id, seen_status=seen_status)
 
-        return movies, links, rating
+    def get_chart_rows(self, entries) -> list:
+        """All rows of chart, malformed entries are logged and skipped."""
+        rows, errors = extract_rows(entries)
+        for error in errors:
+            self.LOG.error(f'Skipped chart row: {error}')
+        return rows
 
-    def insert_movie_without_checking_seen(self, index, movie_title, year, rating_value, reviewers, links, table_name):
-        seen = None
-        self.top250_db.insert_movie(
-            values=[
-                index + 1, movie_title, year, rating_value, reviewers, seen, links[index]
-            ],
-            table_name=table_name
-        )
+    def get_valid_movies_rows(self, entries) -> list:
+        """Rows of chart kept by filter profile of top250 list."""
+        return filter_rows(self.get_chart_rows(entries), self.filter_profile)
 
-    def insert_movie_with_checking_seen(self, movie_title):
-        seen_status = input(f'Did you seen {movie_title}? [y/n]')
-        seen_status = True if seen_status == 'y' else False
-        self.change_seen_status(title=movie_title, seen_status=seen_status)
+    def user_rows_filter(self):
+        """
+        row_filter of UserListsTable.add_new_movies, new movies of every user list are filtered
+        with the filter profile of its user (see add_user), profiles are loaded once per call.
+        """
+        profiles = {}
 
-    def insert_valid_movies_only_to_movies_table(self, movies, links, rating, check_seen, table_name):
-        for index in range(0, len(movies)):
-            movie_string = movies[index].get_text()
-            movie = (' '.join(movie_string.split()).replace('.', ''))
-            movie_title = movie[len(str(index)) + 1:-7].strip()
-            year = re.search('\\((.*?)\\)', movie_string).group(1)
+        def row_filter(profile_name, rows):
+            profile_name = profile_name or 'default'
+            if profile_name not in profiles:
+                profiles[profile_name] = self.load_filter_profile(profile_name)
+            return filter_rows([MovieRow(*row) for row in rows], profiles[profile_name])
 
-            if int(year) >= 1990:
-                rating_value = float(rating[index].split()[0])
-                reviewers = rating[index].split()[3]
+        return row_filter
 
-                if not check_seen:
-                    self.insert_movie_without_checking_seen(index, movie_title, year, rating_value, reviewers, links,
-                                                            table_name)
-                else:
-                    self.insert_movie_with_checking_seen(movie_title)
+    def load_filter_profile(self, name: str = 'default') -> FilterProfile:
+        """Profile saved in database by save_filter_profile, or one of the built in FILTER_PROFILES."""
+        saved = self.state_db.get_value(f'filter_profile.{name}')
+        if saved:
+            return FilterProfile.from_json(saved)
 
-    def create_list(self, check_seen: bool = False, update_table: bool = False):
+        try:
+            return FILTER_PROFILES[name]
+        except KeyError:
+            raise ValueError(f'Unknown filter profile: {name}, choose from {list(FILTER_PROFILES)} or save one first')
+
+    def save_filter_profile(self, profile: FilterProfile, use: bool = True) -> bool:
+        """
+        :param profile: example: FilterProfile(name='classics', min_year=None, max_year=1980, min_rating=8.3)
+        :param use: True to filter next updates with this profile.
+        """
+        self.state_db.set_value(f'filter_profile.{profile.name}', profile.to_json())
+        if use:
+            self.filter_profile = profile
+        return True
+
+    def insert_valid_movies_only_to_movies_table(self, entries, check_seen, table_name):
+        rows = self.get_valid_movies_rows(entries)
+
+        # one round trip and one commit for the whole chart
+        self.top250_db.insert_movies(rows, table_name=table_name)
+
+        if check_seen:
+            # movies are stored first, so there is a row to update
+            for row in rows:
+                self.ask_seen_status(row[1], row[7])
+
+    @timed('imdb_chart_seconds')
+    def get_chart_entries(self, chart: ChartDefinition = None) -> list:
+        """
+        Fetch all pages of chart concurrently, every page is parsed as soon as it arrives.
+        :param chart: followed chart when not given.
+        :return: list of ChartEntry in chart order.
+        """
+        chart = chart or self.chart
+        parser = self.chart_parser if chart.layout == self.chart.layout else get_chart_parser(self.parser_engine,
+                                                                                             chart.layout)
+        urls = chart.page_urls()
+        pages = [[] for _ in urls]
+        try:
+            self.LOG.debug(f'Trying to web scrap {len(urls)} pages of {chart.name}')
+            # an unchanged chart is answered with 304 Not Modified, parsed from cache
+            for index, response in self.fetcher.iter_fetch_many(urls, ttl=CHART_CACHE_TTL):
+                pages[index] = self.get_scraped_items(response, parser)
+
+        except Exception:
+            self.LOG.exception('Failed to get respond from imdb website')
+            raise ConnectionError
+
+        return [entry for page in pages for entry in page]
+
+    def scrape_chart_rows(self, chart: ChartDefinition = None) -> list:
+        """All rows of chart, not filtered, chart_entries keeps the whole chart for every user."""
+        return self.get_chart_rows(self.get_chart_entries(chart))
+
+    def scrape_top250_rows(self) -> list:
+        """Rows of followed chart."""
+        return self.scrape_chart_rows(self.chart)
+
+    @staticmethod
+    def chart_fingerprint(rows, profile: FilterProfile = None) -> str:
+        """
+        Hash of (place, title, year, rating) of all rows, equal fingerprints means nothing to update.
+        :param profile: filter profile of top250 list, a changed profile updates the list again.
+        """
+        digest = hashlib.sha256()
+        if profile is not None:
+            digest.update(profile.to_json().encode('utf-8'))
+        for place, title, year, rating, *_ in rows:
+            digest.update(f'{place}\t{title}\t{year}\t{rating}\n'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def create_list(self, check_seen: bool = False):
         """
         Web Scrapping top 250 list and checking new movies that not in database and asking user for seen or not.
-        :param update_table: for comparing to current table.
         :param check_seen: True to ask user for seen / not seen movies.
         :return: bool or None
         """
 
-        url = 'https://www.imdb.com/chart/top'
-        response = self.get_imdb_website_response(url)
+        entries = self.get_chart_entries()
 
-        if update_table:
-            table_name = 'top250_update'
-            self.create_update_table(table_name)
-        else:
-            table_name = 'top250'
-            self.top250_db.create_table(table_name=table_name)
+        table_name = 'top250'
+        self.top250_db.create_table(table_name=table_name)
 
-        movies, links, rating = self.get_scraped_items(response)
-        self.insert_valid_movies_only_to_movies_table(movies, links, rating, check_seen, table_name)
+        self.insert_valid_movies_only_to_movies_table(entries, check_seen, table_name)
 
         self.LOG.info('Finished creating new movies list')
         return True
@@ -132,14 +235,19 @@ class IMDBTOP250Updater:
             print(*record, sep=' / ')
         return True
 
-    def remove_movie(self, title: str = None, place: int = None) -> bool:
+    def remove_movie(self, title: str = None, place: int = None, movie_id: int = None) -> bool:
         """
         Remove movies from database.
         :param title: str, example: 'Joker'
         :param place: int, example: 126
+        :param movie_id: int, imdb tt number, example: 7286456
         :return: True
         """
-        if title and self.top250_db.select_by_title(title=title):
+        if movie_id and self.top250_db.select_by_movie_id(movie_id=movie_id):
+            self.top250_db.delete_movie(movie_id=movie_id)
+            self.LOG.info(f'movie tt{movie_id:07d} has been removed from db')
+
+        elif title and self.top250_db.select_by_title(title=title):
             self.top250_db.delete_movie(title=title)
             self.LOG.info(f'{title} has been removed from db')
 
@@ -149,20 +257,221 @@ class IMDBTOP250Updater:
 
         return True
 
-    def update_top250(self) -> bool:
+    def update_top250(self, rows: list = None) -> bool:
         """
-        Update top250 db with added new movies to original top 250 from imdb website.
+        Update top250 db with added new movies to original top 250 from imdb website,
+        and lists of all users following the chart, each filtered with its own filter profile.
+        :param rows: chart rows from scrape_top250_rows, scraped now when not given.
         :return: True
         """
+        if rows is None:
+            rows = self.scrape_top250_rows()
 
-        self.create_list(update_table=True)
-        self.new_movies = self.top250_db.update_movies_table()
-        if len(self.new_movies) > 0:
-            self.new_movie_flag = True
+        fingerprint = self.chart_fingerprint(rows, self.filter_profile)
+
+        if fingerprint == self.state_db.get_value('chart_fingerprint'):
+            self.new_movies = []
+            self.new_movies_by_user = {}
+            self.changes = None
+            self.new_movie_flag = False
+            self.LOG.info('Chart not changed since last run, nothing to update')
+            return True
+
+        with self.root_db.session():
+            self.changes = self.top250_db.update_movies_table(filter_rows(rows, self.filter_profile))
+            self.chart_entries_db.replace_chart(self.chart.chart_id, rows)
+            self.new_movies_by_user = self.user_lists_db.add_new_movies(self.chart.chart_id,
+                                                                        row_filter=self.user_rows_filter())
+            self.save_new_movies(self.chart.chart_id, self.changes.added)
+        self.new_movies = self.changes.added
+        increment('movies_added_total', len(self.changes.added))
+        increment('movies_dropped_total', len(self.changes.dropped))
+
+        self.state_db.set_value('chart_fingerprint', fingerprint)
+        # reset every update, a daemon updater must not send the same report again
+        self.new_movie_flag = len(self.new_movies) > 0
 
         self.LOG.info('Finish updating movies list')
         return True
 
+    def preview_top250(self, rows: list = None):
+        """
+        Changes update_top250 would apply, nothing is written.
+        :param rows: chart rows from scrape_top250_rows, scraped now when not given.
+        :return: ChangeSet
+        """
+        if rows is None:
+            rows = self.scrape_top250_rows()
+
+        changes, _ = self.top250_db.diff_chart(filter_rows(rows, self.filter_profile))
+        return changes
+
+    def update_chart(self, chart_id: str) -> int:
+        """
+        Refresh membership of another chart in chart_entries table, followed movies list is not changed.
+        :param chart_id: key of updater.charts.CHARTS or 'genre:<genre>', example: 'top1000'
+        :return: number of stored chart rows, 0 if chart not changed since last refresh.
+        """
+        chart = get_chart(chart_id)
+        rows = self.scrape_chart_rows(chart)
+
+        fingerprint = self.chart_fingerprint(rows)
+        state_name = f'chart_fingerprint.{chart.chart_id}'
+        if fingerprint == self.state_db.get_value(state_name):
+            self.new_movies_by_user = {}
+            self.LOG.info(f'{chart.name} not changed since last run, nothing to update')
+            return 0
+
+        with self.root_db.session():
+            stored = self.chart_entries_db.replace_chart(chart.chart_id, rows)
+            self.new_movies_by_user = self.user_lists_db.add_new_movies(chart.chart_id,
+                                                                        row_filter=self.user_rows_filter())
+            self.save_new_movies(chart.chart_id)
+            self.state_db.set_value(state_name, fingerprint)
+        return stored
+
+    def save_new_movies(self, chart_id: str, new_movies: list = None):
+        """
+        Keep ids of movies added by last update of chart, so reports built by another process show them,
+        see load_new_movies.
+        :param new_movies: movies added to top250 list, given when chart is the followed chart.
+        """
+        if new_movies is not None:
+            self.state_db.set_value('new_movies', json.dumps([row[7] for row in new_movies]))
+        for user_id, *_ in self.user_lists_db.select_users(chart_id):
+            movie_ids = [row[7] for row in self.new_movies_by_user.get(user_id, [])]
+            self.state_db.set_value(f'new_movies.{user_id}', json.dumps(movie_ids))
+
+    def load_new_movies(self):
+        """New movies of last update saved by save_new_movies, for reports built without updating first."""
+        movie_ids = json.loads(self.state_db.get_value('new_movies') or '[]')
+        movies = (self.top250_db.select_by_movie_id(movie_id=movie_id) for movie_id in movie_ids)
+        self.new_movies = [movie for movie in movies if movie]
+        self.new_movie_flag = len(self.new_movies) > 0
+
+        self.new_movies_by_user = {}
+        for user_id, *_ in self.user_lists_db.select_users():
+            movie_ids = set(json.loads(self.state_db.get_value(f'new_movies.{user_id}') or '[]'))
+            movies = [row for row in self.user_movies(user_id) if row[7] in movie_ids]
+            if movies:
+                self.new_movies_by_user[user_id] = movies
+
+    def user_email(self, user_id: str) -> str:
+        """:return: email of user list, see add_user."""
+        email = next((email for other_id, email, *_ in self.user_lists_db.select_users() if other_id == user_id), None)
+        if not email:
+            raise ValueError(f'No email for user {user_id}')
+        return email
+
+    def update_user_charts(self) -> list:
+        """
+        Refresh every chart other than the followed one that a user list follows (see add_user), run after
+        update_top250, new movies of their users are added to new_movies_by_user.
+        :return: ids of refreshed charts.
+        """
+        followed_charts = {chart_id for _, _, chart_id, _ in self.user_lists_db.select_users()}
+        chart_ids = sorted(followed_charts - {self.chart.chart_id})
+
+        new_movies_by_user = dict(self.new_movies_by_user)
+        for chart_id in chart_ids:
+            self.update_chart(chart_id)
+            new_movies_by_user.update(self.new_movies_by_user)
+        self.new_movies_by_user = new_movies_by_user
+        return chart_ids
+
+    def add_user(self, user_id: str, email: str = None, chart: str = None, filter_profile: str = 'default') -> int:
+        """
+        Add personal list sharing the scraped catalog, lists of all users are updated by update_top250
+        (followed chart) or update_user_charts (other charts) without scraping again.
+        :param user_id: example: 'dana'
+        :param email: report of new movies is sent to this address, see send_user_reports.
+        :param chart: chart id the list follows, followed chart when not given.
+        :param filter_profile: name of filter profile of list, built in or saved by save_filter_profile.
+        :return: number of movies in new list.
+        """
+        self.load_filter_profile(filter_profile)  # unknown profile raises before anything is written
+
+        chart = get_chart(chart) if chart else self.chart
+        if not self.chart_entries_db.select_chart(chart.chart_id):
+            self.update_chart(chart.chart_id)
+
+        return len(self.user_lists_db.add_user(user_id, email, chart.chart_id, filter_profile=filter_profile,
+                                               row_filter=self.user_rows_filter()))
+
+    def user_movies(self, user_id: str, unseen: bool = False) -> list:
+        """
+        :param unseen: True for unseen movies only.
+        :return: rows of user list, same columns as top250 table.
+        """
+        if unseen:
+            return self.user_lists_db.select_unseen_titles(user_id)
+        return self.user_lists_db.select_list(user_id)
+
+    def update_seen_statuses(self, places, seen_status: bool = True, user_id: str = None) -> dict:
+        """
+        :param user_id: update list of user (see add_user), top250 list when not given.
+        :return: dict of place -> title for places found in list.
+        """
+        if user_id is None:
+            return self.top250_db.update_seen_statuses(places, seen_status=seen_status)
+        return self.user_lists_db.update_seen_statuses(user_id, places, seen_status=seen_status)
+
+    def delete_movies(self, places, user_id: str = None) -> dict:
+        """
+        Removed movies are not added back to the list.
+        :param user_id: remove from list of user (see add_user), top250 list when not given.
+        :return: dict of place -> title for places found in list.
+        """
+        if user_id is None:
+            return self.top250_db.delete_movies(places)
+        return self.user_lists_db.delete_movies(user_id, places)
+
+    def rank_trajectory(self, movie_id: int, since: datetime = None, until: datetime = None,
+                        chart: str = None) -> list:
+        """
+        Place and rating history of movie, see database.tables.MovieHistoryTable.
+        :param movie_id: int, imdb tt number, example: 7286456
+        :param since: first change at or before since is included, all history when not given.
+        :param chart: chart id, followed chart when not given.
+        :return: list of (datetime, place, rating), place is None while movie was out of chart.
+        """
+        chart_id = chart or self.chart.chart_id
+        trajectory = self.chart_entries_db.history_db.select_trajectory(
+            chart_id, movie_id,
+            since=int(since.timestamp()) if since else 0,
+            until=int(until.timestamp()) if until else None,
+        )
+        return [(datetime.fromtimestamp(snapshot_at), place, rating) for snapshot_at, place, rating in trajectory]
+
+    def biggest_movers(self, days: float = 7, limit: int = 10, chart: str = None) -> list:
+        """
+        Movies that moved most places in last days, new entries are not counted.
+        :return: list of (movie_id, title, place days ago, place), most places first.
+        """
+        since = int((datetime.now() - timedelta(days=days)).timestamp())
+        changes = self.chart_entries_db.history_db.select_changes_since(chart or self.chart.chart_id, since)
+
+        movers = [(movie_id, title, old_place, place) for movie_id, title, old_place, place, _, _ in changes
+                  if old_place != place]
+        movers.sort(key=lambda mover: abs(mover[2] - mover[3]), reverse=True)
+        return movers[:limit]
+
+    def rating_drift(self, days: float = 7, limit: int = 10, chart: str = None) -> list:
+        """
+        Movies whose rating changed most in last days.
+        :return: list of (movie_id, title, rating days ago, rating, drift), largest drift first.
+        """
+        since = int((datetime.now() - timedelta(days=days)).timestamp())
+        changes = self.chart_entries_db.history_db.select_changes_since(chart or self.chart.chart_id, since)
+
+        drifts = []
+        for movie_id, title, _, _, old_rating, rating in changes:
+            drift = round(rating - old_rating, 1)
+            if drift:
+                drifts.append((movie_id, title, round(old_rating, 1), rating, drift))
+        drifts.sort(key=lambda drift: abs(drift[4]), reverse=True)
+        return drifts[:limit]
+
     @staticmethod
     def get_user_input_seen_status(title):
         while 1:
@@ -178,33 +487,40 @@ class IMDBTOP250Updater:
         none_seen_status_movies = self.top250_db.select_all_non_seen_status()
 
         for movie in none_seen_status_movies:
-            title = movie[0]
+            movie_id, title = movie[0], movie[1]
             user_input = self.get_user_input_seen_status(title)
 
             if user_input == 1:
-                self.top250_db.update_seen_status(title=title, seen_status=True)
+                self.top250_db.update_seen_status(movie_id=movie_id, seen_status=True)
             elif user_input == 0:
-                self.top250_db.update_seen_status(title=title, seen_status=False)
+                self.top250_db.update_seen_status(movie_id=movie_id, seen_status=False)
 
-    def change_seen_status(self, title: str = None, place: int or str = None, seen_status: bool = None) -> bool:
+    def change_seen_status(self, title: str = None, place: int or str = None, seen_status: bool = None,
+                           movie_id: int = None) -> bool:
         """
         Check movies seen status if current status is None.
         Note: Use parameters if you want to change specific movie seen status.
         :param title: str, example: 'The Dark Knight'
         :param place: int or str, example: 2
         :param seen_status: bool, True or False.
+        :param movie_id: int, imdb tt number, example: 468569
         :return: True
         """
         # if movie in db
-        if place and place <= 250 and len(self.top250_db.select_by_place(place=place)) > 1:
+        if movie_id and self.top250_db.select_by_movie_id(movie_id=movie_id):
+            self.top250_db.update_seen_status(movie_id=movie_id, seen_status=seen_status)
+            return True
+
+        elif place and self.top250_db.select_by_place(place=place):
             self.top250_db.update_seen_status(place=place, seen_status=seen_status)
             return True
 
-        elif title and len(self.top250_db.select_by_title(title=title)) > 0:
-            self.top250_db.update_seen_status(title=title, seen_status=seen_status)
+        elif title and self.top250_db.select_by_title(title=title):
+            movie_id = self.top250_db.select_by_title(title=title)[7]
+            self.top250_db.update_seen_status(movie_id=movie_id, seen_status=seen_status)
             return True
 
-        elif not title and not place and not seen_status:
+        elif not title and not place and not movie_id and not seen_status:
             self.check_seen_status_for_all_movies()
             return True
 
@@ -212,26 +528,19 @@ class IMDBTOP250Updater:
             self.LOG.info(f'Movie did not found in db, cannot update seen status')
             return False
 
-    @staticmethod
-    def get_tabulate_unseen_movies_chart(unseen_titles):
-        df = pd.DataFrame(data=unseen_titles,
-                          columns=['Place', 'Title', 'Year', 'Rating', 'Reviewers', 'Seen Status', 'Link'])
-        df = df.drop(['Seen Status'], axis=1)
-        tabulate.PRESERVE_WHITESPACE = True
-        return tabulate(df, headers='keys', tablefmt='html', numalign='center', stralign='center', showindex=False)
-
-    def unseen_movies(self, df_email: bool = False):
+    def unseen_movies(self, df_email: bool = False, fmt: str = 'html'):
         """
         Exporting unseen movies as list of tuples (seen status is None).
-        :param df_email: True for returning html data frame for email_tools usage.
-        :return: list[tuple] or tabulate html
+        :param df_email: True for returning rendered table for email_tools usage.
+        :param fmt: table format when df_email, 'html', 'text' or 'markdown'.
+        :return: list[tuple] or str
         """
         unseen = self.top250_db.select_unseen_titles()
 
         if not df_email:
             return unseen
         else:
-            return self.get_tabulate_unseen_movies_chart(unseen)
+            return render_unseen_table(unseen, fmt)
 
     @staticmethod
     def get_trailer_link_from_soup(soup_new_movies):
@@ -245,17 +554,26 @@ class IMDBTOP250Updater:
         poster_link = str(poster_tag).split('src=')[1].split(' title')[0]
         return poster_link
 
-    def new_movie_details_for_email_contents(self) -> list:
+    def new_movie_details_for_email_contents(self, movies: list = None) -> list:
         """
         Getting links of imdb movie url, poster image and trailer for new movie add to top 250.
+        :param movies: rows of new movies, new movies of top250 list when not given.
         :return: list
         """
+        movies = self.new_movies if movies is None else movies
+        if not movies:
+            return []
+
+        from bs4 import BeautifulSoup
+
         contents = []
-        for i, tup in enumerate(self.new_movies, start=1):
+        urls = [tup[6] for tup in movies]
+        responses = self.get_imdb_website_responses(urls, ttl=MOVIE_PAGE_CACHE_TTL)
+
+        for tup, response in zip(movies, responses):
             place = tup[0]
-            url = tup[-1]
+            url = tup[6]
 
-            response = self.get_imdb_website_response(url)
             soup_new_movies = BeautifulSoup(response.text, 'html.parser')
 
             poster_link = self.get_poster_link_from_soup(soup_new_movies)
@@ -268,79 +586,44 @@ class IMDBTOP250Updater:
         self.LOG.info('Finished scrapping for new movies details')
         return contents
 
+    @timed('smtp_send_seconds')
     def send_email_with_yag(self, sender_mail, sender_password, receiver_email, subject, contents):
+        import yagmail
+
         self.LOG.debug('Trying to send email')
         yag = yagmail.SMTP(sender_mail, sender_password)
         yag.send(receiver_email, subject, contents)
         self.LOG.info(f'Email sent successfully to {receiver_email}')
 
-    def add_new_movies_to_contents(self, contents):
-        for item in self.new_movie_details_for_email_contents():
-            place, link, poster = item[0], item[1], item[2]
-            movie = self.top250_db.select_by_place(place=place)
-
-            contents.append('<br>'
-                            '<center>'
-                            '<body>'
-                            '<p>'
-                            f'<h3>{" / ".join([str(x) for x in movie[:5]])}</h3>'
-                            '</p>'
-                            '<br>'
-                            f'<img src={poster} alt="Poster" align="middle"/>'
-                            f'<a href="{link}"><img src={IMDB_LOGO} width="80" height= "80" '
-                            'align="middle" alt="IMDB Link"/></a>'
-                            '<br>'
-                            '<hr>'
-                            '<br>'
-                            '</body>'
-                            '</center>')
-
-    def add_unseen_movies_to_contents(self, contents):
-        contents.append('<br>'
-                        '<center>'
-                        f'<h3><u>Unseen Movies List ({len(self.unseen_movies())})</u></h3>'
-                        f'{self.unseen_movies(df_email=True)}'
-                        '</center>')
-
-    def create_contents_with_top_body_msg(self):
-        top = '<br><br>' \
-              '<center><body>' \
-              '<p>' \
-              '<h2><b>IMDB 250 Top Rated Update Notice</b></h2>' \
-              '</p>' \
-              f'<p>' \
-              f'<h3><b>{len(self.new_movies)} Movies Added</b></h3>' \
-              f'</p>' \
-              '</body></center>'
-        return [top]
+    def build_contents(self, fmt: str = 'html', user_id: str = None) -> list:
+        """
+        Report of new movies and unseen movies, see updater.report_renderer.
+        :param fmt: 'html', 'text' or 'markdown'
+        :param user_id: report of user list (see add_user), report of top250 list when not given.
+        :return: list of report parts.
+        """
+        if user_id is None:
+            added, unseen = self.new_movies, self.unseen_movies()
+        else:
+            added, unseen = self.new_movies_by_user.get(user_id, []), self.user_movies(user_id, unseen=True)
 
-    @staticmethod
-    def add_notice_end_to_contents(contents):
-        bottom = 'To delete movie from list reply with: " delete: ### "' \
-                 '<br>' \
-                 'To check seen status for movie in list reply with: " seen: ### "' \
-                 '<br><br>' \
-                 '<big>End of notice.</big>' \
-                 '<br>' \
-                 '<small>Sent with TOP250Updater.</small>'
-        contents.append(bottom)
-
-    def build_contents(self):
-        contents = self.create_contents_with_top_body_msg()
-        self.add_new_movies_to_contents(contents)
-        self.add_unseen_movies_to_contents(contents)
-        self.add_notice_end_to_contents(contents)
-        return contents
+        added_by_place = {movie[0]: movie for movie in added}
+        new_movies = [(added_by_place[place], poster)
+                      for place, link, poster in self.new_movie_details_for_email_contents(added)]
 
-    def send_email(self, receiver_email: str, sender_mail: str, sender_password: str) -> bool:
+        return render_report(new_movies, unseen, fmt)
+
+    def send_email(self, receiver_email: str, sender_mail: str, sender_password: str, contents: list = None,
+                   user_id: str = None) -> bool:
         """
         Sending email report msg with new movies that added and all unseen movies by user.
+        :param contents: report from build_contents, built now when not given.
+        :param user_id: send report of user list, see build_contents.
         :return: True
         """
-        global IMDB_LOGO
-        subject = f'IMDB TOP 250 Updater {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
-        IMDB_LOGO = 'https://ia.media-imdb.com/images/M/MV5BMTczNjM0NDY0Ml5BMl5BcG5nXkFtZTgwMTk1MzQ2OTE@._V1_.png'
-        contents = self.build_contents()
+        subject = f'{REPORT_SUBJECT} {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+        if contents is None:
+            contents = self.build_contents(user_id=user_id)
 
         try:
             self.send_email_with_yag(sender_mail, sender_password, receiver_email, subject, contents)
@@ -350,6 +633,20 @@ class IMDBTOP250Updater:
             self.LOG.exception(f'Failed to send email message')
             raise
 
+    def send_user_reports(self, sender_mail: str, sender_password: str) -> int:
+        """
+        Send report of last update to every user with an email address whose list got new movies.
+        :return: number of sent reports.
+        """
+        sent = 0
+        for user_id, email, _, _ in self.user_lists_db.select_users():
+            if email and self.new_movies_by_user.get(user_id):
+                self.send_email(email, sender_mail, sender_password, user_id=user_id)
+                sent += 1
+
+        self.LOG.info(f'{sent} user reports sent')
+        return sent
+
     @staticmethod
     def get_movies_places_for_actions(message_body):
         movies_places_to_delete = re.search('(delete([:\-])\s*)([0-9]+)(\s+[0-9]+)*', message_body.lower())
@@ -368,49 +665,97 @@ class IMDBTOP250Updater:
 
         return movies_places_only_to_delete, movies_places_only_to_seen
 
-    def send_reply_request_email(self, body):
-        msg = self.gmail_agent.create_message(sender=gmail_vars.sender, to=gmail_vars.to,
+    def send_reply_request_email(self, body, to: str = None):
+        """:param to: address of user who replied, owner address when not given."""
+        from email_tools import gmail_vars
+
+        msg = self.gmail_agent.create_message(sender=gmail_vars.sender, to=to or gmail_vars.to,
                                               subject='IMDB Updater auto-reply', message_text=body)
         self.gmail_agent.send_message(message=msg)
 
     def setup_gmail_agent(self):
-        self.gmail_agent = GmailAgent()
-        self.gmail_agent.login()
+        """Login once, later calls (daemon mode) reuse the Gmail service and its credentials."""
+        if self.gmail_agent is not None:
+            return
+
+        from email_tools.google_agents import GmailAgent
+
+        gmail_agent = GmailAgent()
+        gmail_agent.login()
+        self.gmail_agent = gmail_agent
 
     def check_email_replies(self) -> bool:
         """
         Checking email mailbox for replying emails for taking actions - updating seen status or deleting from user db.
+        Replies sent from the email of a user (see add_user) act on that user list, other replies on top250 list.
         example: email content - 'delete: 2 10 55' or 'seen- 150'
         :return: True
         """
         self.LOG.debug('Start check email_tools replays for actions')
         self.setup_gmail_agent()
 
-        messages = self.gmail_agent.list_messages_from_inbox()
-        for message in messages:
-            msg_id = message['id']
-            msg_body = self.gmail_agent.get_message(message_id=msg_id)
-            movies_places_to_delete, movies_places_to_seen = self.get_movies_places_for_actions(msg_body)
-            if movies_places_to_delete:
-                titles_by_places = {}
-                for p in movies_places_to_delete:
-                    title = self.top250_db.delete_movie(place=p)
-                    titles_by_places[p] = title
+        # read history id first, messages arriving while replies are processed are picked up next run
+        next_history_id = self.gmail_agent.get_history_id()
+        messages = self.get_new_inbox_messages()
 
-                body = f'The movies {titles_by_places} has been deleted from database'
-                self.send_reply_request_email(body)
-                self.LOG.info(f'The movies {titles_by_places} has been deleted by reply request')
+        replies = self.gmail_agent.get_messages([message['id'] for message in messages])
+        replies = {msg_id: message for msg_id, message in replies.items()
+                   if REPLY_SUBJECT_PATTERN.match(self.gmail_agent.message_header(message, 'Subject'))}
 
+        # collect actions of all replies per list, then apply them at once
+        emails = {user_id: email for user_id, email, _, _ in self.user_lists_db.select_users() if email}
+        users_by_email = {email.lower(): user_id for user_id, email in emails.items()}
+        actions = {}  # user_id, None for top250 list -> (places to delete, places to check as seen)
+        for message in replies.values():
+            _, sender = parseaddr(self.gmail_agent.message_header(message, 'From'))
+            places_to_delete, places_to_seen = actions.setdefault(users_by_email.get(sender.lower()), (set(), set()))
+
+            msg_body = self.gmail_agent.message_body(message)
+            movies_places_to_delete, movies_places_to_seen = self.get_movies_places_for_actions(msg_body)
+            if movies_places_to_delete:
+                places_to_delete.update(movies_places_to_delete)
             elif movies_places_to_seen:
-                titles_by_places = {}
-                for p in movies_places_to_seen:
-                    title = self.top250_db.update_seen_status(place=p, seen_status=True)
-                    titles_by_places[p] = title
+                places_to_seen.update(movies_places_to_seen)
+
+        increment('gmail_replies_processed_total', len(replies))
+        results = {}
+        with self.root_db.session():
+            for user_id, (places_to_delete, places_to_seen) in actions.items():
+                places_to_seen -= places_to_delete
+                if places_to_delete or places_to_seen:
+                    results[user_id] = (self.delete_movies(places_to_delete, user_id=user_id),
+                                        self.update_seen_statuses(places_to_seen, user_id=user_id))
+
+        for user_id, (deleted, seen) in results.items():
+            list_name = 'database' if user_id is None else f'list of {user_id}'
+            body = []
+            if deleted:
+                body.append(f'The movies {deleted} has been deleted from {list_name}')
+                self.LOG.info(f'The movies {deleted} has been deleted from {list_name} by reply request')
+            if seen:
+                body.append(f'The Movies {seen} checked as seen in {list_name}')
+                self.LOG.info(f'The movies {seen} checked as seen in {list_name} by reply request')
+            if body:
+                self.send_reply_request_email('\n'.join(body), to=emails.get(user_id))
+
+        if replies:
+            self.gmail_agent.delete_messages(list(replies))
+
+        self.state_db.set_value('gmail_history_id', next_history_id)
+        return True
 
-                body = f'The Movies {titles_by_places} checked as seen in database'
-                self.send_reply_request_email(body)
-                self.LOG.info(f'The movies {titles_by_places} checked as seen by reply request')
+    def get_new_inbox_messages(self) -> list:
+        """
+        Inbox messages added since last check, full search for updater replies on first run
+        or when saved history id expired.
+        """
+        history_id = self.state_db.get_value('gmail_history_id')
+        messages = None
+        if history_id:
+            messages = self.gmail_agent.list_history_messages(start_history_id=history_id)
 
-            self.gmail_agent.delete_message(message_id=msg_id)
+        if messages is None:
+            messages = self.gmail_agent.list_messages(query=REPLIES_QUERY)
 
-        return True
+        self.LOG.debug(f'{len(messages)} new inbox messages')
+        return messages
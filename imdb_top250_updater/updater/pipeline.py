@@ -0,0 +1,97 @@
+"""
+Asyncio pipeline of dependent stages.
+Every stage starts as soon as the stages it depends on are finished, so independent stages overlap
+and run time is the critical path of the graph instead of the sum of all stages.
+Stages are plain blocking functions (network, database, smtp), each one runs in a worker thread.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from typing import Callable, NamedTuple
+
+from logs.metrics import METRICS
+
+LOG = logging.getLogger('IMDB.Pipeline.Logger')
+handler = logging.StreamHandler(sys.stdout)
+LOG.addHandler(handler)
+
+
+class Stage(NamedTuple):
+    name: str
+    func: Callable  # called with results of depends_on stages, in the same order
+    depends_on: tuple
+
+
+class StageTiming(NamedTuple):
+    start: float  # seconds since pipeline start
+    duration: float
+
+
+class Pipeline:
+    """
+    example:
+        pipeline = Pipeline()
+        pipeline.add_stage('fetch_chart', updater.scrape_top250_rows)
+        pipeline.add_stage('update_top250', lambda rows: updater.update_top250(rows=rows),
+                           depends_on=('fetch_chart',))
+        results = pipeline.run()
+    """
+
+    def __init__(self):
+        self.stages: dict = {}
+        self.timings: dict = {}
+
+    def add_stage(self, name: str, func: Callable, depends_on: tuple = ()) -> 'Pipeline':
+        """
+        Stages must be added after the stages they depend on, so the graph can not have cycles.
+        """
+        if name in self.stages:
+            raise ValueError(f'Stage {name} already added')
+
+        missing = [dependency for dependency in depends_on if dependency not in self.stages]
+        if missing:
+            raise ValueError(f'Stage {name} depends on unknown stages: {missing}')
+
+        self.stages[name] = Stage(name=name, func=func, depends_on=tuple(depends_on))
+        return self
+
+    async def _run_stage(self, stage: Stage, tasks: dict, started: float):
+        dependency_results = [await tasks[dependency] for dependency in stage.depends_on]
+
+        start = time.perf_counter()
+        LOG.debug(f'stage {stage.name} started')
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, stage.func, *dependency_results)
+        finally:
+            end = time.perf_counter()
+            self.timings[stage.name] = StageTiming(start=start - started, duration=end - start)
+            METRICS.observe('pipeline_stage_seconds', end - start, stage=stage.name)
+            LOG.info(f'stage {stage.name} took {end - start:.3f}s')
+
+    async def run_async(self) -> dict:
+        """
+        Run all stages. Stages depending on a failed stage are skipped, independent stages still finish,
+        then the first error is raised.
+        :return: dict of stage name -> stage result
+        """
+        self.timings = {}
+        started = time.perf_counter()
+
+        tasks = {}
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.ensure_future(self._run_stage(stage, tasks, started))
+
+        # a failed stage task raises again in every dependent stage awaiting it
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        LOG.info(f'pipeline finished in {time.perf_counter() - started:.3f}s')
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return dict(zip(tasks, results))
+
+    def run(self) -> dict:
+        return asyncio.run(self.run_async())
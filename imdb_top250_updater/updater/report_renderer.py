@@ -0,0 +1,171 @@
+"""
+Email report rendering with templates compiled once at import (string.Template), no pandas or tabulate needed.
+Rows are streamed straight from database tuples: [place, title, year, rating, reviewers, seen_status, link, movie_id].
+
+Formats:
+    'html' - report parts for yagmail contents, the default.
+    'text' - plain text.
+    'markdown' - markdown tables.
+
+example:
+    contents = render_report(new_movies=[(row, poster_link)], unseen=top250_db.select_unseen_titles())
+"""
+
+from html import escape
+from string import Template
+from typing import Callable, NamedTuple
+
+IMDB_LOGO = 'https://ia.media-imdb.com/images/M/MV5BMTczNjM0NDY0Ml5BMl5BcG5nXkFtZTgwMTk1MzQ2OTE@._V1_.png'
+
+
+class ReportTemplates(NamedTuple):
+    header: Template  # $added
+    new_movie: Template  # $place $title $year $rating $reviewers $link $poster
+    unseen_header: Template  # $count
+    unseen_row: Template  # $place $title $year $rating $reviewers $link
+    unseen_footer: Template
+    footer: Template
+    quote: Callable  # makes a value safe to put in the format
+
+
+def quote_markdown(value) -> str:
+    return str(value).replace('|', '\\|')
+
+
+HTML_TEMPLATES = ReportTemplates(
+    header=Template(
+        '<br><br>'
+        '<center><body>'
+        '<p><h2><b>IMDB 250 Top Rated Update Notice</b></h2></p>'
+        '<p><h3><b>$added Movies Added</b></h3></p>'
+        '</body></center>'
+    ),
+    new_movie=Template(
+        '<br>'
+        '<center>'
+        '<body>'
+        '<p><h3>$place / $title / $year / $rating / $reviewers</h3></p>'
+        '<br>'
+        '<img src="$poster" alt="Poster" align="middle"/>'
+        f'<a href="$link"><img src={IMDB_LOGO} width="80" height= "80" align="middle" alt="IMDB Link"/></a>'
+        '<br>'
+        '<hr>'
+        '<br>'
+        '</body>'
+        '</center>'
+    ),
+    unseen_header=Template(
+        '<br>'
+        '<center>'
+        '<h3><u>Unseen Movies List ($count)</u></h3>'
+        '<table>\n<thead>\n<tr>'
+        '<th style="text-align: center;">Place</th><th style="text-align: center;">Title</th>'
+        '<th style="text-align: center;">Year</th><th style="text-align: center;">Rating</th>'
+        '<th style="text-align: center;">Reviewers</th><th style="text-align: center;">Link</th>'
+        '</tr>\n</thead>\n<tbody>\n'
+    ),
+    unseen_row=Template(
+        '<tr><td style="text-align: center;">$place</td><td style="text-align: center;">$title</td>'
+        '<td style="text-align: center;">$year</td><td style="text-align: center;">$rating</td>'
+        '<td style="text-align: center;">$reviewers</td><td style="text-align: center;">$link</td></tr>\n'
+    ),
+    unseen_footer=Template(
+        '</tbody>\n</table>'
+        '</center>'
+    ),
+    footer=Template(
+        'To delete movie from list reply with: " delete: ### "'
+        '<br>'
+        'To check seen status for movie in list reply with: " seen: ### "'
+        '<br><br>'
+        '<big>End of notice.</big>'
+        '<br>'
+        '<small>Sent with TOP250Updater.</small>'
+    ),
+    quote=escape,
+)
+
+TEXT_TEMPLATES = ReportTemplates(
+    header=Template('IMDB 250 Top Rated Update Notice\n$added Movies Added\n'),
+    new_movie=Template('$place / $title / $year / $rating / $reviewers\n$link\n'),
+    unseen_header=Template('Unseen Movies List ($count)\n'),
+    unseen_row=Template('$place / $title / $year / $rating / $reviewers / $link\n'),
+    unseen_footer=Template(''),
+    footer=Template(
+        'To delete movie from list reply with: " delete: ### "\n'
+        'To check seen status for movie in list reply with: " seen: ### "\n\n'
+        'End of notice.\n'
+        'Sent with TOP250Updater.\n'
+    ),
+    quote=str,
+)
+
+MARKDOWN_TEMPLATES = ReportTemplates(
+    header=Template('## IMDB 250 Top Rated Update Notice\n\n**$added Movies Added**\n'),
+    new_movie=Template('### $place / $title / $year / $rating / $reviewers\n\n![Poster]($poster) [IMDB]($link)\n'),
+    unseen_header=Template(
+        '### Unseen Movies List ($count)\n\n'
+        '| Place | Title | Year | Rating | Reviewers | Link |\n'
+        '|:-----:|:-----:|:----:|:------:|:---------:|:----:|\n'
+    ),
+    unseen_row=Template('| $place | $title | $year | $rating | $reviewers | $link |\n'),
+    unseen_footer=Template(''),
+    footer=Template(
+        'To delete movie from list reply with: `delete: ###`  \n'
+        'To check seen status for movie in list reply with: `seen: ###`\n\n'
+        '*Sent with TOP250Updater.*\n'
+    ),
+    quote=quote_markdown,
+)
+
+TEMPLATES = {
+    'html': HTML_TEMPLATES,
+    'text': TEXT_TEMPLATES,
+    'markdown': MARKDOWN_TEMPLATES,
+}
+
+
+def get_templates(fmt: str) -> ReportTemplates:
+    try:
+        return TEMPLATES[fmt]
+    except KeyError:
+        raise ValueError(f'Unknown report format: {fmt}, choose from {list(TEMPLATES)}')
+
+
+def movie_fields(row, quote: Callable) -> dict:
+    place, title, year, rating, reviewers, _, link, _ = row
+    return {'place': place, 'title': quote(title), 'year': year, 'rating': rating,
+            'reviewers': quote(reviewers), 'link': quote(link)}
+
+
+def iter_unseen_table(rows, fmt: str = 'html'):
+    """Yield table parts row by row, rows are not copied or converted to a frame."""
+    templates = get_templates(fmt)
+    rows = list(rows)
+
+    yield templates.unseen_header.substitute(count=len(rows))
+    for row in rows:
+        yield templates.unseen_row.substitute(movie_fields(row, templates.quote))
+    yield templates.unseen_footer.substitute()
+
+
+def render_unseen_table(rows, fmt: str = 'html') -> str:
+    return ''.join(iter_unseen_table(rows, fmt))
+
+
+def render_report(new_movies, unseen, fmt: str = 'html') -> list:
+    """
+    :param new_movies: list of (row, poster link) of movies added to list, see IMDBTOP250Updater.build_contents
+    :param unseen: rows of unseen movies.
+    :return: list of report parts, for yagmail contents.
+    """
+    templates = get_templates(fmt)
+
+    contents = [templates.header.substitute(added=len(new_movies))]
+    for row, poster in new_movies:
+        # poster links are scraped with their quotes
+        contents.append(templates.new_movie.substitute(movie_fields(row, templates.quote),
+                                                       poster=templates.quote(poster.strip('"'))))
+    contents.append(render_unseen_table(unseen, fmt))
+    contents.append(templates.footer.substitute())
+    return contents
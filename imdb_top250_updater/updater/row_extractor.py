@@ -0,0 +1,69 @@
+"""
+Chart entries (see updater.chart_parser) to movie rows, one pass per entry with precompiled patterns.
+Malformed entries are collected as RowError instead of stopping the whole chart.
+"""
+
+import re
+from typing import NamedTuple
+
+from logs.exceptions import RowError
+
+# '\n 1.\n The Shawshank Redemption\n (1994)\n', rank is optional
+TITLE_COLUMN_PATTERN = re.compile(r'^\s*(?:(\d+)\.\s+)?(.+?)\s*\((\d{4})\)\s*$', re.DOTALL)
+# '9.2 based on 2,165,496 user ratings'
+RATING_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?) based on ([\d,]+) user ratings?')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class MovieRow(NamedTuple):
+    """Row of top250 table, same column order as database.tables.MOVIE_COLUMNS."""
+    place: int
+    title: str
+    year: int
+    rating: float
+    reviewers: str  # example: '2,165,496'
+    seen_status: bool
+    link: str
+    movie_id: int
+
+
+def extract_row(entry, place: int) -> MovieRow:
+    """
+    :param entry: ChartEntry
+    :param place: chart place used when title column has no rank.
+    :raise RowError: if title column, rating text or link is malformed.
+    """
+    title_match = TITLE_COLUMN_PATTERN.match(entry.title_column)
+    if title_match is None:
+        raise RowError(place, 'title_column', entry.title_column)
+
+    rating_match = RATING_PATTERN.match(entry.rating)
+    if rating_match is None:
+        raise RowError(place, 'rating', entry.rating)
+
+    if entry.movie_id is None:
+        raise RowError(place, 'link', entry.link or '')
+
+    rank, title, year = title_match.groups()
+    return MovieRow(place=int(rank) if rank else place,
+                    title=WHITESPACE_PATTERN.sub(' ', title),
+                    year=int(year),
+                    rating=float(rating_match.group(1)),
+                    reviewers=rating_match.group(2),
+                    seen_status=None,
+                    link=entry.link,
+                    movie_id=entry.movie_id)
+
+
+def extract_rows(entries) -> tuple:
+    """
+    :param entries: iterable of ChartEntry in chart order.
+    :return: (list of MovieRow, list of RowError)
+    """
+    rows, errors = [], []
+    for index, entry in enumerate(entries):
+        try:
+            rows.append(extract_row(entry, place=index + 1))
+        except RowError as error:
+            errors.append(error)
+    return rows, errors
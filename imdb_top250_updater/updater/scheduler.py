@@ -0,0 +1,140 @@
+"""
+In process scheduler for daemon mode: jobs repeat at their own interval, with jitter, and back off on failure.
+Jobs run one at a time in the scheduler thread, so they can share one updater (database connections,
+http session and Gmail service stay open between runs).
+With a state table, time of last successful run of every job is kept, a restarted daemon does not run
+jobs again before their interval passed.
+
+example:
+    scheduler = Scheduler(state=updater.state_db)
+    scheduler.add_job('email_replies', updater.check_email_replies, interval=5 * 60)
+    scheduler.add_job('refresh', refresh, interval=60 * 60, jitter=0.1)
+    scheduler.run_forever(stop_event)
+"""
+
+import logging
+import random
+import sys
+import threading
+import time
+from typing import Callable
+
+from logs.metrics import METRICS
+
+LOG = logging.getLogger('IMDB.Scheduler.Logger')
+handler = logging.StreamHandler(sys.stdout)
+LOG.addHandler(handler)
+
+
+class Job:
+
+    def __init__(self, name: str, func: Callable, interval: float, jitter: float, retry_delay: float,
+                 max_backoff: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.failures = 0  # consecutive failed runs
+        self.next_run = 0.0
+
+    def next_delay(self, rng: random.Random) -> float:
+        """
+        Seconds until next run: interval +- jitter after success,
+        retry_delay doubled on every consecutive failure (up to max_backoff) after failure.
+        """
+        if self.failures:
+            delay = min(self.retry_delay * 2 ** (self.failures - 1), self.max_backoff)
+        else:
+            delay = self.interval
+        return delay * rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class Scheduler:
+
+    def __init__(self, clock: Callable = time.monotonic, rng: random.Random = None, state=None,
+                 wall_clock: Callable = time.time):
+        """
+        :param clock: seconds, monotonic.
+        :param rng: random source of jitter.
+        :param state: StateTable like object (get_value, set_value) keeping last run unix time of jobs.
+        :param wall_clock: unix time of last runs in state.
+        """
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.state = state
+        self.wall_clock = wall_clock
+        self.jobs: dict = {}
+
+    @staticmethod
+    def _state_name(job: Job) -> str:
+        return f'scheduler.{job.name}.last_run'
+
+    def _first_delay(self, job: Job, run_now: bool) -> float:
+        last_run = self.state.get_value(self._state_name(job)) if self.state is not None else None
+        if last_run is not None:
+            return max(0.0, float(last_run) + job.interval - self.wall_clock())
+        return 0.0 if run_now else job.next_delay(self.rng)
+
+    def add_job(self, name: str, func: Callable, interval: float, jitter: float = 0.1, retry_delay: float = 60,
+                max_backoff: float = None, run_now: bool = True) -> 'Scheduler':
+        """
+        :param interval: seconds between successful runs.
+        :param jitter: fraction of delay added or removed at random, so runs do not align with other clients.
+        :param retry_delay: seconds before first retry of a failed run.
+        :param max_backoff: max seconds between retries, interval when not given.
+        :param run_now: False to wait one interval before first run, ignored when last run is in state.
+        """
+        if name in self.jobs:
+            raise ValueError(f'Job {name} already added')
+
+        job = Job(name=name, func=func, interval=interval, jitter=jitter, retry_delay=retry_delay,
+                  max_backoff=interval if max_backoff is None else max_backoff)
+        job.next_run = self.clock() + self._first_delay(job, run_now)
+        self.jobs[name] = job
+        return self
+
+    def run_job(self, job: Job):
+        start = time.perf_counter()
+        try:
+            job.func()
+            job.failures = 0
+            if self.state is not None:
+                self.state.set_value(self._state_name(job), str(self.wall_clock()))
+        except Exception:
+            job.failures += 1
+            METRICS.increment('scheduler_job_failures_total', job=job.name)
+            LOG.exception(f'job {job.name} failed {job.failures} times in a row')
+        finally:
+            METRICS.observe('scheduler_job_seconds', time.perf_counter() - start, job=job.name)
+
+        job.next_run = self.clock() + job.next_delay(self.rng)
+        LOG.info(f'job {job.name} next run in {job.next_run - self.clock():.0f}s')
+
+    def run_pending(self) -> float:
+        """
+        Run due jobs, earliest first.
+        :return: seconds until next due job.
+        """
+        for job in sorted(self.jobs.values(), key=lambda job: job.next_run):
+            if job.next_run <= self.clock():
+                self.run_job(job)
+
+        return max(0.0, min(job.next_run for job in self.jobs.values()) - self.clock())
+
+    def run_forever(self, stop_event: threading.Event = None, after_run: Callable = None):
+        """
+        Run jobs until stop_event is set, sleeping between due times.
+        :param after_run: called after every round of due jobs, example: export metrics.
+        """
+        stop_event = stop_event or threading.Event()
+        LOG.info(f'scheduler started with jobs: {list(self.jobs)}')
+
+        while not stop_event.is_set():
+            delay = self.run_pending()
+            if after_run:
+                after_run()
+            stop_event.wait(delay)
+
+        LOG.info('scheduler stopped')
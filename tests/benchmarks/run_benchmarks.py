@@ -0,0 +1,279 @@
+"""
+Benchmark suite on recorded fixtures, no IMDB, MySQL or Gmail needed:
+pages are served from tests/data by tests/local_imdb_server.py and movies are kept in an in memory SQLite database.
+Results are written as JSON, to compare commits and catch regressions.
+
+Run from repository root:
+    python tests/benchmarks/run_benchmarks.py --output bench.json
+    python tests/benchmarks/run_benchmarks.py --compare base.json bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, 'imdb_top250_updater'))
+sys.path.insert(0, ROOT)
+
+from tests.local_imdb_server import LocalIMDBServer  # noqa: E402
+
+BENCHMARKS = {}
+REGRESSION_THRESHOLD = 1.2  # slower than base by this ratio counts as regression
+
+REPLY_BODIES = [
+    'delete: 12 55 130',
+    'Seen- 7 8 9 10 11',
+    'thanks!\n\nOn Mon, IMDB TOP 250 Updater wrote:\n> To delete movie from list reply with: " delete: ### "',
+    'seen:250',
+] * 50
+
+
+def benchmark(name: str, number: int = 10, repeat: int = 3):
+    """Register benchmark, function gets the Context and returns (func, setup), setup time is not measured."""
+
+    def decorator(func):
+        BENCHMARKS[name] = (func, number, repeat)
+        return func
+
+    return decorator
+
+
+def measure(func, setup=None, number: int = 10, repeat: int = 3) -> dict:
+    """:return: seconds per call, best and mean of repeat rounds of number calls."""
+    rounds = []
+    for _ in range(repeat):
+        total = 0.0
+        for _ in range(number):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            total += time.perf_counter() - start
+        rounds.append(total / number)
+
+    return {'best': min(rounds), 'mean': sum(rounds) / len(rounds), 'number': number, 'repeat': repeat}
+
+
+class Context:
+    """Shared fixtures, the updater is created on first use so missing dependencies only skip its benchmarks."""
+
+    def __init__(self, server: LocalIMDBServer):
+        self.server = server
+        self._updater = None
+        self._response = None
+
+    @property
+    def chart_url(self) -> str:
+        return self.server.url + '/chart/top'
+
+    def local_link(self, link: str) -> str:
+        return self.server.url + link[link.index('/title/'):]
+
+    @property
+    def updater(self):
+        if self._updater is None:
+            from updater.imdb_updater import IMDBTOP250Updater
+
+            self._updater = IMDBTOP250Updater(db_name=':memory:', backend='sqlite')
+            self._updater.top250_db.create_table(table_name='top250')
+        return self._updater
+
+    @property
+    def response(self):
+        if self._response is None:
+            self._response = self.updater.get_imdb_website_response(self.chart_url)
+        return self._response
+
+    @property
+    def entries(self) -> list:
+        return self.updater.get_scraped_items(self.response)
+
+    def reset_movies_table(self, rows: list = ()):
+        top250_db = self.updater.top250_db
+        top250_db.drop_table(table_name='top250')
+        top250_db.create_table(table_name='top250')
+        top250_db.insert_movies(rows, table_name='top250')
+
+
+@benchmark('fetch_chart_revalidate', number=20)
+def fetch_chart(context: Context):
+    # cached chart older than ttl, one conditional request answered with 304
+    return lambda: context.updater.get_imdb_website_response(context.chart_url, ttl=0), None
+
+
+def parse_chart(engine: str):
+    def setup(context: Context):
+        from updater.chart_parser import get_chart_parser
+
+        # soup engine imports bs4 on first parse, a missing bs4 only skips this benchmark
+        parser = get_chart_parser(engine)
+        response = context.response
+        return lambda: context.updater.get_scraped_items(response, parser), None
+
+    return setup
+
+
+benchmark('parse_chart_streaming')(parse_chart('streaming'))
+benchmark('parse_chart_soup', number=3)(parse_chart('soup'))
+
+
+@benchmark('extract_and_insert_rows')
+def extract_rows(context: Context):
+    entries = context.entries
+    return (lambda: context.updater.insert_valid_movies_only_to_movies_table(entries, False, 'top250'),
+            context.reset_movies_table)
+
+
+@benchmark('update_movies_table')
+def update_diff(context: Context):
+    chart_rows = context.updater.get_valid_movies_rows(context.entries)
+
+    # last run: 5 movies left the chart since, every 10th movie moved and re-rated
+    last_run_rows = []
+    for index, row in enumerate(chart_rows[5:]):
+        row = list(row)
+        if index % 10 == 0:
+            row[0], row[3] = -row[0], round(row[3] - 0.1, 1)
+        last_run_rows.append(row)
+
+    return (lambda: context.updater.top250_db.update_movies_table(chart_rows),
+            lambda: context.reset_movies_table(last_run_rows))
+
+
+@benchmark('sync_user_lists', number=5)
+def sync_user_lists(context: Context):
+    # 200 users following the chart, each list is missing the 5 movies added since last run
+    updater = context.updater
+    rows = updater.get_valid_movies_rows(context.entries)
+    updater.chart_entries_db.replace_chart('top250', rows)
+    for index in range(200):
+        updater.user_lists_db.add_user(f'user{index}', None, 'top250')
+
+    def setup():
+        with updater.root_db.session() as my_cursor:
+            my_cursor.executemany("DELETE FROM user_movies WHERE movie_id = %s", [(row.movie_id,) for row in rows[:5]])
+
+    return lambda: updater.user_lists_db.add_new_movies('top250'), setup
+
+
+@benchmark('build_contents', number=5)
+def build_report(context: Context):
+    rows = context.updater.get_valid_movies_rows(context.entries)
+    context.reset_movies_table(rows)
+
+    # 5 new movies, their pages come from the local server (served from http cache after first call)
+    new_movies = [row._replace(link=context.local_link(row.link)) for row in rows[:5]]
+
+    def setup():
+        context.updater.new_movies = new_movies
+
+    return context.updater.build_contents, setup
+
+
+@benchmark('get_movies_places_for_actions', number=20)
+def reply_parsing(context: Context):
+    from updater.imdb_updater import IMDBTOP250Updater
+
+    def parse_replies():
+        for body in REPLY_BODIES:
+            IMDBTOP250Updater.get_movies_places_for_actions(body)
+
+    return parse_replies, None
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names: list = None) -> dict:
+    report = {
+        'commit': git_commit(),
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'results': {},
+        'skipped': {},
+    }
+
+    # updater writes logs, database and http cache relative to working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir, LocalIMDBServer() as server:
+        os.chdir(work_dir)
+        for directory in ('database', 'logs'):
+            os.mkdir(directory)
+
+        logging.disable(logging.INFO)
+        context = Context(server)
+        try:
+            for name, (create, number, repeat) in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                try:
+                    func, setup = create(context)
+                    report['results'][name] = measure(func, setup, number=number, repeat=repeat)
+                except ImportError as e:
+                    report['skipped'][name] = str(e)
+                    print(f'{name}: skipped ({e})')
+                    continue
+
+                print(f'{name}: {report["results"][name]["best"] * 1000:.3f} ms')
+        finally:
+            logging.disable(logging.NOTSET)
+            if context._updater is not None:
+                context._updater.root_db.close_connection()
+            os.chdir(cwd)
+
+    return report
+
+
+def compare(base_path: str, new_path: str, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """Print best time ratio of every benchmark found in both reports, :return: names of regressed benchmarks."""
+    with open(base_path) as file:
+        base = json.load(file)['results']
+    with open(new_path) as file:
+        new = json.load(file)['results']
+
+    regressions = []
+    for name in sorted(base.keys() & new.keys()):
+        ratio = new[name]['best'] / base[name]['best']
+        flag = ''
+        if ratio > threshold:
+            regressions.append(name)
+            flag = '  <-- regression'
+        print(f'{name}: {base[name]["best"] * 1000:.3f} ms -> {new[name]["best"] * 1000:.3f} ms ({ratio:.2f}x){flag}')
+
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='write results json to this path')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='run only these benchmarks')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two results json files')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare, threshold=args.threshold) else 0
+
+    report = run(args.only)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
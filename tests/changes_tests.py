@@ -0,0 +1,42 @@
+import unittest
+
+from database.changes import diff_movies
+from tests.data.movies import LINK, MOVIE_ROWS
+
+
+class TestDiffMovies(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.current = MOVIE_ROWS
+
+    def test_no_changes(self):
+        changes = diff_movies(self.current, self.current, [])
+        self.assertTrue(changes.is_empty())
+
+    def test_added_dropped_moved_rerated(self):
+        chart = [
+            (1, 'The Shawshank Redemption', 1994, 9.2, '2,165,496', None, LINK, 111161),
+            (3, 'The Dark Knight', 2008, 9.0, '2,140,454', None, LINK, 468569),
+            (12, 'Gisaengchung', 2019, 8.6, '46,335', None, LINK, 6751668),
+            (40, 'Coco', 2017, 8.4, '300,703', None, LINK, 2380307),
+        ]
+        changes = diff_movies(self.current, chart, removed_ids=[2380307])
+
+        self.assertEqual([row[1] for row in changes.added], ['Gisaengchung'])
+        self.assertEqual([row[1] for row in changes.dropped], ['Joker'])
+        self.assertEqual(changes.moved, [(4, (3, 'The Dark Knight', 2008, 9.0, '2,140,454', None, LINK, 468569))])
+        self.assertEqual(changes.rerated, [])
+
+    def test_float_noise_not_rerated(self):
+        # rating as read back from a float column
+        stored = [(1, 'The Shawshank Redemption', 1994, 9.199999809265137, '2,165,496', True, LINK, 111161)]
+        changes = diff_movies(stored, self.current[:1], [])
+        self.assertTrue(changes.is_empty())
+
+    def test_rerated_keeps_seen_status(self):
+        chart = [(1, 'The Shawshank Redemption', 1994, 9.3, '2,200,000', None, LINK, 111161)]
+        changes = diff_movies(self.current[:1], chart, [])
+
+        self.assertEqual(changes.rerated,
+                         [(9.2, (1, 'The Shawshank Redemption', 1994, 9.3, '2,200,000', True, LINK, 111161))])
+        self.assertEqual(changes.updated_rows()[0][5], True)
@@ -0,0 +1,59 @@
+import os
+import unittest
+
+from updater.chart_parser import parse_chart_soup, parse_chart_streaming
+from updater.row_extractor import extract_rows
+
+CHART_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'imdb_chart_top.html')
+CHART_ROW = (
+    '<tr><td class="titleColumn">{place}. <a {href}>{title}</a> <span class="secondaryInfo">({year})</span></td>'
+    '<td class="ratingColumn imdbRating"><strong title="{rating} based on 1,000 user ratings">{rating}</strong></td>'
+    '</tr>'
+)
+# second row has an <a> without href, third a link without title id
+MALFORMED_LINKS_CHART = '<table><tbody>{}</tbody></table>'.format(''.join([
+    CHART_ROW.format(place=1, href='href="/title/tt0111161/"', title='The Shawshank Redemption', year=1994, rating=9.2),
+    CHART_ROW.format(place=2, href='', title='The Godfather', year=1972, rating=9.1),
+    CHART_ROW.format(place=3, href='href="/list/ls000000/"', title='Joker', year=2019, rating=8.7),
+]))
+
+
+def normalize_title_columns(entries) -> list:
+    """Engines keep different whitespace around the title cell text, rows extracted from it are the same."""
+    return [entry._replace(title_column=' '.join(entry.title_column.split())) for entry in entries]
+
+
+class TestChartParser(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(CHART_FIXTURE, encoding='utf-8') as file:
+            cls.html = file.read()
+
+    def test_streaming_matches_soup(self):
+        try:
+            soup_entries = parse_chart_soup(self.html)
+        except ImportError as e:
+            self.skipTest(f'bs4 missing: {e}')
+        streaming_entries = parse_chart_streaming(self.html)
+
+        self.assertEqual(len(streaming_entries), 250)
+        self.assertEqual(normalize_title_columns(streaming_entries), normalize_title_columns(soup_entries))
+        self.assertEqual(extract_rows(streaming_entries), extract_rows(soup_entries))
+
+    def test_malformed_links_are_row_errors(self):
+        for parse in (parse_chart_streaming, parse_chart_soup):
+            with self.subTest(engine=parse.__name__):
+                try:
+                    entries = parse(MALFORMED_LINKS_CHART)
+                except ImportError as e:
+                    self.skipTest(f'bs4 missing: {e}')
+                rows, errors = extract_rows(entries)
+
+                self.assertEqual([row.movie_id for row in rows], [111161])
+                self.assertEqual([(error.place, error.field) for error in errors], [(2, 'link'), (3, 'link')])
+                self.assertIn('/list/ls000000/', str(errors[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import unittest
+
+from updater.chart_parser import get_chart_parser, parse_search_streaming
+from updater.charts import CHARTS, get_chart
+from updater.row_extractor import extract_rows
+
+SEARCH_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'imdb_search_page.html')
+
+
+class TestCharts(unittest.TestCase):
+
+    def test_single_page_chart(self):
+        self.assertEqual(CHARTS['top250'].page_urls(), ['https://www.imdb.com/chart/top'])
+
+    def test_paginated_chart(self):
+        urls = get_chart('top1000').page_urls()
+
+        self.assertEqual(len(urls), 4)
+        self.assertTrue(urls[1].startswith('https://www.imdb.com/search/title/?count=250&groups=top_1000'))
+        self.assertTrue(urls[1].endswith('&start=251'))
+
+    def test_genre_chart(self):
+        chart = get_chart('genre:horror')
+
+        self.assertEqual(chart.layout, 'search')
+        self.assertIn('genres=horror', chart.url)
+        self.assertIs(get_chart_parser('soup', chart.layout), parse_search_streaming)
+
+    def test_unknown_chart(self):
+        with self.assertRaises(ValueError):
+            get_chart('bottom100')
+
+
+class TestSearchParser(unittest.TestCase):
+
+    def test_search_page(self):
+        with open(SEARCH_FIXTURE, encoding='utf-8') as file:
+            rows, errors = extract_rows(parse_search_streaming(file.read()))
+
+        self.assertEqual([(row.place, row.title, row.year, row.rating, row.reviewers, row.movie_id) for row in rows],
+                         [(1, 'The Shawshank Redemption', 1994, 9.3, '2,165,496', 111161),
+                          (1001, 'Breaking Bad', 2008, 9.5, '1,523,844', 903747)])
+        self.assertEqual(rows[0].link, 'https://www.imdb.com/title/tt0111161/')
+
+        # not released yet, no rating
+        self.assertEqual([(error.place, error.field) for error in errors], [(3, 'rating')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import cli
+from updater.row_extractor import MovieRow
+from tests.local_imdb_server import LocalIMDBServer
+from tests.data.movies import MOVIE_ROWS
+
+
+class FakeGmailAgent:
+    """Inbox of reply messages, sent messages are kept in sent."""
+
+    def __init__(self, replies: dict):
+        """:param replies: dict of sender -> message body"""
+        self.messages = {
+            str(index): {'payload': {'headers': [{'name': 'From', 'value': sender},
+                                                 {'name': 'Subject', 'value': 'Re: IMDB TOP 250 Updater'}]},
+                         'body': body}
+            for index, (sender, body) in enumerate(replies.items())
+        }
+        self.sent = []
+
+    def get_history_id(self):
+        return '1'
+
+    def list_messages(self, query):
+        return [{'id': msg_id} for msg_id in self.messages]
+
+    def get_messages(self, ids):
+        return {msg_id: self.messages[msg_id] for msg_id in ids}
+
+    @staticmethod
+    def message_header(message, name):
+        return next(header['value'] for header in message['payload']['headers'] if header['name'] == name)
+
+    @staticmethod
+    def message_body(message):
+        return message['body']
+
+    def delete_messages(self, ids):
+        for msg_id in ids:
+            del self.messages[msg_id]
+
+    @staticmethod
+    def create_message(sender, to, subject, message_text):
+        return {'to': to, 'text': message_text}
+
+    def send_message(self, message):
+        self.sent.append(message)
+
+
+class TestCLI(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        try:
+            from updater.imdb_updater import IMDBTOP250Updater
+        except ImportError as e:
+            raise unittest.SkipTest(f'updater.imdb_updater dependencies missing: {e}')
+
+        # updater writes logs and http cache relative to working directory
+        cls.cwd = os.getcwd()
+        cls.work_dir = tempfile.TemporaryDirectory()
+        os.chdir(cls.work_dir.name)
+        for directory in ('database', 'logs'):
+            os.mkdir(directory)
+        logging.disable(logging.INFO)
+
+        cls.updater_class = IMDBTOP250Updater
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        logging.disable(logging.NOTSET)
+        os.chdir(cls.cwd)
+        cls.work_dir.cleanup()
+
+    def setUp(self) -> None:
+        self.updater = self.updater_class(db_name=':memory:', backend='sqlite')
+        self.updater.top250_db.create_table(table_name='top250')
+        self.updater.top250_db.insert_movies(MOVIE_ROWS, table_name='top250')
+
+    def tearDown(self) -> None:
+        self.updater.root_db.close_connection()
+
+    def run_command(self, *argv) -> tuple:
+        out, err = io.StringIO(), io.StringIO()
+        exit_code = cli.run(self.updater, cli.build_parser().parse_args(argv), out=out, err=err)
+        return exit_code, out.getvalue(), err.getvalue()
+
+    def test_init(self):
+        updater = self.updater_class(db_name=':memory:', backend='sqlite')
+        self.addCleanup(updater.root_db.close_connection)
+        with LocalIMDBServer() as server:
+            updater.chart = updater.chart._replace(url=server.url + '/chart/top')
+            exit_code = cli.run(updater, cli.build_parser().parse_args(['init']), out=io.StringIO())
+
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(updater.top250_db.select_all())
+        self.assertEqual(updater.unseen_movies(), updater.top250_db.select_all())
+
+    def test_init_check_seen(self):
+        updater = self.updater_class(db_name=':memory:', backend='sqlite')
+        self.addCleanup(updater.root_db.close_connection)
+        answers = {'Did you seen The Shawshank Redemption? [y/n]': 'y'}
+        with LocalIMDBServer() as server, mock.patch('builtins.input', lambda prompt: answers.get(prompt, 'n')):
+            updater.chart = updater.chart._replace(url=server.url + '/chart/top')
+            out = io.StringIO()
+            exit_code = cli.run(updater, cli.build_parser().parse_args(['init', '--check-seen']), out=out)
+
+        rows = updater.top250_db.select_all()
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(out.getvalue(), f'{len(rows)} movies in list\n')
+        self.assertTrue(rows)
+        self.assertEqual([row[1] for row in rows if row[5]], ['The Shawshank Redemption'])
+        self.assertEqual(len(updater.unseen_movies()), len(rows) - 1)
+
+    def test_logs_moved_to_stderr(self):
+        moved = cli.log_to_stderr()
+        for handler in moved:
+            self.addCleanup(handler.setStream, sys.stdout)
+
+        self.assertTrue(moved)
+        for name in ('IMDB.Logger', 'IMDB.DB.Logger', 'SQLite.DB.Logger'):
+            streams = [handler.stream for handler in logging.getLogger(name).handlers
+                       if type(handler) is logging.StreamHandler]
+            self.assertEqual(streams, [sys.stderr], msg=name)
+
+    def test_list_unseen_json(self):
+        exit_code, out, _ = self.run_command('list', '--unseen', '--format', 'json')
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual([movie['title'] for movie in json.loads(out)], ['The Dark Knight', 'Joker'])
+
+    def test_list_text(self):
+        _, out, _ = self.run_command('list')
+        self.assertEqual(out.splitlines()[0], '1 / The Shawshank Redemption / 1994 / 9.2 / 2,165,496')
+
+    def test_seen_and_remove(self):
+        exit_code, out, _ = self.run_command('seen', '4')
+        self.assertEqual((exit_code, out), (0, '4 / The Dark Knight checked as seen\n'))
+
+        exit_code, out, _ = self.run_command('remove', '13', '99')
+        self.assertEqual((exit_code, out), (0, '13 / Joker removed\n'))
+        self.assertEqual(self.updater.unseen_movies(), [])
+
+        exit_code, _, _ = self.run_command('remove', '99')
+        self.assertEqual(exit_code, 1)
+
+    def test_seen_and_remove_user_list(self):
+        self.updater.chart_entries_db.replace_chart('top250', MOVIE_ROWS)
+        self.updater.add_user('dana', chart='top250', filter_profile='all')
+
+        self.assertEqual(self.run_command('seen', '4', '--user', 'dana')[:2],
+                         (0, '4 / The Dark Knight checked as seen\n'))
+        self.assertEqual(self.run_command('remove', '13', '--user', 'dana')[:2], (0, '13 / Joker removed\n'))
+        self.assertEqual(self.updater.user_movies('dana', unseen=True)[0][1], 'The Shawshank Redemption')
+        # top250 list not changed
+        self.assertEqual(len(self.updater.unseen_movies()), 2)
+
+    def test_chart_revalidated_on_every_fetch(self):
+        with LocalIMDBServer() as server:
+            self.updater.chart = self.updater.chart._replace(url=server.url + '/chart/top')
+            first = self.updater.get_chart_entries()
+            second = self.updater.get_chart_entries()
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(server.requests), 2)
+        self.assertIn('If-None-Match', server.requests[1][1])
+
+    def test_update_user_charts(self):
+        for user_id, chart in (('dana', 'top250'), ('noa', 'toptv'), ('tal', 'toptv'), ('omer', 'moviemeter')):
+            self.updater.user_lists_db.add_user(user_id, None, chart)
+        self.updater.new_movies_by_user = {'dana': [MOVIE_ROWS[1]]}
+
+        def update_chart(chart_id):
+            self.updater.new_movies_by_user = {'noa': [MOVIE_ROWS[2]]} if chart_id == 'toptv' else {}
+            return 1
+
+        with mock.patch.object(self.updater, 'update_chart', side_effect=update_chart) as updated:
+            self.assertEqual(self.updater.update_user_charts(), ['moviemeter', 'toptv'])
+
+        self.assertEqual([call.args for call in updated.call_args_list], [('moviemeter',), ('toptv',)])
+        self.assertEqual(self.updater.new_movies_by_user, {'dana': [MOVIE_ROWS[1]], 'noa': [MOVIE_ROWS[2]]})
+
+    def test_process_replies_of_user(self):
+        self.updater.chart_entries_db.replace_chart('top250', MOVIE_ROWS)
+        self.updater.add_user('dana', 'dana@example.com', chart='top250', filter_profile='all')
+        self.updater.gmail_agent = FakeGmailAgent({'Dana <Dana@example.com>': 'delete: 13',
+                                                   'owner@example.com': 'seen: 4'})
+        gmail_vars = types.SimpleNamespace(sender='updater@example.com', to='owner@example.com')
+        with mock.patch.dict(sys.modules, {'email_tools.gmail_vars': gmail_vars}):
+            self.assertEqual(self.run_command('process-replies')[0], 0)
+
+        self.assertEqual([row[1] for row in self.updater.user_movies('dana')],
+                         ['The Shawshank Redemption', 'The Dark Knight'])
+        self.assertEqual([row[1] for row in self.updater.unseen_movies()], ['Joker'])
+        self.assertEqual(sorted(message['to'] for message in self.updater.gmail_agent.sent),
+                         ['dana@example.com', 'owner@example.com'])
+        self.assertEqual(self.updater.gmail_agent.messages, {})
+
+    def test_diff_dry_run_and_profile(self):
+        with LocalIMDBServer() as server:
+            self.updater.chart = self.updater.chart._replace(url=server.url + '/chart/top')
+            exit_code, out, err = self.run_command('--profile', 'diff', '--dry-run')
+
+        self.assertEqual(exit_code, 0)
+        self.assertIn('~ 13 -> ', out)
+        self.assertRegex(out.splitlines()[-1], r'^\d+ added, 0 dropped, \d+ moved, \d+ re-rated$')
+        self.assertEqual([line.split()[0] for line in err.splitlines()], ['fetch_chart', 'diff'])
+        # nothing written
+        self.assertEqual(self.updater.top250_db.select_by_movie_id(movie_id=7286456)[0], 13)
+
+    def test_report_text(self):
+        exit_code, out, _ = self.run_command('report', '--format', 'text')
+
+        self.assertEqual(exit_code, 0)
+        self.assertIn('Unseen Movies List (2)', out)
+
+    def test_report_in_new_process(self):
+        updater = self.updater_class(db_name='report', backend='sqlite')
+        self.addCleanup(updater.root_db.drop_database)
+        updater.top250_db.create_table(table_name='top250')
+        updater.top250_db.insert_movies(MOVIE_ROWS[:2], table_name='top250')
+        updater.chart_entries_db.replace_chart('top250', MOVIE_ROWS[:2])
+        updater.add_user('dana', 'dana@example.com', chart='top250', filter_profile='all')
+
+        with LocalIMDBServer() as server:
+            # Joker enters the chart
+            updater.update_top250(rows=[MovieRow(*row[:6], server.url + f'/title/tt{row[7]:07d}/', row[7])
+                                        for row in MOVIE_ROWS])
+            updater.root_db.close_connection()
+
+            self.addCleanup(self.updater.root_db.close_connection)
+            self.updater = self.updater_class(db_name='report', backend='sqlite')
+            _, out, _ = self.run_command('report', '--format', 'text')
+            _, user_out, _ = self.run_command('report', '--format', 'text', '--user', 'dana')
+
+        for report in (out, user_out):
+            self.assertIn('1 Movies Added\n\n13 / Joker / 2019', report)
+
+        config = types.SimpleNamespace(receiver_email='owner@example.com', sender_mail='updater@example.com',
+                                       sender_password='')
+        with mock.patch.dict(sys.modules, {'data.config': config}), \
+                mock.patch.object(self.updater, 'send_email') as send_email:
+            self.assertEqual(self.run_command('report', '--send', '--user', 'dana')[0], 0)
+        self.assertEqual(send_email.call_args.kwargs['receiver_email'], 'dana@example.com')
+
+    def test_user_list_filtered_with_its_profile(self):
+        self.updater.chart_entries_db.replace_chart('top250', MOVIE_ROWS)
+        self.updater.save_filter_profile(self.updater.load_filter_profile('all')._replace(name='nineties',
+                                                                                          max_year=1999),
+                                         use=False)
+        self.assertEqual(self.updater.add_user('dana', chart='top250', filter_profile='nineties'), 1)
+        with self.assertRaises(ValueError):
+            self.updater.add_user('noa', chart='top250', filter_profile='missing')
+
+        exit_code, out, _ = self.run_command('report', '--format', 'text', '--user', 'dana')
+        self.assertEqual(exit_code, 0)
+        self.assertIn('Unseen Movies List (1)', out)
+
+
+if __name__ == '__main__':
+    unittest.main()
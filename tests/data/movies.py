@@ -0,0 +1,11 @@
+"""
+Stored top250 rows shared by the database, diff and command line tests.
+"""
+
+LINK = 'https://www.imdb.com/title/tt0000000/'
+
+MOVIE_ROWS = [
+    (1, 'The Shawshank Redemption', 1994, 9.2, '2,165,496', True, LINK, 111161),
+    (4, 'The Dark Knight', 2008, 9.0, '2,140,454', None, LINK, 468569),
+    (13, 'Joker', 2019, 8.7, '358,514', False, LINK, 7286456),
+]
@@ -0,0 +1,65 @@
+import tempfile
+import time
+import unittest
+
+from updater.fetcher import PageFetcher
+from updater.http_cache import HTTPCache
+from tests.local_imdb_server import LocalIMDBServer
+
+
+class TestPageFetcher(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.fetcher = PageFetcher(timeout=5, max_workers=8, backoff_factor=0, min_interval=0)
+
+    def tearDown(self) -> None:
+        self.fetcher.close()
+
+    def test_fetch(self):
+        with LocalIMDBServer() as server:
+            response = self.fetcher.fetch(server.url + '/chart/top')
+            self.assertIn('lister-list', response.text,
+                          msg='Failed to fetch chart page from local server')
+
+    def test_fetch_many_is_concurrent(self):
+        urls_count = 8
+        with LocalIMDBServer(delay=0.3) as server:
+            urls = [f'{server.url}/title/tt{n:07d}/' for n in range(urls_count)]
+            start = time.monotonic()
+            responses = self.fetcher.fetch_many(urls)
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(len(responses), urls_count)
+        self.assertLess(elapsed, 0.3 * urls_count / 2,
+                        msg='Failed to fetch pages concurrently')
+
+    def test_iter_fetch_many_yields_pages_as_they_arrive(self):
+        with LocalIMDBServer() as server:
+            urls = [server.url + '/chart/top', server.url + '/search/title/?start=1', server.url + '/title/tt0111161/']
+            pages = dict(self.fetcher.iter_fetch_many(urls))
+
+        self.assertEqual(sorted(pages), [0, 1, 2])
+        self.assertIn('lister-item-header', pages[1].text)
+
+    def test_retry_on_server_error(self):
+        with LocalIMDBServer(failures=2) as server:
+            response = self.fetcher.fetch(server.url + '/chart/top')
+            self.assertEqual(response.status_code, 200,
+                             msg='Failed to retry after server errors')
+            self.assertEqual(len(server.requests), 3)
+
+    def test_cached_page_is_revalidated(self):
+        with tempfile.TemporaryDirectory() as path, LocalIMDBServer() as server:
+            self.fetcher.cache = HTTPCache(path=path, ttl=60)
+            url = server.url + '/title/tt7286456/'
+
+            first = self.fetcher.fetch(url)
+            self.fetcher.fetch(url)
+            self.assertEqual(len(server.requests), 1,
+                             msg='Failed to serve fresh page from cache')
+
+            revalidated = self.fetcher.fetch(url, ttl=0)
+            self.assertEqual(server.requests[-1][1].get('If-None-Match'), first.headers['ETag'])
+            self.assertTrue(revalidated.from_cache,
+                            msg='Failed to serve not modified page from cache')
+            self.assertEqual(revalidated.text, first.text)
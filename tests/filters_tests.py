@@ -0,0 +1,46 @@
+import unittest
+
+from updater.filters import DEFAULT_PROFILE, FilterProfile, filter_mask, filter_rows
+from updater.row_extractor import MovieRow
+
+LINK = 'https://www.imdb.com/title/tt0000000/'
+
+
+class TestFilters(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.rows = [
+            MovieRow(1, 'The Shawshank Redemption', 1994, 9.2, '2,165,496', None, LINK, 111161),
+            MovieRow(2, 'The Godfather', 1972, 9.1, '1,490,385', None, LINK, 68646),
+            MovieRow(13, 'Joker', 2019, 8.7, '358,514', None, LINK, 7286456),
+            MovieRow(64, 'Gisaengchung', 2019, 8.4, '46,335', None, LINK, 6751668),
+        ]
+
+    def test_default_profile_keeps_1990_and_later(self):
+        self.assertEqual([row.place for row in filter_rows(self.rows, DEFAULT_PROFILE)], [1, 13, 64])
+
+    def test_combined_filters(self):
+        profile = FilterProfile(name='test', min_year=None, min_rating=8.5, min_reviewers=400000,
+                                exclude_ids=frozenset({111161}))
+        self.assertEqual([row.title for row in filter_rows(self.rows, profile)], ['The Godfather'])
+
+    def test_year_only_matches_mask(self):
+        for profile in (DEFAULT_PROFILE, FilterProfile(name='nineties', max_year=1999),
+                        FilterProfile(name='all', min_year=None)):
+            with self.subTest(profile=profile.name):
+                try:
+                    kept = [row for row, keep in zip(self.rows, filter_mask(self.rows, profile)) if keep]
+                except ImportError as e:
+                    self.skipTest(f'numpy missing: {e}')
+                self.assertEqual(filter_rows(self.rows, profile), kept)
+
+    def test_empty_chart(self):
+        self.assertEqual(filter_rows([], DEFAULT_PROFILE), [])
+
+    def test_json_round_trip(self):
+        profile = FilterProfile(name='classics', min_year=None, max_year=1980, exclude_ids=frozenset({68646}))
+        self.assertEqual(FilterProfile.from_json(profile.to_json()), profile)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import base64
+import unittest
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from email_tools.google_agents import GmailAgent
+
+
+def make_message(msg_id: str, subject: str, text: str) -> dict:
+    return {
+        'id': msg_id,
+        'payload': {
+            'headers': [{'name': 'Subject', 'value': subject}],
+            'parts': [{'body': {'data': base64.urlsafe_b64encode(text.encode()).decode()}}],
+        },
+    }
+
+
+class FakeRequest:
+
+    def __init__(self, service, result=None, error=None):
+        self.service = service
+        self.result = result
+        self.error = error
+
+    def execute(self):
+        self.service.http_calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class FakeBatch:
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.http_calls += 1
+        for request_id, request in self.requests:
+            if request.error:
+                self.callback(request_id, None, request.error)
+            else:
+                self.callback(request_id, request.result, None)
+
+
+class FakeGmailService:
+    """In memory stand-in of googleapiclient gmail service, counts http calls."""
+
+    def __init__(self, inbox: dict, page_size: int = 2, history_id: str = '100', history: list = ()):
+        self.inbox = inbox
+        self.page_size = page_size
+        self.history_id = history_id
+        self.history_records = list(history)
+        self.http_calls = 0
+
+    # resources
+    def users(self):
+        return self
+
+    def history(self):
+        return self
+
+    # users().messages() and users().history() share list(), told apart by startHistoryId
+    def messages(self):
+        return self
+
+    def getProfile(self, userId):
+        return FakeRequest(self, {'historyId': self.history_id})
+
+    def list(self, userId, q=None, pageToken=None, startHistoryId=None, labelId=None, historyTypes=None):
+        if startHistoryId is not None:
+            if int(startHistoryId) < 50:
+                return FakeRequest(self, error=HttpError(httplib2.Response({'status': 404}), b'expired'))
+            return FakeRequest(self, {'history': self.history_records, 'historyId': self.history_id})
+
+        ids = sorted(self.inbox)
+        start = int(pageToken or 0)
+        response = {'messages': [{'id': msg_id} for msg_id in ids[start:start + self.page_size]]}
+        if start + self.page_size < len(ids):
+            response['nextPageToken'] = str(start + self.page_size)
+        return FakeRequest(self, response)
+
+    def get(self, userId, id, format=None):
+        if id not in self.inbox:
+            return FakeRequest(self, error=HttpError(httplib2.Response({'status': 404}), b'not found'))
+        return FakeRequest(self, self.inbox[id])
+
+    def batchDelete(self, userId, body):
+        for msg_id in body['ids']:
+            self.inbox.pop(msg_id, None)
+        return FakeRequest(self, '')
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+class TestGmailAgent(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.service = FakeGmailService({
+            f'{n:03d}': make_message(f'{n:03d}', 'Re: IMDB TOP 250 Updater', f'seen: {n}') for n in range(120)
+        })
+        self.agent = GmailAgent(service=self.service)
+
+    def test_list_messages_pages(self):
+        self.service.page_size = 50
+        messages = self.agent.list_messages(query='in:inbox')
+        self.assertEqual(len(messages), 120)
+        self.assertEqual(self.service.http_calls, 3)
+
+    def test_get_messages_batched(self):
+        messages = self.agent.get_messages([f'{n:03d}' for n in range(120)] + ['missing'])
+
+        self.assertEqual(len(messages), 120)
+        self.assertEqual(self.service.http_calls, 3)  # 121 gets in batches of 50
+        self.assertEqual(self.agent.message_body(messages['007']), 'seen: 7')
+        self.assertEqual(self.agent.message_header(messages['007'], 'subject'), 'Re: IMDB TOP 250 Updater')
+
+    def test_delete_messages(self):
+        self.agent.delete_messages(['001', '002', '002'])
+        self.assertNotIn('001', self.service.inbox)
+        self.assertNotIn('002', self.service.inbox)
+        self.assertEqual(self.service.http_calls, 1)
+
+    def test_history_sync(self):
+        self.service.history_records = [
+            {'messagesAdded': [{'message': {'id': '005'}}, {'message': {'id': '006'}}]},
+            {'messagesAdded': [{'message': {'id': '006'}}]},
+        ]
+        self.assertEqual(self.agent.get_history_id(), '100')
+        self.assertEqual(self.agent.list_history_messages(start_history_id='90'), [{'id': '005'}, {'id': '006'}])
+        self.assertIsNone(self.agent.list_history_messages(start_history_id='10'))
+
+
+if __name__ == '__main__':
+    unittest.main()
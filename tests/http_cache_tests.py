@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from updater.http_cache import HTTPCache
+
+
+class FakeResponse:
+
+    def __init__(self, content: bytes, headers: dict):
+        self.status_code = 200
+        self.content = content
+        self.headers = headers
+
+
+class TestHTTPCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = HTTPCache(path=self.temp_dir.name, ttl=60)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_store_and_get(self):
+        body = '<html>Joker</html>'.encode('utf-8') * 100
+        self.cache.store('https://www.imdb.com/title/tt7286456/',
+                         FakeResponse(body, {'ETag': '"abc"', 'Content-Type': 'text/html; charset=utf-8'}))
+
+        entry = self.cache.get('https://www.imdb.com/title/tt7286456/')
+        self.assertEqual(entry.body, body)
+        self.assertTrue(self.cache.is_fresh(entry))
+        self.assertFalse(self.cache.is_fresh(entry, ttl=0))
+        self.assertEqual(self.cache.conditional_headers(entry), {'If-None-Match': '"abc"'})
+        self.assertEqual(entry.response().text, body.decode('utf-8'))
+
+        stored_size = sum(os.path.getsize(os.path.join(self.temp_dir.name, name))
+                          for name in os.listdir(self.temp_dir.name))
+        self.assertLess(stored_size, len(body), msg='Failed to compress cached body')
+
+    def test_missing_entry(self):
+        self.assertIsNone(self.cache.get('https://www.imdb.com/chart/top'))
+
+    def test_lru_eviction(self):
+        for n in range(3):
+            self.cache.store(f'https://www.imdb.com/title/tt{n}/', FakeResponse(os.urandom(600), {}))
+            os.utime(self.cache._file_path(f'https://www.imdb.com/title/tt{n}/'), (n, n))
+
+        # room for exactly three entries
+        self.cache.max_bytes = sum(os.path.getsize(os.path.join(self.temp_dir.name, name))
+                                   for name in os.listdir(self.temp_dir.name)) + 100
+
+        self.cache.get('https://www.imdb.com/title/tt0/')  # mark as recently used
+        self.cache.store('https://www.imdb.com/title/tt3/', FakeResponse(os.urandom(600), {}))
+
+        self.assertIsNotNone(self.cache.get('https://www.imdb.com/title/tt0/'))
+        self.assertIsNone(self.cache.get('https://www.imdb.com/title/tt1/'))
+        self.assertIsNotNone(self.cache.get('https://www.imdb.com/title/tt3/'))
@@ -13,11 +13,10 @@ class TestIMDBTop250Updater(unittest.TestCase):
             if not os.path.isdir(path):
                 os.mkdir(path)
 
-        self.updater = IMDBTOP250Updater(db_name='imdb_unittest')
+        self.updater = IMDBTOP250Updater(db_name='imdb_unittest', backend='sqlite')
 
     def tearDown(self) -> None:
         self.updater.root_db.drop_database()
-        self.updater.root_db.close_cursor()
         self.updater.root_db.close_connection()
 
         self.updater = None
@@ -26,6 +25,15 @@ class TestIMDBTop250Updater(unittest.TestCase):
         self.assertTrue(self.updater.create_list(check_seen=False),
                         msg='Failed to create new top 250 movies list')
 
+    def test_insert_movies(self):
+        rows = [(place, f'Movie {place}', 2000, 8.0, '1,000', None, 'https://www.imdb.com/title/tt0000000/', 1000 + place)
+                for place in range(1, 251)]
+        self.updater.top250_db.create_table(table_name='top250')
+
+        self.assertEqual(self.updater.top250_db.insert_movies(rows, table_name='top250'), 250)
+        self.assertEqual(self.updater.top250_db.insert_movies([], table_name='top250'), 0)
+        self.assertEqual(sorted(tuple(row) for row in self.updater.top250_db.select_all()), rows)
+
     def test_print_movies(self):
         self.updater.create_list(check_seen=False)
         self.assertTrue(self.updater.print_movies(),
@@ -0,0 +1,93 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'imdb_top250_updater')
+
+# cold start budget of `import updater.imdb_updater`, the scheduled job runs every few minutes
+IMPORT_TIME_BUDGET = 0.5  # seconds
+# loaded only by the code paths needing them, see updater.imdb_updater
+LAZY_MODULES = ('pandas', 'tabulate', 'bs4', 'yagmail', 'numpy', 'googleapiclient', 'google_auth_oauthlib', 'keyring',
+                'mysql')
+# 'import time:       333 |     134645 |   updater.fetcher'
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+# update_top250 with the chart of the last run, printing the lazy modules it loaded
+REFRESH_SCRIPT = textwrap.dedent('''
+    import sys
+    from tests.data.movies import MOVIE_ROWS
+    from updater.filters import FilterProfile
+    from updater.imdb_updater import IMDBTOP250Updater
+    from updater.row_extractor import MovieRow
+
+    updater = IMDBTOP250Updater(db_name='refresh', backend='sqlite', filter_profile=sys.argv[1])
+    if sys.argv[1] == 'default':
+        # first run, profile of next runs filters by rating, with numpy
+        updater.top250_db.create_table(table_name='top250')
+        updater.save_filter_profile(FilterProfile(name='rated', min_rating=8.0), use=False)
+    updater.update_top250(rows=[MovieRow(*row) for row in MOVIE_ROWS])
+    print(updater.changes is None, *sorted({{name.split('.')[0] for name in sys.modules}} & set({lazy_modules})))
+''')
+
+
+def subprocess_env() -> dict:
+    """Package and tests importable from any working directory."""
+    return {**os.environ, 'PYTHONPATH': os.pathsep.join([PACKAGE_DIR, os.path.dirname(PACKAGE_DIR), *sys.path])}
+
+
+def import_times(module: str) -> dict:
+    """:return: dict of imported module -> cumulative import seconds, from python -X importtime."""
+    # updater logs to logs/ of working directory, kept out of the package
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.mkdir(os.path.join(work_dir, 'logs'))
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=work_dir, env=subprocess_env(), stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2)) / 1e6
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        try:
+            cls.times = import_times('updater.imdb_updater')
+        except ImportError as e:
+            raise unittest.SkipTest(f'updater.imdb_updater dependencies missing: {e}')
+
+    def test_heavy_modules_not_imported(self):
+        imported = {name.split('.')[0] for name in self.times}
+        self.assertEqual(imported.intersection(LAZY_MODULES), set())
+
+    def test_import_time_budget(self):
+        self.assertLess(self.times['updater.imdb_updater'], IMPORT_TIME_BUDGET)
+
+    def test_unchanged_chart_refresh_loads_no_heavy_modules(self):
+        script = REFRESH_SCRIPT.format(lazy_modules=LAZY_MODULES)
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.mkdir(os.path.join(work_dir, 'logs'))
+            outputs = []
+            for profile in ('default', 'rated', 'rated'):
+                result = subprocess.run([sys.executable, '-c', script, profile], cwd=work_dir, env=subprocess_env(),
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+                self.assertEqual(result.returncode, 0, msg=result.stderr)
+                outputs.append(result.stdout.splitlines()[-1].split())
+
+        # first run with the rated profile filters with numpy, the run after it finds the same chart
+        self.assertEqual(outputs[0], ['False'])
+        self.assertEqual(outputs[1], ['False', 'numpy'])
+        self.assertEqual(outputs[2], ['True'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Local stand-in for the IMDB website, serves the saved html fixtures from tests/data.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+PAGES = {
+    '/chart/top': 'imdb_chart_top.html',
+    '/title/': 'imdb_title_page.html',
+    '/search/title': 'imdb_search_page.html',
+}
+
+
+class LocalIMDBServer:
+    """
+    with LocalIMDBServer(delay=0.2) as server:
+        fetcher.fetch(server.url + '/chart/top')
+    """
+
+    def __init__(self, delay: float = 0, failures: int = 0):
+        """
+        :param delay: seconds to wait before answering each request.
+        :param failures: number of first requests answered with 503.
+        """
+        self.delay = delay
+        self.failures = failures
+        self.requests: list = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            if self.failures > 0:
+                self.failures -= 1
+                return True
+            return False
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                if server.delay:
+                    time.sleep(server.delay)
+
+                if server._should_fail():
+                    self.send_error(503)
+                    return
+
+                page = next((name for prefix, name in PAGES.items() if self.path.startswith(prefix)), None)
+                if page is None:
+                    self.send_error(404)
+                    return
+
+                with open(os.path.join(DATA_PATH, page), 'rb') as file:
+                    body = file.read()
+
+                etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
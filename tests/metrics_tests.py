@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+
+from logs.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.metrics = Metrics()
+
+    def test_timer_and_counter(self):
+        @self.metrics.timed('db_query_seconds', table='top250')
+        def select_all():
+            return []
+
+        for _ in range(3):
+            select_all()
+        with self.metrics.timer('imdb_fetch_seconds', page='chart'):
+            pass
+        self.metrics.increment('movies_added_total', 2)
+        self.metrics.increment('movies_added_total')
+
+        records = {record['metric']: record for record in self.metrics.records()}
+        self.assertEqual(records['db_query_seconds']['count'], 3)
+        self.assertEqual(records['db_query_seconds']['labels'], {'operation': 'select_all', 'table': 'top250'})
+        self.assertEqual(records['imdb_fetch_seconds']['count'], 1)
+        self.assertEqual(records['movies_added_total']['value'], 3)
+
+    def test_exports(self):
+        self.metrics.increment('http_requests_total', result='cache_hit')
+        self.metrics.observe('pipeline_stage_seconds', 0.5, stage='fetch_chart')
+
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, 'metrics.jsonl')
+            prometheus_path = os.path.join(directory, 'metrics.prom')
+            self.metrics.export(json_path, prometheus_path)
+            self.metrics.export(json_path, prometheus_path)
+
+            with open(json_path) as file:
+                lines = [json.loads(line) for line in file]
+            with open(prometheus_path) as file:
+                prometheus = file.read()
+
+        self.assertEqual(len(lines), 4)  # appended on every export
+        self.assertIn('time', lines[0])
+        self.assertIn('# TYPE imdb_updater_http_requests_total counter', prometheus)
+        self.assertIn('imdb_updater_http_requests_total{result="cache_hit"} 1', prometheus)
+        self.assertIn('imdb_updater_pipeline_stage_seconds_sum{stage="fetch_chart"} 0.5', prometheus)
+
+
+if __name__ == '__main__':
+    unittest.main()
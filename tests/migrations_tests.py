@@ -0,0 +1,172 @@
+import re
+import unittest
+from contextlib import contextmanager
+
+from database.migrations import (CHART_ENTRIES_TABLE_DDL, COLUMN_EXISTS_QUERY, INDEX_EXISTS_QUERY,
+                                 MOVIE_HISTORY_TABLE_DDL, SCHEMA_VERSION, USER_MOVIES_TABLE_DDL,
+                                 USER_REMOVED_TABLE_DDL, USERS_TABLE_DDL, SchemaMigrator)
+from database.sqlite_db import SQLITE_DIALECT
+from database.storage import Storage, create_storage
+
+ALTER_PATTERN = re.compile(r'^ALTER TABLE (\w+) ')
+CREATE_TABLE_PATTERN = re.compile(r'^CREATE TABLE (IF NOT EXISTS )?`(\w+)`')
+ADD_COLUMN_PATTERN = re.compile(r'ADD COLUMN `(\w+)`')
+ADD_KEY_PATTERN = re.compile(r'ADD (?:UNIQUE )?KEY `(\w+)`')
+
+
+class FakeMySQLSchema(Storage):
+    """
+    Schema of a MySQL database as seen by SchemaMigrator, upgrade statements are recorded and applied to it.
+    Like MySQL, DDL statements are kept when the session rolls back.
+    """
+    dialect = SQLITE_DIALECT._replace(name='mysql', table_exists="SHOW TABLES LIKE %s",
+                                      column_exists=COLUMN_EXISTS_QUERY,
+                                      chart_entries_table_ddl=(CHART_ENTRIES_TABLE_DDL,),
+                                      movie_history_table_ddl=(MOVIE_HISTORY_TABLE_DDL,),
+                                      user_lists_table_ddl=(USERS_TABLE_DDL, USER_MOVIES_TABLE_DDL,
+                                                            USER_REMOVED_TABLE_DDL))
+
+    def __init__(self, columns: dict, indexes: dict, versions=(), fail_on: str = None):
+        """
+        :param columns: dict of table name -> set of column names.
+        :param indexes: dict of table name -> set of index names.
+        :param fail_on: statement part raising an error the first time it is executed.
+        """
+        self.columns = columns
+        self.indexes = indexes
+        self.versions = set(versions)
+        self.fail_on = fail_on
+        self.statements = []
+        self._result = None
+
+    @contextmanager
+    def session(self):
+        yield self
+
+    def fetchone(self):
+        return self._result
+
+    def execute(self, query: str, params=()):
+        self._result = None
+        if query == self.dialect.table_exists:
+            self._result = (params[0],) if params[0] in self.columns else None
+        elif query == COLUMN_EXISTS_QUERY:
+            self._result = (1,) if params[1] in self.columns.get(params[0], ()) else None
+        elif query == INDEX_EXISTS_QUERY:
+            self._result = (1,) if params[1] in self.indexes.get(params[0], ()) else None
+        elif query.startswith('SELECT MAX(version)'):
+            self._result = (max(self.versions),)
+        elif query.startswith('INSERT INTO schema_version'):
+            self.versions.add(params[0])
+        else:
+            self.apply(query)
+
+    def apply(self, statement: str):
+        if self.fail_on and self.fail_on in statement:
+            self.fail_on = None
+            raise RuntimeError(f'Duplicate entry for key, statement: {statement}')
+        self.statements.append(statement)
+
+        if statement.startswith('CREATE TABLE'):
+            if_not_exists, table_name = CREATE_TABLE_PATTERN.match(statement).groups()
+            if not (if_not_exists and table_name in self.columns):
+                self.columns[table_name], self.indexes[table_name] = set(), set()
+        elif statement.startswith('DROP TABLE'):
+            table_name = statement.split()[-1]
+            self.columns.pop(table_name, None)
+            self.indexes.pop(table_name, None)
+        elif statement.startswith('RENAME TABLE'):
+            _, _, old_name, _, new_name = statement.split()
+            self.columns[new_name], self.indexes[new_name] = self.columns.pop(old_name), self.indexes.pop(old_name)
+        elif statement.startswith('ALTER TABLE'):
+            table_name = ALTER_PATTERN.match(statement).group(1)
+            self.columns[table_name].update(ADD_COLUMN_PATTERN.findall(statement))
+            self.indexes[table_name].update(ADD_KEY_PATTERN.findall(statement))
+            if 'ADD PRIMARY KEY' in statement:
+                self.indexes[table_name].add('PRIMARY')
+            if 'DROP PRIMARY KEY' in statement:
+                self.indexes[table_name].discard('PRIMARY')
+
+
+def legacy_schema(**kwargs) -> FakeMySQLSchema:
+    """Schema version 1, tables without keys."""
+    return FakeMySQLSchema(
+        columns={'schema_version': {'version'},
+                 'top250': {'place', 'title', 'year', 'rating', 'reviewers', 'seen_status', 'link'},
+                 'removed_movies': {'title'}},
+        indexes={'schema_version': {'PRIMARY'}, 'top250': set(), 'removed_movies': set()},
+        versions=[1], **kwargs
+    )
+
+
+class TestSchemaMigrator(unittest.TestCase):
+
+    def test_upgrade_legacy_schema(self):
+        schema = legacy_schema()
+
+        self.assertEqual(SchemaMigrator(schema).migrate(), SCHEMA_VERSION)
+        self.assertEqual(schema.indexes['top250'], {'PRIMARY', 'place', 'title', 'seen_status'})
+        self.assertEqual(schema.indexes['removed_movies'], {'movie_id', 'title'})
+        self.assertIn('movie_id', schema.columns['removed_movies'])
+        self.assertIn('filter_profile', schema.columns['users'])
+        self.assertLessEqual({'updater_state', 'chart_entries', 'users', 'user_movies', 'user_removed',
+                              'movie_history'}, schema.columns.keys())
+
+    def test_rerun_half_applied_step(self):
+        # movie_id column is added and committed, then the unique place key fails on duplicate places
+        schema = legacy_schema(fail_on='ADD UNIQUE KEY `place`')
+        with self.assertRaises(RuntimeError):
+            SchemaMigrator(schema).migrate()
+        self.assertEqual(max(schema.versions), 1)
+        self.assertIn('movie_id', schema.columns['top250'])
+
+        statements = len(schema.statements)
+        self.assertEqual(SchemaMigrator(schema).migrate(), SCHEMA_VERSION)
+
+        rerun = schema.statements[statements:]
+        self.assertFalse([statement for statement in rerun if 'ADD COLUMN `movie_id` int unsigned' in statement
+                          and 'top250' in statement])
+        self.assertFalse([statement for statement in rerun if 'ADD PRIMARY KEY' in statement])
+        # duplicate places are cleared right before the unique key is added
+        place_key = next(index for index, statement in enumerate(rerun) if 'ADD UNIQUE KEY `place`' in statement)
+        self.assertIn('SET t.place = NULL', rerun[place_key - 1])
+        self.assertEqual(schema.indexes['top250'], {'PRIMARY', 'place', 'title', 'seen_status'})
+
+    def test_rerun_after_removed_movies_dropped(self):
+        schema = legacy_schema(fail_on='RENAME TABLE removed_movies_v2')
+        with self.assertRaises(RuntimeError):
+            SchemaMigrator(schema).migrate()
+        self.assertNotIn('removed_movies', schema.columns)
+
+        self.assertEqual(SchemaMigrator(schema).migrate(), SCHEMA_VERSION)
+        self.assertNotIn('removed_movies_v2', schema.columns)
+        self.assertEqual(schema.indexes['removed_movies'], {'movie_id', 'title'})
+
+    def test_new_sqlite_database(self):
+        root_db = create_storage('sqlite', db_name=':memory:')
+
+        self.assertEqual(SchemaMigrator(root_db).migrate(), SCHEMA_VERSION)
+        for table_name in ('updater_state', 'chart_entries', 'users', 'user_movies', 'user_removed', 'movie_history'):
+            self.assertTrue(root_db.table_exists(table_name), msg=table_name)
+        # up to date, nothing to do
+        self.assertEqual(SchemaMigrator(root_db).migrate(), SCHEMA_VERSION)
+
+    def test_upgrade_sqlite_version_3(self):
+        # database of an older release, chart_entries was created outside of the migrations
+        root_db = create_storage('sqlite', db_name=':memory:')
+        with root_db.session() as my_cursor:
+            my_cursor.execute("CREATE TABLE `schema_version` (`version` int NOT NULL, PRIMARY KEY (`version`))")
+            my_cursor.execute("INSERT INTO schema_version (version) VALUES (3)")
+            for statement in root_db.dialect.chart_entries_table_ddl:
+                my_cursor.execute(statement.replace(' IF NOT EXISTS', ''))
+            my_cursor.execute("INSERT INTO chart_entries (chart_id, place, movie_id) VALUES ('top250', 1, 111161)")
+
+        self.assertEqual(SchemaMigrator(root_db).migrate(), SCHEMA_VERSION)
+        self.assertTrue(root_db.table_exists('movie_history'))
+        with root_db.session() as my_cursor:
+            my_cursor.execute("SELECT movie_id FROM chart_entries")
+            self.assertEqual(my_cursor.fetchall(), [(111161,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
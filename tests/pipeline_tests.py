@@ -0,0 +1,52 @@
+import time
+import unittest
+
+from updater.pipeline import Pipeline
+
+
+def sleep_and_return(value, seconds: float = 0.2):
+    def stage(*_):
+        time.sleep(seconds)
+        return value
+    return stage
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_independent_stages_overlap(self):
+        pipeline = Pipeline()
+        pipeline.add_stage('email_replies', sleep_and_return(True))
+        pipeline.add_stage('fetch_chart', sleep_and_return([1, 2, 3]))
+        pipeline.add_stage('update_top250', lambda replied, rows: (replied, len(rows)),
+                           depends_on=('email_replies', 'fetch_chart'))
+
+        started = time.perf_counter()
+        results = pipeline.run()
+
+        self.assertLess(time.perf_counter() - started, 0.35)
+        self.assertEqual(results['update_top250'], (True, 3))
+        self.assertGreaterEqual(pipeline.timings['update_top250'].start, 0.2)
+
+    def test_failed_stage_skips_dependents(self):
+        calls = []
+
+        def fail():
+            raise ConnectionError
+
+        pipeline = Pipeline()
+        pipeline.add_stage('fetch_chart', fail)
+        pipeline.add_stage('update_top250', lambda rows: calls.append('update'), depends_on=('fetch_chart',))
+        pipeline.add_stage('email_replies', lambda: calls.append('replies'))
+
+        with self.assertRaises(ConnectionError):
+            pipeline.run()
+        self.assertEqual(calls, ['replies'])
+        self.assertNotIn('update_top250', pipeline.timings)
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValueError):
+            Pipeline().add_stage('update_top250', print, depends_on=('fetch_chart',))
+
+
+if __name__ == '__main__':
+    unittest.main()
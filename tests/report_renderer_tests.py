@@ -0,0 +1,47 @@
+import unittest
+
+from updater.report_renderer import render_report, render_unseen_table
+
+LINK = 'https://www.imdb.com/title/tt0000000/'
+POSTER = '"https://m.media-amazon.com/images/poster.jpg"'
+
+
+class TestReportRenderer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.unseen = [
+            (4, 'The Dark Knight', 2008, 9.0, '2,140,454', None, LINK, 468569),
+            (113, 'Lock, Stock & Two Smoking Barrels', 1998, 8.2, '535,414', False, LINK, 120735),
+        ]
+
+    def test_html_table(self):
+        table = render_unseen_table(self.unseen)
+
+        self.assertIn('Unseen Movies List (2)', table)
+        self.assertEqual(table.count('<tr>'), 3)
+        self.assertIn('<td style="text-align: center;">Lock, Stock &amp; Two Smoking Barrels</td>', table)
+
+    def test_html_report(self):
+        contents = render_report([(self.unseen[0], POSTER)], self.unseen)
+
+        self.assertEqual(len(contents), 4)
+        self.assertIn('1 Movies Added', contents[0])
+        self.assertIn('<h3>4 / The Dark Knight / 2008 / 9.0 / 2,140,454</h3>', contents[1])
+        self.assertIn('<img src="https://m.media-amazon.com/images/poster.jpg"', contents[1])
+        self.assertIn('delete: ###', contents[-1])
+
+    def test_text_and_markdown(self):
+        text = ''.join(render_report([], self.unseen, fmt='text'))
+        self.assertIn('113 / Lock, Stock & Two Smoking Barrels / 1998 / 8.2 / 535,414 / ' + LINK, text)
+        self.assertNotIn('<', text)
+
+        markdown = render_unseen_table(self.unseen, fmt='markdown')
+        self.assertIn('| 4 | The Dark Knight | 2008 | 9.0 | 2,140,454 | ' + LINK + ' |', markdown)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            render_unseen_table(self.unseen, fmt='pdf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import unittest
+
+from updater.chart_parser import ChartEntry, parse_chart_streaming
+from updater.row_extractor import MovieRow, extract_row, extract_rows
+
+CHART_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'imdb_chart_top.html')
+LINK = 'https://www.imdb.com/title/tt0119488/'
+
+
+class TestRowExtractor(unittest.TestCase):
+
+    def test_chart_fixture(self):
+        with open(CHART_FIXTURE, encoding='utf-8') as file:
+            rows, errors = extract_rows(parse_chart_streaming(file.read()))
+
+        self.assertEqual(errors, [])
+        self.assertEqual([row.place for row in rows], list(range(1, 251)))
+        self.assertEqual(rows[0].title, 'The Shawshank Redemption')
+
+        self.assertIn('L.A. Confidential', {row.title for row in rows})
+
+    def test_extract_row(self):
+        entry = ChartEntry(title_column='\n      118.\n      L.A. Confidential\n(1997)\n', link=LINK,
+                           rating='8.2 based on 501,610 user ratings', movie_id=119488)
+
+        self.assertEqual(extract_row(entry, place=1),
+                         MovieRow(118, 'L.A. Confidential', 1997, 8.2, '501,610', None, LINK, 119488))
+
+    def test_malformed_rows(self):
+        entries = [
+            ChartEntry(title_column='1. No Year', link=LINK, rating='8.2 based on 501,610 user ratings',
+                       movie_id=1),
+            ChartEntry(title_column='2. Joker (2019)', link=LINK, rating='', movie_id=2),
+            ChartEntry(title_column='3. Coco (2017)', link=LINK, rating='8.4 based on 300,703 user ratings',
+                       movie_id=3),
+        ]
+        rows, errors = extract_rows(entries)
+
+        self.assertEqual([row.title for row in rows], ['Coco'])
+        self.assertEqual([(error.place, error.field) for error in errors], [(1, 'title_column'), (2, 'rating')])
+
+
+if __name__ == '__main__':
+    unittest.main()
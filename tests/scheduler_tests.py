@@ -0,0 +1,104 @@
+import logging
+import random
+import threading
+import unittest
+
+from updater.scheduler import Scheduler
+
+
+class FakeClock:
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeState:
+
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, name: str):
+        return self.values.get(name)
+
+    def set_value(self, name: str, value: str):
+        self.values[name] = value
+        return True
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self) -> None:
+        logging.disable(logging.INFO)
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock, rng=random.Random(0))
+        self.calls = []
+
+    def tearDown(self) -> None:
+        logging.disable(logging.NOTSET)
+
+    def failing(self):
+        self.calls.append(self.clock())
+        raise RuntimeError('imdb down')
+
+    def test_interval_with_jitter(self):
+        self.scheduler.add_job('refresh', lambda: self.calls.append(self.clock()), interval=100, jitter=0.1)
+
+        for _ in range(20):
+            self.clock.now += self.scheduler.run_pending()
+
+        delays = [later - earlier for earlier, later in zip(self.calls, self.calls[1:])]
+        self.assertEqual(self.calls[0], 1000.0)
+        self.assertTrue(all(90 <= delay <= 110 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_backoff_doubles_up_to_max_and_resets(self):
+        self.scheduler.add_job('replies', self.failing, interval=300, jitter=0, retry_delay=10, max_backoff=50)
+
+        for _ in range(5):
+            self.clock.now += self.scheduler.run_pending()
+
+        delays = [later - earlier for earlier, later in zip(self.calls, self.calls[1:])]
+        self.assertEqual(delays, [10, 20, 40, 50])
+        self.assertEqual(self.scheduler.jobs['replies'].failures, 5)
+
+        self.scheduler.jobs['replies'].func = lambda: None
+        self.clock.now += self.scheduler.run_pending()
+        self.assertEqual(self.scheduler.jobs['replies'].failures, 0)
+        self.assertEqual(self.scheduler.run_pending(), 300)
+
+    def test_failed_job_does_not_stop_others(self):
+        done = []
+        self.scheduler.add_job('replies', self.failing, interval=60, jitter=0)
+        self.scheduler.add_job('refresh', lambda: done.append(True), interval=60, jitter=0)
+
+        self.scheduler.run_pending()
+        self.assertEqual((len(self.calls), done), (1, [True]))
+
+    def test_last_run_kept_in_state(self):
+        state = FakeState()
+        wall_clock = FakeClock(now=50000.0)
+        scheduler = Scheduler(clock=self.clock, rng=random.Random(0), state=state, wall_clock=wall_clock)
+        scheduler.add_job('refresh', lambda: None, interval=100, jitter=0)
+        scheduler.run_pending()
+        self.assertEqual(state.values, {'scheduler.refresh.last_run': '50000.0'})
+
+        # restarted 30 seconds later, next run is 70 seconds away
+        wall_clock.now += 30
+        restarted = Scheduler(clock=self.clock, rng=random.Random(0), state=state, wall_clock=wall_clock)
+        restarted.add_job('refresh', lambda: None, interval=100, jitter=0)
+        self.assertEqual(restarted.run_pending(), 70)
+
+    def test_run_forever_stops(self):
+        stop_event = threading.Event()
+        self.scheduler.add_job('refresh', stop_event.set, interval=3600)
+        rounds = []
+
+        self.scheduler.run_forever(stop_event, after_run=lambda: rounds.append(True))
+        self.assertEqual(rounds, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
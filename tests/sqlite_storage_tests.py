@@ -0,0 +1,208 @@
+import unittest
+
+from database.storage import create_storage
+from database.tables import ChartEntriesTable, StateTable, TOP250Table, UserListsTable
+from tests.data.movies import LINK, MOVIE_ROWS
+
+
+class TestSQLiteStorage(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.root_db = create_storage('sqlite', db_name=':memory:')
+        self.top250_db = TOP250Table(self.root_db)
+        self.top250_db.create_table(table_name='top250')
+        self.top250_db.insert_movies(MOVIE_ROWS, table_name='top250')
+
+    def tearDown(self) -> None:
+        self.root_db.drop_database()
+
+    def test_schema_created(self):
+        self.assertTrue(self.root_db.health_check())
+        self.assertTrue(self.root_db.table_exists('top250'))
+        self.assertTrue(self.root_db.table_exists('removed_movies'))
+
+    def test_insert_movies_batch(self):
+        rows = [(place, f'Movie {place}', 2000 + place, 8.0, '1,000', None, LINK, 1000 + place)
+                for place in range(1, 251)]
+        self.top250_db.create_table(table_name='top250_batch')
+
+        self.assertEqual(self.top250_db.insert_movies(rows, table_name='top250_batch'), 250)
+        self.assertEqual(self.top250_db.insert_movies([], table_name='top250_batch'), 0)
+        with self.root_db.session() as my_cursor:
+            my_cursor.execute("SELECT place, title, year, rating, reviewers, seen_status, link, movie_id "
+                              "FROM top250_batch ORDER BY place")
+            self.assertEqual(my_cursor.fetchall(), rows)
+
+    def test_select_unseen_titles(self):
+        titles = [row[1] for row in self.top250_db.select_unseen_titles()]
+        self.assertEqual(sorted(titles), ['Joker', 'The Dark Knight'])
+
+    def test_update_movies_table(self):
+        chart = [
+            (1, 'The Shawshank Redemption', 1994, 9.3, '2,200,000', None, LINK, 111161),
+            (3, 'Gisaengchung', 2019, 8.6, '46,335', None, LINK, 6751668),
+            (4, 'Joker', 2019, 8.7, '358,514', None, LINK, 7286456),
+        ]
+        changes = self.top250_db.update_movies_table(chart)
+
+        self.assertEqual([row[1] for row in changes.added], ['Gisaengchung'])
+        self.assertEqual([row[1] for row in changes.dropped], ['The Dark Knight'])
+        self.assertEqual(self.top250_db.select_by_place(place=4)[1], 'Joker')
+        self.assertEqual(self.top250_db.select_by_movie_id(movie_id=111161)[3:6], (9.3, '2,200,000', 1))
+
+    def test_removed_movie_not_added_back(self):
+        self.assertEqual(self.top250_db.delete_movie(title='Joker'), 'Joker')
+        self.assertEqual(self.top250_db.removed_movies_db.select_ids(), {7286456})
+
+        changes = self.top250_db.update_movies_table(
+            [(13, 'Joker', 2019, 8.7, '358,514', None, LINK, 7286456)]
+        )
+        self.assertEqual(changes.added, [])
+        self.assertIsNone(self.top250_db.select_by_movie_id(movie_id=7286456))
+
+    def test_delete_movies(self):
+        deleted = self.top250_db.delete_movies([4, 13, 13, 99])
+
+        self.assertEqual(deleted, {4: 'The Dark Knight', 13: 'Joker'})
+        self.assertEqual([row[1] for row in self.top250_db.select_all()], ['The Shawshank Redemption'])
+        self.assertEqual(self.top250_db.removed_movies_db.select_ids(), {468569, 7286456})
+
+    def test_update_seen_statuses(self):
+        seen = self.top250_db.update_seen_statuses([4, 13, 99])
+
+        self.assertEqual(seen, {4: 'The Dark Knight', 13: 'Joker'})
+        self.assertEqual(self.top250_db.select_unseen_titles(), [])
+
+    def test_lookups_cached_until_write(self):
+        cache = self.top250_db.load_cache()
+        self.assertIs(self.top250_db.load_cache(), cache)
+        self.assertEqual(self.top250_db.select_by_title(title='Joker')[0], 13)
+        self.assertEqual(self.top250_db.select_by_cols(['place', 'title'])[0], (1, 'The Shawshank Redemption'))
+
+        self.assertEqual(self.top250_db.update_seen_status(movie_id=7286456, seen_status=True), 'Joker')
+        self.assertIsNone(self.top250_db.update_seen_status(place=99, seen_status=True))
+        self.assertIsNot(self.top250_db.load_cache(), cache)
+        self.assertEqual([row[1] for row in self.top250_db.select_unseen_titles()], ['The Dark Knight'])
+
+        self.top250_db.delete_movie(place=4)
+        self.assertIsNone(self.top250_db.select_by_movie_id(movie_id=468569))
+
+    def test_failed_session_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with self.root_db.session():
+                self.top250_db.delete_movie(place=1)
+                raise RuntimeError
+
+        self.assertIsNotNone(self.top250_db.select_by_place(place=1))
+
+    def test_cache_dropped_when_write_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with self.root_db.session():
+                self.top250_db.update_seen_status(movie_id=7286456, seen_status=True)
+                # lookup inside the transaction sees the write, rows are not kept
+                self.assertEqual(self.top250_db.select_unseen_titles()[0][1], 'The Dark Knight')
+                self.assertIsNone(self.top250_db._cache)
+                raise RuntimeError
+
+        self.assertEqual([row[1] for row in self.top250_db.select_unseen_titles()], ['The Dark Knight', 'Joker'])
+
+    def test_cache_reloaded_after_commit(self):
+        with self.root_db.session():
+            self.top250_db.delete_movie(place=4)
+            self.top250_db.load_cache()
+        self.assertIsNone(self.top250_db._cache)
+        self.assertIsNone(self.top250_db.select_by_place(place=4))
+
+    def test_chart_entries(self):
+        chart_db = ChartEntriesTable(self.root_db)
+        rows = self.top250_db.select_all()
+
+        self.assertEqual(chart_db.replace_chart('top250', rows), 3)
+        self.assertEqual(chart_db.replace_chart('toptv', rows[:1]), 1)
+        self.assertEqual(chart_db.replace_chart('top250', rows[1:]), 2)
+
+        self.assertEqual([row[1] for row in chart_db.select_chart('top250')], ['The Dark Knight', 'Joker'])
+        self.assertEqual(chart_db.select_charts_of_movie(111161), [('toptv', 1)])
+
+    def test_movie_history(self):
+        chart_db = ChartEntriesTable(self.root_db)
+        history_db = chart_db.history_db
+        rows = self.top250_db.select_all()
+        shawshank, dark_knight, joker = rows
+
+        chart_db.replace_chart('top250', rows, snapshot_at=100)
+        # same chart again, nothing stored
+        chart_db.replace_chart('top250', rows, snapshot_at=200)
+        # Joker left, The Dark Knight moved and re-rated
+        chart_db.replace_chart('top250', [shawshank, (2, *dark_knight[1:3], 9.1, *dark_knight[4:])],
+                               snapshot_at=300)
+        chart_db.replace_chart('top250', [shawshank, (3, *dark_knight[1:])], snapshot_at=400)
+
+        self.assertEqual(history_db.select_trajectory('top250', 468569, until=1000),
+                         [(100, 4, 9.0), (300, 2, 9.1), (400, 3, 9.0)])
+        self.assertEqual(history_db.select_trajectory('top250', 468569, since=350, until=1000),
+                         [(300, 2, 9.1), (400, 3, 9.0)])
+        self.assertEqual(history_db.select_trajectory('top250', 7286456, until=1000),
+                         [(100, 13, 8.7), (300, None, None)])
+
+        changes = history_db.select_changes_since('top250', 250)
+        self.assertEqual(sorted(changes), [(111161, 'The Shawshank Redemption', 1, 1, 9.2, 9.2),
+                                           (468569, 'The Dark Knight', 4, 3, 9.0, 9.0)])
+
+    def test_user_lists(self):
+        chart_db = ChartEntriesTable(self.root_db)
+        user_lists_db = UserListsTable(self.root_db)
+        rows = self.top250_db.select_all()
+        chart_db.replace_chart('top250', rows)
+
+        self.assertEqual(len(user_lists_db.add_user('dana', 'dana@example.com', 'top250')), 3)
+        self.assertEqual(len(user_lists_db.add_user('noa', None, 'top250')), 3)
+        self.assertEqual(user_lists_db.update_seen_statuses('dana', [1, 13]), {1: 'The Shawshank Redemption',
+                                                                               13: 'Joker'})
+        self.assertEqual(user_lists_db.delete_movies('noa', [4]), {4: 'The Dark Knight'})
+
+        # Joker left the chart, Gisaengchung and The Dark Knight (removed by noa) are in
+        chart_db.replace_chart('top250', [rows[0], rows[1],
+                                          (3, 'Gisaengchung', 2019, 8.6, '46,335', None, LINK, 6751668)])
+        new_movies = user_lists_db.add_new_movies('top250')
+
+        self.assertEqual({user: [row[1] for row in movies] for user, movies in new_movies.items()},
+                         {'dana': ['Gisaengchung'], 'noa': ['Gisaengchung']})
+        self.assertEqual([row[1] for row in user_lists_db.select_unseen_titles('dana')],
+                         ['Gisaengchung', 'The Dark Knight'])
+        self.assertEqual([row[1] for row in user_lists_db.select_list('noa')],
+                         ['The Shawshank Redemption', 'Gisaengchung'])
+
+    def test_user_lists_row_filter(self):
+        chart_db = ChartEntriesTable(self.root_db)
+        user_lists_db = UserListsTable(self.root_db)
+        rows = self.top250_db.select_all()
+        chart_db.replace_chart('top250', rows)
+
+        def row_filter(profile, movies):
+            # 'recent' keeps movies from 2000 on
+            return [movie for movie in movies if profile != 'recent' or movie[2] >= 2000]
+
+        user_lists_db.add_user('dana', None, 'top250', filter_profile='recent', row_filter=row_filter)
+        user_lists_db.add_user('noa', None, 'top250', row_filter=row_filter)
+        self.assertEqual([row[1] for row in user_lists_db.select_list('dana')], ['The Dark Knight', 'Joker'])
+        self.assertEqual([user[3] for user in user_lists_db.select_users()], ['recent', None])
+
+        chart_db.replace_chart('top250', rows + [(20, 'Psycho', 1960, 8.5, '500,000', None, LINK, 54215),
+                                                 (21, 'Gisaengchung', 2019, 8.6, '46,335', None, LINK, 6751668)])
+        new_movies = user_lists_db.add_new_movies('top250', row_filter=row_filter)
+
+        self.assertEqual({user: [row[1] for row in movies] for user, movies in new_movies.items()},
+                         {'dana': ['Gisaengchung'], 'noa': ['Psycho', 'Gisaengchung']})
+
+    def test_state_table(self):
+        state_db = StateTable(self.root_db)
+        self.assertIsNone(state_db.get_value('chart_fingerprint'))
+
+        state_db.set_value('chart_fingerprint', 'a')
+        state_db.set_value('chart_fingerprint', 'b')
+        self.assertEqual(state_db.get_value('chart_fingerprint'), 'b')
+
+
+if __name__ == '__main__':
+    unittest.main()